@@ -0,0 +1,64 @@
+"""
+Merge a 20k-entry backup into a live 20k-entry vault: reading and diffing the
+backup (plan_merge) and applying it with one save (apply_merge). A quarter of
+the backup is new, a quarter updated, a tenth conflicting.
+
+Run from the project root:
+    python -m benchmarks.bench_merge
+"""
+import os
+import tempfile
+import time
+
+from core import kdf, merge
+from core.vault import Vault
+
+ENTRIES = 20_000
+PASSWORD = "benchmark-password"
+
+
+def main() -> None:
+    # the KDF is timed elsewhere (bench_session_key)
+    fast = kdf.pbkdf2(1000)
+    kdf.calibrate = lambda kdf_id=None, target=None: fast
+
+    with tempfile.TemporaryDirectory() as tmp:
+        source = Vault(PASSWORD, vault_file=os.path.join(tmp, "source.json"), flush_delay=None)
+        source._apply_import(
+            ((f"site{i}.example", f"password-{i}", None) for i in range(ENTRIES)), True
+        )
+        shared = os.path.join(tmp, "shared.psafe")
+        source.export_encrypted_backup(shared, PASSWORD)
+
+        live = Vault(PASSWORD, vault_file=os.path.join(tmp, "live.json"), flush_delay=None)
+        live.import_encrypted_backup(shared, PASSWORD)
+        # diverge both copies, then back up the source
+        source._apply_import(
+            (
+                (f"site{i}.example" if i < ENTRIES * 3 // 4 else f"new{i}.example", "changed", None)
+                for i in range(ENTRIES // 2, ENTRIES)
+            ),
+            False,
+        )
+        live._apply_import(
+            ((f"site{i}.example", "local", None) for i in range(ENTRIES // 2, ENTRIES // 2 + ENTRIES // 10)),
+            False,
+        )
+        incoming = os.path.join(tmp, "incoming.psafe")
+        source.export_encrypted_backup(incoming, PASSWORD)
+
+        start = time.perf_counter()
+        plan = live.plan_merge(incoming, PASSWORD)
+        planned = time.perf_counter()
+        written = live.apply_merge(plan, merge.KEEP_NEWER)
+        done = time.perf_counter()
+        print(f"{ENTRIES} entries: {plan!r}, {written} written")
+        print(f"plan  {(planned - start) * 1000:8.1f} ms")
+        print(f"apply {(done - planned) * 1000:8.1f} ms")
+        print(f"total {(done - start) * 1000:8.1f} ms")
+        for v in (source, live):
+            v.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,44 @@
+"""
+Decrypt the sealed values of a 50k-entry vault with 1, 2, 4 and 8 worker threads
+(see core.parallel). Speedup depends on the number of cores.
+
+Run from the project root:
+    python -m benchmarks.bench_parallel_decrypt
+"""
+import os
+import time
+
+from core import parallel
+from core.crypto import Cipher, KEY_SIZE
+
+ENTRIES = 50_000
+ROUNDS = 3
+
+
+def _time(fn, rounds: int) -> float:
+    start = time.perf_counter()
+    for _ in range(rounds):
+        fn()
+    return (time.perf_counter() - start) / rounds
+
+
+def main() -> None:
+    # size the shared pool for the largest run, whatever the core count
+    parallel.MAX_WORKERS = 8
+    cipher = Cipher(os.urandom(KEY_SIZE))
+    sites = [f"site{i}.example".encode() for i in range(ENTRIES)]
+    sealed = cipher.encrypt_many([f"password-{i}".encode() for i in range(ENTRIES)], sites)
+
+    print(f"{ENTRIES} entries, {os.cpu_count()} cores")
+    base = None
+    for workers in (1, 2, 4, 8):
+        elapsed = _time(
+            lambda: parallel.decrypt_many(cipher, sealed, sites, threshold=0, workers=workers),
+            ROUNDS,
+        )
+        base = base or elapsed
+        print(f"{workers} worker(s): {elapsed * 1000:9.2f} ms  ({base / elapsed:4.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,45 @@
+"""
+Search a 100k-site index one keystroke at a time, as a filter box does, and
+time incremental updates. The target is under 5 ms per keystroke.
+
+Run from the project root:
+    python -m benchmarks.bench_search
+"""
+import random
+import time
+
+from core.search import SearchIndex
+
+SITES = 100_000
+WORDS = ["mail", "bank", "shop", "cloud", "git", "news", "home", "work", "game", "store", "pay"]
+TLDS = ["com", "org", "net", "io", "de", "co.uk"]
+QUERIES = ["mailbank", "github", "com", "bankshop123", "e", "12345", ".co.uk", "mialbank99"]
+
+
+def main() -> None:
+    rng = random.Random(1)
+    sites = [f"{rng.choice(WORDS)}{rng.choice(WORDS)}{i}.{rng.choice(TLDS)}" for i in range(SITES)]
+    start = time.perf_counter()
+    index = SearchIndex(sites)
+    print(f"build {SITES} sites   {(time.perf_counter() - start) * 1000:8.1f} ms")
+
+    timings = []
+    for query in QUERIES:
+        for n in range(1, len(query) + 1):
+            start = time.perf_counter()
+            index.search(query[:n])
+            timings.append(time.perf_counter() - start)
+    timings.sort()
+    print(f"keystrokes            {len(timings):8d}")
+    print(f"median                {timings[len(timings) // 2] * 1000:8.3f} ms")
+    print(f"worst                 {timings[-1] * 1000:8.3f} ms")
+
+    start = time.perf_counter()
+    for i in range(1000):
+        index.add(f"added{i}.example")
+        index.discard(sites[i])
+    print(f"add+discard (each)    {(time.perf_counter() - start):8.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+"""
+Compare a vault mutation that re-derives the key on every save with one that reuses
+the session key derived at unlock.
+
+Run from the project root:
+    python -m benchmarks.bench_session_key
+"""
+import os
+import tempfile
+import time
+
+from core import storage
+from core.vault import Vault
+
+MASTER_PASSWORD = "bench-master-password"
+ENTRIES = 200
+ROUNDS = 20
+
+
+def _time(fn, rounds: int) -> float:
+    start = time.perf_counter()
+    for _ in range(rounds):
+        fn()
+    return (time.perf_counter() - start) / rounds
+
+
+def main() -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "vault.json")
+        data = {f"site{i}.example": f"password-{i}" for i in range(ENTRIES)}
+        storage.save_vault(data, MASTER_PASSWORD, path)
+
+        unlock_s = _time(lambda: Vault(MASTER_PASSWORD, vault_file=path, flush_delay=None), 3)
+
+        def legacy_add():
+            data["bench.example"] = "secret"
+            storage.save_vault(data, MASTER_PASSWORD, path)
+
+        vault = Vault(MASTER_PASSWORD, vault_file=path, flush_delay=None)
+        legacy_s = _time(legacy_add, ROUNDS)
+        session_s = _time(lambda: vault.add("bench.example", "secret"), ROUNDS)
+
+    print(f"unlock (one KDF run):            {unlock_s * 1000:9.2f} ms")
+    print(f"add, re-deriving key per save:   {legacy_s * 1000:9.2f} ms")
+    print(f"add, reusing session key:        {session_s * 1000:9.2f} ms")
+    print(f"speedup:                         {legacy_s / session_s:9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,272 @@
+import datetime
+import hashlib
+import hmac
+import logging
+import os
+import re
+import threading
+import time
+from typing import TYPE_CHECKING, Any, Callable, List, Optional, Sequence, Set, Tuple
+
+from . import backup as backup_mod
+from .crypto import KeySchedule, SessionKey
+
+if TYPE_CHECKING:
+    from .vault import Vault
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DIRECTORY = "backups"
+DEFAULT_INTERVAL = 6 * 3600.0  # seconds between scheduled snapshots
+DEFAULT_CHANGES = 25  # edits that trigger a snapshot before the interval is up
+
+# Snapshots are named auto-YYYYmmdd-HHMMSS.psafe (UTC), so rotation needs no password
+_STAMP = "%Y%m%d-%H%M%S"
+_NAME_RE = re.compile(r"^auto-(\d{8}-\d{6})\.psafe$")
+_HASH_KEY_ID = b"\x00backup-content\x00"
+_HASH_MASK = (1 << 256) - 1
+
+
+class Retention:
+    """Grandfather-father-son rotation: how many daily, weekly and monthly snapshots to keep."""
+
+    __slots__ = ("daily", "weekly", "monthly")
+
+    def __init__(self, daily: int = 7, weekly: int = 4, monthly: int = 12) -> None:
+        self.daily = daily
+        self.weekly = weekly
+        self.monthly = monthly
+
+    def __repr__(self) -> str:
+        return f"Retention(daily={self.daily}, weekly={self.weekly}, monthly={self.monthly})"
+
+
+def snapshot_name(when: float) -> str:
+    return "auto-" + time.strftime(_STAMP, time.gmtime(when)) + ".psafe"
+
+
+def list_snapshots(directory: str) -> List[Tuple[float, str]]:
+    """(unix time, path) of the snapshots in `directory`, newest first."""
+    try:
+        names = os.listdir(directory)
+    except FileNotFoundError:
+        return []
+    found = []
+    for name in names:
+        match = _NAME_RE.match(name)
+        if match:
+            when = datetime.datetime.strptime(match.group(1), _STAMP)
+            stamp = when.replace(tzinfo=datetime.timezone.utc).timestamp()
+            found.append((stamp, os.path.join(directory, name)))
+    found.sort(reverse=True)
+    return found
+
+
+def _day(when: float) -> Tuple[int, ...]:
+    return tuple(time.gmtime(when)[:3])
+
+
+def _week(when: float) -> Tuple[int, ...]:
+    date = datetime.datetime.fromtimestamp(when, datetime.timezone.utc).date()
+    return tuple(date.isocalendar()[:2])
+
+
+def _month(when: float) -> Tuple[int, ...]:
+    return tuple(time.gmtime(when)[:2])
+
+
+def gfs_keep(stamps: Sequence[float], retention: Retention) -> Set[float]:
+    """
+    The stamps to keep: the newest snapshot of each of the last `daily` days,
+    `weekly` ISO weeks and `monthly` months that have one. The newest is always kept.
+    """
+    ordered = sorted(stamps, reverse=True)
+    keep: Set[float] = set(ordered[:1])
+    for count, period in (
+        (retention.daily, _day),
+        (retention.weekly, _week),
+        (retention.monthly, _month),
+    ):
+        seen: Set[Tuple[int, ...]] = set()
+        for when in ordered:
+            key = period(when)
+            if key in seen:
+                continue
+            if len(seen) >= count:
+                break
+            seen.add(key)
+            keep.add(when)
+    return keep
+
+
+def rotate(directory: str, retention: Optional[Retention] = None) -> List[str]:
+    """Delete the snapshots in `directory` that gfs_keep() drops; returns their paths."""
+    snapshots = list_snapshots(directory)
+    keep = gfs_keep([when for when, _ in snapshots], retention or Retention())
+    removed = []
+    for when, path in snapshots:
+        if when in keep:
+            continue
+        try:
+            os.remove(path)
+            removed.append(path)
+        except OSError:
+            logger.warning("Could not remove old snapshot %s", path)
+    return removed
+
+
+def content_hash(session: SessionKey, entries: Sequence[Sequence[Any]]) -> str:
+    """
+    Keyed hash of the vault contents, independent of entry order: the entry count
+    and the sum of per-entry HMACs (mod 2^256) under a subkey of the data key.
+    Only site and password count; stamps following them in a row are ignored.
+    """
+    key = KeySchedule(session.key).subkey(_HASH_KEY_ID)
+    total = 0
+    for site, pwd, *_ in entries:
+        digest = hmac.new(key, backup_mod.json_line([site, pwd]), hashlib.sha256).digest()
+        total = (total + int.from_bytes(digest, "big")) & _HASH_MASK
+    return f"{len(entries)}:{total:064x}"
+
+
+def latest_hash(directory: str, session: SessionKey) -> Optional[str]:
+    """Content hash recorded in the newest snapshot, or None if it cannot be read."""
+    snapshots = list_snapshots(directory)
+    if not snapshots:
+        return None
+    try:
+        with open(snapshots[0][1], "rb") as f:
+            meta = backup_mod.BackupReader(f, session=session).read_meta()
+    except (OSError, ValueError):
+        return None
+    return meta.get("content")
+
+
+def snapshot(
+    entries: Sequence[Sequence[Any]],
+    session: SessionKey,
+    directory: str,
+    retention: Optional[Retention] = None,
+    force: bool = False,
+    now: Optional[float] = None,
+) -> Optional[str]:
+    """
+    Write `entries` (backup rows, see backup.write_backup) to a new snapshot in `directory`, keyed by the unlocked
+    `session` (no KDF run), and rotate old ones. Nothing is written when the
+    contents match the newest snapshot, unless `force`. Returns the new path or None.
+    """
+    digest = content_hash(session, entries)
+    if not force and digest == latest_hash(directory, session):
+        return None
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, snapshot_name(time.time() if now is None else now))
+    backup_mod.save_backup_entries(
+        entries, None, path, {"auto": True, "content": digest}, session=session
+    )
+    rotate(directory, retention)
+    return path
+
+
+class BackupScheduler:
+    """
+    Snapshots an unlocked vault on a background thread every `interval` seconds,
+    or as soon as `changes` edits were made (0 disables either trigger). A tick
+    with no edits since the last snapshot does nothing; otherwise
+    Vault.auto_backup() skips the write if the contents did not change.
+    `on_backup(path)` is called on the worker thread after each new snapshot.
+    """
+
+    def __init__(
+        self,
+        vault: "Vault",
+        directory: str = DEFAULT_DIRECTORY,
+        interval: float = DEFAULT_INTERVAL,
+        changes: int = DEFAULT_CHANGES,
+        retention: Optional[Retention] = None,
+        on_backup: Optional[Callable[[str], None]] = None,
+    ) -> None:
+        self.vault = vault
+        self.directory = directory
+        self.interval = interval
+        self.changes = changes
+        self.retention = retention or Retention()
+        self.on_backup = on_backup
+        self.last_error: Optional[BaseException] = None
+        self._cond = threading.Condition()
+        self._pending = 0
+        self._dirty = True  # the vault may differ from the newest snapshot at start
+        self._due = False
+        self._stopped = False
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> "BackupScheduler":
+        self.vault.add_listener(self.notify_change)
+        self._thread = threading.Thread(target=self._run, name="vault-backup", daemon=True)
+        self._thread.start()
+        return self
+
+    def notify_change(self) -> None:
+        """Count one edit; wakes the worker once `changes` have piled up."""
+        with self._cond:
+            self._pending += 1
+            self._dirty = True
+            if self.changes and self._pending >= self.changes:
+                self._due = True
+                self._cond.notify()
+
+    def backup_soon(self) -> None:
+        """Ask the worker for a snapshot now instead of at the next tick."""
+        with self._cond:
+            self._dirty = self._due = True
+            self._cond.notify()
+
+    def run_once(self, force: bool = False) -> Optional[str]:
+        """Take a snapshot on the calling thread; returns its path or None if unchanged."""
+        with self._cond:
+            self._pending = 0
+            self._dirty = self._due = False
+        try:
+            path = self.vault.auto_backup(self.directory, self.retention, force)
+        except BaseException as e:
+            with self._cond:
+                self._dirty = True
+            self.last_error = e
+            raise
+        self.last_error = None
+        if path is not None and self.on_backup is not None:
+            self.on_backup(path)
+        return path
+
+    def stop(self) -> None:
+        """Stop the worker; a snapshot in progress is finished first."""
+        self.vault.remove_listener(self.notify_change)
+        with self._cond:
+            self._stopped = True
+            self._cond.notify()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join()
+
+    def _run(self) -> None:
+        with self._cond:
+            deadline = time.monotonic() + self.interval if self.interval else None
+            while not self._stopped:
+                if not self._due:
+                    if deadline is None:
+                        self._cond.wait()
+                        continue
+                    remaining = deadline - time.monotonic()
+                    if remaining > 0:
+                        self._cond.wait(remaining)
+                        continue
+                # a snapshot was asked for, or the interval is up
+                if self.interval:
+                    deadline = time.monotonic() + self.interval
+                if not (self._due or self._dirty):
+                    continue
+                self._cond.release()
+                try:
+                    self.run_once()
+                except Exception:
+                    logger.exception("Scheduled vault backup failed")
+                finally:
+                    self._cond.acquire()
@@ -0,0 +1,266 @@
+import os
+import threading
+from typing import Iterator, MutableMapping, Optional, Protocol, Tuple
+
+from . import lazyvault, storage, writebehind
+from .crypto import SessionKey
+from .lazyvault import LazyEntries
+from .recordlog import RecordLog
+from .sqlitebackend import SqliteBackend
+from .unlock import ProgressCallback
+
+
+class StorageBackend(Protocol):
+    """
+    Persistence behind a Vault.
+    load() returns the live site -> password mapping the Vault mutates. After changing
+    it the Vault reports the change with put()/delete(), or save() for bulk changes.
+    Incremental backends persist put/delete on their own; whole-file backends may
+    defer and coalesce writes until flush(). rekey() switches to a new session; one
+    that only rewraps the same data key just needs new headers.
+    """
+
+    path: str
+    session: SessionKey
+    lock: threading.RLock
+    incremental: bool
+
+    def load(self) -> MutableMapping[str, str]: ...
+
+    def save(self, entries: MutableMapping[str, str]) -> None: ...
+
+    def put(self, site: str, pwd: str) -> None: ...
+
+    def delete(self, site: str) -> None: ...
+
+    def iterate(self) -> Iterator[Tuple[str, str]]: ...
+
+    def rekey(self, session: SessionKey) -> None: ...
+
+    def flush(self) -> None: ...
+
+    def close(self, flush: bool = True) -> None: ...
+
+
+class FileBackend:
+    """
+    Blob and indexed vault files. Any change rewrites the whole file, so writes go
+    through a WriteBehind flusher; flush_delay=None writes synchronously instead.
+    """
+
+    incremental = False
+
+    def __init__(
+        self,
+        path: str,
+        session: SessionKey,
+        entries: MutableMapping[str, str],
+        fmt: str,
+        flush_delay: Optional[float] = writebehind.DEFAULT_DELAY,
+    ) -> None:
+        self.path = path
+        self.session = session
+        self.fmt = fmt
+        # An indexed vault's entries guard their own file swaps with this lock
+        self.lock = entries.lock if isinstance(entries, LazyEntries) else threading.RLock()
+        self._entries = entries
+        self._writer: Optional[writebehind.WriteBehind] = None
+        if flush_delay is not None:
+            self._writer = writebehind.WriteBehind(self._write, flush_delay)
+
+    @classmethod
+    def open(
+        cls,
+        master_password: str,
+        path: str,
+        fmt: Optional[str] = None,
+        flush_delay: Optional[float] = writebehind.DEFAULT_DELAY,
+        progress: Optional[ProgressCallback] = None,
+    ) -> "FileBackend":
+        """Unlock the file at `path`; a different `fmt` converts it on the next write."""
+        current = storage.vault_format(path)
+        if current == storage.FORMAT_INDEXED:
+            entries, session = storage.unlock_indexed(master_password, path, progress)
+        else:
+            entries, session = storage.unlock(master_password, path, progress)
+        fmt = fmt or current
+        if fmt == storage.FORMAT_INDEXED and not isinstance(entries, LazyEntries):
+            lazy = LazyEntries(path, session)
+            lazy.update(entries)
+            entries = lazy
+        return cls(path, session, entries, fmt, flush_delay)
+
+    def load(self) -> MutableMapping[str, str]:
+        return self._entries
+
+    def save(self, entries: MutableMapping[str, str]) -> None:
+        self._entries = entries
+        self._schedule()
+
+    def put(self, site: str, pwd: str) -> None:
+        self._schedule()
+
+    def delete(self, site: str) -> None:
+        self._schedule()
+
+    def iterate(self) -> Iterator[Tuple[str, str]]:
+        entries = self._entries
+        for site in list(entries):
+            try:
+                yield site, entries[site]
+            except KeyError:
+                # deleted while iterating
+                continue
+
+    def rekey(self, session: SessionKey) -> None:
+        """Rewrite the file under `session` (new salt, KDF parameters or keys) right away."""
+        self.flush()
+        with self.lock:
+            if isinstance(self._entries, LazyEntries):
+                self._entries.rekey(session)
+            self.session = session
+            self._write()
+
+    def flush(self) -> None:
+        if self._writer is not None:
+            self._writer.flush()
+
+    def close(self, flush: bool = True) -> None:
+        if self._writer is not None:
+            self._writer.close(flush=flush)
+            self._writer = None
+
+    def _schedule(self) -> None:
+        if self._writer is not None:
+            self._writer.mark_dirty()
+        else:
+            self._write()
+
+    def _write(self) -> None:
+        entries = self._entries
+        if isinstance(entries, LazyEntries) and self.fmt == storage.FORMAT_INDEXED:
+            # snapshots under self.lock (its own lock), seals new values and drops
+            # their plaintext
+            entries.write()
+            return
+        # Snapshot under the vault's lock, so a batch being applied is written whole
+        with self.lock:
+            snapshot = dict(self._entries)
+        if self.fmt == storage.FORMAT_INDEXED:
+            lazyvault.write_entries(self.path, self.session, snapshot)
+        else:
+            storage.write_blob(self.path, self.session, snapshot)
+
+
+class RecordLogBackend:
+    """Append-only record log: put/delete append one sealed record each."""
+
+    incremental = True
+
+    def __init__(
+        self,
+        path: str,
+        session: SessionKey,
+        entries: MutableMapping[str, str],
+        log: Optional[RecordLog],
+    ) -> None:
+        self.path = path
+        self.session = session
+        self.lock = threading.RLock()
+        self._entries = entries
+        # None until a file of another format has been rewritten as a log
+        self._log = log
+
+    @classmethod
+    def open(
+        cls,
+        master_password: str,
+        path: str,
+        progress: Optional[ProgressCallback] = None,
+    ) -> "RecordLogBackend":
+        if storage.vault_format(path) == storage.FORMAT_LOG:
+            entries, session, log = storage.unlock_record_log(
+                master_password, path, progress
+            )
+            return cls(path, session, entries, log)
+        entries, session = storage.unlock(master_password, path, progress)
+        return cls(path, session, entries, None)
+
+    def load(self) -> MutableMapping[str, str]:
+        return self._entries
+
+    def save(self, entries: MutableMapping[str, str]) -> None:
+        self._entries = entries
+        if self._log is None:
+            self._log = RecordLog(self.path, self.session)
+        self._log.rewrite(dict(entries))
+
+    def put(self, site: str, pwd: str) -> None:
+        if self._log is None:
+            self.save(self._entries)
+        else:
+            self._log.put(site, pwd)
+
+    def delete(self, site: str) -> None:
+        if self._log is None:
+            self.save(self._entries)
+        else:
+            self._log.delete(site)
+
+    def iterate(self) -> Iterator[Tuple[str, str]]:
+        return iter(list(self._entries.items()))
+
+    def rekey(self, session: SessionKey) -> None:
+        with self.lock:
+            if self._log is not None:
+                self._log.wait_for_compaction()
+                if session.key == self.session.key:
+                    # same data key: swap the header, frames stay as they are
+                    self._log.rewrap(session)
+                    self.session = session
+                    return
+            self.session = session
+            self._log = RecordLog(self.path, session)
+            self._log.rewrite(dict(self._entries))
+
+    def flush(self) -> None:
+        pass
+
+    def close(self, flush: bool = True) -> None:
+        if self._log is not None:
+            self._log.wait_for_compaction()
+
+
+def default_path(fmt: Optional[str] = None) -> str:
+    """
+    Path used when no vault file is given: storage.SQLITE_FILE for SQLite vaults,
+    otherwise storage.VAULT_FILE. An existing SQLite vault is picked up when
+    VAULT_FILE does not exist.
+    """
+    if fmt == storage.FORMAT_SQLITE:
+        return storage.SQLITE_FILE
+    if fmt is None and not os.path.exists(storage.VAULT_FILE):
+        if os.path.exists(storage.SQLITE_FILE):
+            return storage.SQLITE_FILE
+    return storage.VAULT_FILE
+
+
+def open_backend(
+    master_password: str,
+    vault_file: Optional[str] = None,
+    fmt: Optional[str] = None,
+    flush_delay: Optional[float] = writebehind.DEFAULT_DELAY,
+    progress: Optional[ProgressCallback] = None,
+) -> StorageBackend:
+    """
+    Unlock the vault at `vault_file` and return the backend for `fmt`, defaulting
+    to the format already on disk (storage.DEFAULT_FORMAT for a new vault).
+    `progress(fraction, message)` is called around the KDF.
+    """
+    path = vault_file or default_path(fmt)
+    fmt = fmt or storage.vault_format(path)
+    if fmt == storage.FORMAT_SQLITE:
+        return SqliteBackend.open(master_password, path, progress)
+    if fmt == storage.FORMAT_LOG:
+        return RecordLogBackend.open(master_password, path, progress)
+    return FileBackend.open(master_password, path, fmt, flush_delay, progress)
@@ -1,38 +1,84 @@
 import os
+import glob
 import json
 import base64
-import hashlib
-from typing import Any, Dict
+import struct
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, BinaryIO, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
 
-from .crypto import CryptoUtils
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
 
+from . import kdf as kdf_mod
+from . import parallel, vaultfile
+from .crypto import CryptoUtils, KeySchedule, SessionKey
+
+# Backups without a "kdf" field were written with PBKDF2-HMAC-SHA256 at this count
 PBKDF2_ITERATIONS = 100_000
+LEGACY_KDF = kdf_mod.pbkdf2(PBKDF2_ITERATIONS)
 SALT_SIZE = 16  # bytes
 
+# Streaming format (see write_backup)
+STREAM_MAGIC = b"PSBAK"
+STREAM_VERSION = 1
+CHUNK_SIZE = 64 * 1024  # plaintext bytes per chunk
+MAX_CHUNK_SIZE = 16 * 1024 * 1024
+NONCE_PREFIX_SIZE = 7
+_STREAM_MAGIC_VERSION = struct.Struct(">5sB")
+# kdf id | 3 x kdf parameter | chunk size | created | salt length
+_STREAM_FIELDS = struct.Struct(">BIIIIQB")
+# kdf id of backups keyed by a vault's data key rather than a password
+SESSION_KEYED = 0
+_VAULT_HEADER_LEN = struct.Struct(">H")
+_SESSION_KEY_ID = b"\x00backup\x00"
+_FRAME_LEN = struct.Struct(">I")
+_NONCE_TAIL = struct.Struct(">IB")  # chunk index | last-chunk flag
+_TRAILER = struct.Struct(">QQ")  # records | plaintext bytes
+_TAG_SIZE = 16
+
 
-def _derive_key_from_password(password: str, salt: bytes, dklen: int = 32) -> bytes:
+def _derive_key_from_password(
+    password: str,
+    salt: bytes,
+    dklen: int = 32,
+    params: Optional[kdf_mod.KdfParams] = None,
+) -> bytes:
     """
-    Derive a symmetric key from `password` and `salt` using PBKDF2-HMAC-SHA256.
+    Derive a symmetric key from `password` and `salt` with the KDF in `params`
+    (default: the legacy PBKDF2 parameters).
     Returns raw bytes suitable for CryptoUtils.encrypt/decrypt.
     """
     if password is None:
         raise ValueError("Password required for key derivation")
-    return hashlib.pbkdf2_hmac("sha256", password.encode("utf-8"), salt, PBKDF2_ITERATIONS, dklen)
+    return (params or LEGACY_KDF).derive(password, salt, dklen)
+
+
+def _parse_kdf_field(obj: Dict[str, Any]) -> kdf_mod.KdfParams:
+    field = obj.get("kdf")
+    if field is None:
+        return LEGACY_KDF
+    return kdf_mod.KdfParams.from_dict(field)
 
 
 def create_encrypted_backup_bytes(obj: Any, password: str) -> bytes:
     """
     Serialize `obj` (usually a dict) to JSON, derive a key and encrypt.
     Returns bytes that are a UTF-8 JSON object:
-      {"salt": "<base64>", "payload": "<base64 token>"}
+      {"kdf": {"id": <kdf id>, "params": [..]}, "salt": "<base64>", "payload": "<base64 token>"}
+    The KDF is calibrated for this machine, as for new vaults.
     """
     salt = os.urandom(SALT_SIZE)
-    key = _derive_key_from_password(password, salt, dklen=32)
+    params = kdf_mod.calibrate()
+    key = _derive_key_from_password(password, salt, dklen=32, params=params)
 
     plaintext = json.dumps(obj, separators=(",", ":"), ensure_ascii=False)
     token = CryptoUtils.encrypt(plaintext, key)
 
-    out = {"salt": base64.b64encode(salt).decode("ascii"), "payload": token}
+    out = {
+        "kdf": params.to_dict(),
+        "salt": base64.b64encode(salt).decode("ascii"),
+        "payload": token,
+    }
     return json.dumps(out, indent=2).encode("utf-8")
 
 
@@ -49,10 +95,11 @@ def decrypt_encrypted_backup_bytes(data: bytes, password: str) -> Any:
         if not salt_b64 or not payload:
             raise ValueError("Invalid backup file format")
         salt = base64.b64decode(salt_b64.encode("ascii"))
+        params = _parse_kdf_field(obj)
     except Exception as e:
         raise ValueError(f"Failed to parse backup file: {e}")
 
-    key = _derive_key_from_password(password, salt, dklen=32)
+    key = _derive_key_from_password(password, salt, dklen=32, params=params)
     try:
         plaintext = CryptoUtils.decrypt(payload, key)
     except Exception as e:
@@ -64,17 +111,495 @@ def decrypt_encrypted_backup_bytes(data: bytes, password: str) -> Any:
         raise ValueError(f"Failed to parse decrypted JSON: {e}")
 
 
-def save_encrypted_backup_file(obj: Any, password: str, filepath: str) -> None:
-    """Helper to create and write an encrypted backup file to `filepath`."""
-    b = create_encrypted_backup_bytes(obj, password)
-    with open(filepath, "wb") as f:
-        f.write(b)
+def _chunk_nonce(prefix: bytes, index: int, last: bool) -> bytes:
+    if index >= 1 << 32:
+        raise ValueError("Backup has too many chunks")
+    return prefix + _NONCE_TAIL.pack(index, 1 if last else 0)
+
+
+def json_line(record: Any) -> bytes:
+    """One record as a compact JSON line, exactly as backups store it."""
+    return json.dumps(record, separators=(",", ":"), ensure_ascii=False).encode("utf-8") + b"\n"
+
+
+def _session_key(session: SessionKey, salt: bytes) -> bytes:
+    # one subkey of the data key per backup (the salt is random per file)
+    return KeySchedule(session.key).subkey(_SESSION_KEY_ID + salt)
+
+
+def write_backup(
+    f: BinaryIO,
+    entries: Iterable[Sequence[Any]],
+    password: Optional[str],
+    meta: Optional[Dict[str, Any]] = None,
+    chunk_size: int = CHUNK_SIZE,
+    params: Optional[kdf_mod.KdfParams] = None,
+    session: Optional[SessionKey] = None,
+) -> int:
+    """
+    Write a streaming backup of `entries` to `f` and return the number of entries.
+    Memory use is bounded by the chunk size, whatever the number of entries.
+    Format:
+      header: b"PSBAK" | version (u8) | kdf id (u8) | 3 x kdf parameter (u32 BE)
+              | chunk size (u32 BE) | created (u64 BE, unix time)
+              | salt length (u8) | salt | nonce prefix (7)
+              [| vault header length (u16 BE) | vault header; kdf id 0 only]
+      frames: length (u32 BE) | AES-GCM ciphertext of one chunk
+    The plaintext is JSON lines, a `meta` object followed by one array per entry,
+    [site, password] or [site, password, modified, version], cut into chunks of `chunk_size` bytes. Chunk i is sealed with
+    nonce = prefix | i (u32 BE) | last flag (u8) and the header as associated data,
+    so chunks cannot be reordered, dropped or moved between files. The last chunk
+    is a trailer holding the entry and plaintext byte counts (u64 BE each); a
+    backup without it is truncated.
+
+    Given an unlocked `session` instead of a password, no KDF runs: the chunks are
+    sealed under a subkey of the vault's data key (kdf id 0) and the vault header,
+    with its wrapped data key, is embedded so the master password in use at the
+    time still opens the backup.
+    """
+    if not 0 < chunk_size <= MAX_CHUNK_SIZE:
+        raise ValueError("Invalid chunk size")
+    salt = os.urandom(SALT_SIZE)
+    prefix = os.urandom(NONCE_PREFIX_SIZE)
+    if session is not None:
+        vault_header = vaultfile.VaultHeader.for_session(session).encode()
+        kdf_id, kdf_params = SESSION_KEYED, (0, 0, 0)
+        key_block = _VAULT_HEADER_LEN.pack(len(vault_header)) + vault_header
+    else:
+        params = params or kdf_mod.calibrate()
+        kdf_id, kdf_params, key_block = params.kdf_id, params.params, b""
+    header = (
+        _STREAM_MAGIC_VERSION.pack(STREAM_MAGIC, STREAM_VERSION)
+        + _STREAM_FIELDS.pack(
+            kdf_id, *kdf_params, chunk_size, int(time.time()), len(salt)
+        )
+        + salt
+        + prefix
+        + key_block
+    )
+    if session is not None:
+        key = _session_key(session, salt)
+    else:
+        key = _derive_key_from_password(password, salt, 32, params)
+    aesgcm = AESGCM(key)
+    f.write(header)
+
+    index = 0
+    total = 0
+    count = 0
+    pending = bytearray()
+
+    def emit(chunk: bytes, last: bool) -> None:
+        nonlocal index
+        sealed = aesgcm.encrypt(_chunk_nonce(prefix, index, last), chunk, header)
+        f.write(_FRAME_LEN.pack(len(sealed)))
+        f.write(sealed)
+        index += 1
+
+    def feed(line: bytes) -> None:
+        nonlocal total
+        pending.extend(line)
+        total += len(line)
+        while len(pending) >= chunk_size:
+            emit(bytes(pending[:chunk_size]), False)
+            del pending[:chunk_size]
+
+    feed(json_line(meta or {}))
+    for entry in entries:
+        feed(json_line(list(entry)))
+        count += 1
+    if pending:
+        emit(bytes(pending), False)
+    emit(_TRAILER.pack(count, total), True)
+    return count
+
+
+class StreamHeader:
+    """
+    Parsed header of a streaming backup; `raw` is its encoded form (the AEAD
+    associated data). Session-keyed backups carry the encoded `vault_header` and
+    report its KDF.
+    """
+
+    __slots__ = ("version", "kdf", "chunk_size", "created", "salt", "prefix", "raw", "vault_header")
+
+    def __init__(
+        self,
+        version: int,
+        kdf: kdf_mod.KdfParams,
+        chunk_size: int,
+        created: int,
+        salt: bytes,
+        prefix: bytes,
+        raw: bytes,
+        vault_header: Optional[bytes] = None,
+    ) -> None:
+        self.version = version
+        self.kdf = kdf
+        self.chunk_size = chunk_size
+        self.created = created
+        self.salt = salt
+        self.prefix = prefix
+        self.raw = raw
+        self.vault_header = vault_header
+
+    @property
+    def session_keyed(self) -> bool:
+        return self.vault_header is not None
+
+    @classmethod
+    def read(cls, f: BinaryIO) -> "StreamHeader":
+        head = f.read(_STREAM_MAGIC_VERSION.size)
+        if len(head) < _STREAM_MAGIC_VERSION.size:
+            raise ValueError("Truncated backup header")
+        magic, version = _STREAM_MAGIC_VERSION.unpack(head)
+        if magic != STREAM_MAGIC:
+            raise ValueError("Not a streaming backup")
+        if version != STREAM_VERSION:
+            raise ValueError(f"Unsupported backup version {version}")
+        raw = f.read(_STREAM_FIELDS.size)
+        if len(raw) < _STREAM_FIELDS.size:
+            raise ValueError("Truncated backup header")
+        kdf_id, p1, p2, p3, chunk_size, created, salt_len = _STREAM_FIELDS.unpack(raw)
+        if not 0 < chunk_size <= MAX_CHUNK_SIZE:
+            raise ValueError("Invalid chunk size")
+        rest = f.read(salt_len + NONCE_PREFIX_SIZE)
+        if len(rest) < salt_len + NONCE_PREFIX_SIZE:
+            raise ValueError("Truncated backup header")
+        vault_header = None
+        if kdf_id == SESSION_KEYED:
+            size = f.read(_VAULT_HEADER_LEN.size)
+            if len(size) < _VAULT_HEADER_LEN.size:
+                raise ValueError("Truncated backup header")
+            vault_header = f.read(_VAULT_HEADER_LEN.unpack(size)[0])
+            rest += size + vault_header
+            kdf = vaultfile.VaultHeader.decode(vault_header).kdf
+        else:
+            kdf = kdf_mod.KdfParams(kdf_id, (p1, p2, p3))
+        return cls(
+            version,
+            kdf,
+            chunk_size,
+            created,
+            rest[:salt_len],
+            rest[salt_len : salt_len + NONCE_PREFIX_SIZE],
+            head + raw + rest,
+            vault_header,
+        )
+
+
+class BackupReader:
+    """
+    Reads a streaming backup (see write_backup) from an open file. Each chunk is
+    authenticated before any record in it is returned; a tampered, reordered or
+    truncated backup raises ValueError when the bad chunk is reached.
+    Session-keyed backups open with the master password they were written under
+    (one KDF run) or, without any KDF, with the vault's unlocked `session`.
+    """
+
+    def __init__(
+        self, f: BinaryIO, password: Optional[str] = None, session: Optional[SessionKey] = None
+    ) -> None:
+        self._f = f
+        self.header = StreamHeader.read(f)
+        self._header = self.header.raw
+        self._prefix = self.header.prefix
+        self._max_frame = self.header.chunk_size + _TAG_SIZE
+        if self.header.session_keyed:
+            if session is None:
+                if password is None:
+                    raise ValueError("Password required to open this backup")
+                vault_header = vaultfile.VaultHeader.decode(self.header.vault_header)
+                session = vault_header.derive(password)
+            key = _session_key(session, self.header.salt)
+        else:
+            if password is None:
+                raise ValueError("Password required to open this backup")
+            key = _derive_key_from_password(password, self.header.salt, 32, self.header.kdf)
+        self._aesgcm = AESGCM(key)
+        # the key a session-keyed backup opened with, to open others without a KDF
+        self.session = session if self.header.session_keyed else None
+        self.meta: Optional[Dict[str, Any]] = None
+        self._trailer: Optional[Tuple[int, int]] = None
+
+    def _chunks(self) -> Iterator[bytes]:
+        index = 0
+        while True:
+            raw = self._f.read(_FRAME_LEN.size)
+            if len(raw) < _FRAME_LEN.size:
+                raise ValueError("Backup is truncated")
+            (length,) = _FRAME_LEN.unpack(raw)
+            if length > self._max_frame:
+                raise ValueError("Backup chunk is too large")
+            sealed = self._f.read(length)
+            if len(sealed) < length:
+                raise ValueError("Backup is truncated")
+            # a data chunk or the trailer; only one of them authenticates
+            for last in (False, True):
+                try:
+                    chunk = self._aesgcm.decrypt(
+                        _chunk_nonce(self._prefix, index, last), sealed, self._header
+                    )
+                    break
+                except Exception:
+                    continue
+            else:
+                if index == 0:
+                    raise ValueError("Decryption failed: wrong password or corrupt backup")
+                raise ValueError(f"Backup chunk {index} failed authentication")
+            index += 1
+            if last:
+                self._trailer = _TRAILER.unpack(chunk)
+                return
+            yield chunk
+
+    def rows(self) -> Iterator[List[Any]]:
+        """Yield the entry arrays as their chunks verify; sets `meta` first."""
+        buf = bytearray()
+        count = 0
+        total = 0
+        for chunk in self._chunks():
+            buf.extend(chunk)
+            total += len(chunk)
+            start = 0
+            while True:
+                end = buf.find(b"\n", start)
+                if end < 0:
+                    break
+                record = json.loads(bytes(buf[start:end]))
+                start = end + 1
+                if self.meta is None:
+                    self.meta = record
+                    continue
+                count += 1
+                yield record
+            del buf[:start]
+        if buf or self.meta is None or self._trailer != (count, total):
+            raise ValueError("Backup trailer does not match its contents")
+
+    def records(self) -> Iterator[Tuple[str, str]]:
+        """Yield (site, password) pairs as their chunks verify."""
+        for row in self.rows():
+            yield row[0], row[1]
+
+    def entries(self) -> Iterator[Tuple[str, str, Optional[Tuple[int, int]]]]:
+        """Yield (site, password, (modified, version) or None) as their chunks verify."""
+        for row in self.rows():
+            stamp = None
+            if len(row) >= 4 and isinstance(row[2], int) and isinstance(row[3], int):
+                stamp = (row[2], row[3])
+            yield row[0], row[1], stamp
+
+    def read_meta(self) -> Dict[str, Any]:
+        """Decrypt only as far as the metadata line (normally just the first chunk)."""
+        if self.meta is None:
+            for _ in self.rows():
+                break
+        return self.meta or {}
+
+    def verify(self) -> int:
+        """
+        Authenticate every chunk and the trailer without decoding records.
+        Returns the number of entries; raises ValueError like records().
+        """
+        lines = 0
+        total = 0
+        tail = b""
+        for chunk in self._chunks():
+            lines += chunk.count(b"\n")
+            total += len(chunk)
+            tail = chunk[-1:]
+        if lines == 0 or tail != b"\n" or self._trailer != (lines - 1, total):
+            raise ValueError("Backup trailer does not match its contents")
+        return lines - 1
+
+
+def is_stream_backup(filepath: str) -> bool:
+    try:
+        with open(filepath, "rb") as f:
+            return f.read(len(STREAM_MAGIC)) == STREAM_MAGIC
+    except OSError:
+        return False
+
+
+# `version` reported for the older single-token JSON backups
+JSON_VERSION = 0
+
+
+class BackupInfo:
+    """
+    What inspect_backup()/verify_backup() found. Header fields (`created` is unix
+    time, None if not recorded) are only authenticated once `verified` is True;
+    `entries` is None until then and `error` says why verification failed.
+    """
+
+    __slots__ = ("path", "version", "created", "kdf", "size", "entries", "verified", "error")
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self.version: Optional[int] = None
+        self.created: Optional[int] = None
+        self.kdf: Optional[kdf_mod.KdfParams] = None
+        self.size = 0
+        self.entries: Optional[int] = None
+        self.verified = False
+        self.error: Optional[str] = None
+
+    def __repr__(self) -> str:
+        state = "ok" if self.verified else self.error or "unverified"
+        return f"BackupInfo({self.path!r}, v{self.version}, {self.entries} entries, {state})"
+
+
+def inspect_backup(filepath: str) -> BackupInfo:
+    """
+    Read the format version, KDF and creation time from the header of the
+    backup at `filepath` without a password. Nothing is decrypted.
+    """
+    info = BackupInfo(filepath)
+    info.size = os.path.getsize(filepath)
+    with open(filepath, "rb") as f:
+        if f.read(len(STREAM_MAGIC)) == STREAM_MAGIC:
+            f.seek(0)
+            header = StreamHeader.read(f)
+            info.version, info.created, info.kdf = header.version, header.created, header.kdf
+            return info
+        f.seek(0)
+        try:
+            obj = json.loads(f.read().decode("utf-8"))
+            info.kdf = _parse_kdf_field(obj)
+        except Exception as e:
+            raise ValueError(f"Failed to parse backup file: {e}")
+    info.version = JSON_VERSION
+    return info
+
+
+def verify_backup(filepath: str, password: str) -> BackupInfo:
+    """
+    Check that the backup at `filepath` is intact and that `password` opens it,
+    counting its entries. The vault is not involved. Failures are reported in
+    the result (`verified` False, `error` set) rather than raised.
+    """
+    try:
+        info = inspect_backup(filepath)
+    except (OSError, ValueError) as e:
+        info = BackupInfo(filepath)
+        info.error = str(e)
+        return info
+    try:
+        if info.version == JSON_VERSION:
+            with open(filepath, "rb") as f:
+                obj = decrypt_encrypted_backup_bytes(f.read(), password)
+            entries = obj.get("entries") if isinstance(obj, dict) else None
+            if not isinstance(entries, dict):
+                raise ValueError("Backup entries malformed")
+            info.entries = len(entries)
+        else:
+            with open(filepath, "rb") as f:
+                info.entries = BackupReader(f, password).verify()
+        info.verified = True
+    except (OSError, ValueError) as e:
+        info.error = str(e)
+    return info
+
+
+def verify_backups(
+    directory: str, password: str, workers: Optional[int] = None
+) -> List[BackupInfo]:
+    """
+    verify_backup() every .psafe file in `directory`, several at a time on a
+    thread pool (the KDF and AES-GCM run outside the GIL). Sorted by file name.
+    """
+    paths = sorted(glob.glob(os.path.join(glob.escape(directory), "*.psafe")))
+    if not paths:
+        return []
+    workers = min(workers or parallel.MAX_WORKERS, len(paths))
+    if workers < 2:
+        return [verify_backup(path, password) for path in paths]
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="backup-verify") as pool:
+        return list(pool.map(lambda path: verify_backup(path, password), paths))
+
+
+def save_backup_entries(
+    entries: Iterable[Sequence[Any]],
+    password: Optional[str],
+    filepath: str,
+    meta: Optional[Dict[str, Any]] = None,
+    session: Optional[SessionKey] = None,
+) -> int:
+    """
+    Stream `entries` into a backup at `filepath` (written to a temporary file and
+    renamed into place), keyed by `password` or by an unlocked `session` (see
+    write_backup). Returns the number of entries written.
+    """
+    tmp = filepath + ".tmp"
+    try:
+        with open(tmp, "wb") as f:
+            count = write_backup(f, entries, password, meta, session=session)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, filepath)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+    return count
+
+
+def iter_backup_records(
+    filepath: str, password: str
+) -> Iterator[Tuple[str, str, Optional[Tuple[int, int]]]]:
+    """
+    Yield (site, password, stamp) for each entry of the backup at `filepath`; the
+    stamp is (modified, version), or None if the backup did not record one.
+    Streaming backups are read chunk by chunk and raise ValueError at the first
+    chunk that does not verify; older JSON backups are decrypted whole first.
+    """
+    if not os.path.exists(filepath):
+        raise FileNotFoundError(filepath)
+    if not is_stream_backup(filepath):
+        data = load_encrypted_backup_file(filepath, password)
+        entries = data.get("entries") if isinstance(data, dict) else None
+        if not isinstance(entries, dict):
+            raise ValueError("Backup entries malformed")
+        for site, pwd in entries.items():
+            yield site, pwd, None
+        return
+    with open(filepath, "rb") as f:
+        yield from BackupReader(f, password).entries()
+
+
+def iter_backup_entries(filepath: str, password: str) -> Iterator[Tuple[str, str]]:
+    """The (site, password) pairs of the backup at `filepath` (see iter_backup_records)."""
+    for site, pwd, _ in iter_backup_records(filepath, password):
+        yield site, pwd
+
+
+def save_encrypted_backup_file(obj: Dict[str, Any], password: str, filepath: str) -> None:
+    """
+    Write `obj` as a streaming backup to `filepath`: its "entries" mapping is
+    streamed entry by entry, any other keys are stored as metadata.
+    """
+    if not isinstance(obj, dict):
+        raise ValueError("Backup object must be a dict")
+    meta = {k: v for k, v in obj.items() if k != "entries"}
+    entries = obj.get("entries") or {}
+    save_backup_entries(entries.items(), password, filepath, meta)
 
 
 def load_encrypted_backup_file(filepath: str, password: str) -> Any:
-    """Helper to load and decrypt an encrypted backup file from `filepath`."""
+    """
+    Helper to load and decrypt an encrypted backup file from `filepath`.
+    Streaming backups come back as their metadata plus an "entries" dict; older
+    JSON backups as the object they were created from.
+    """
     if not os.path.exists(filepath):
         raise FileNotFoundError(filepath)
     with open(filepath, "rb") as f:
+        if f.read(len(STREAM_MAGIC)) == STREAM_MAGIC:
+            f.seek(0)
+            reader = BackupReader(f, password)
+            entries = dict(reader.records())
+            return {**(reader.meta or {}), "entries": entries}
+        f.seek(0)
         data = f.read()
     return decrypt_encrypted_backup_bytes(data, password)
\ No newline at end of file
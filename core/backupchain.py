@@ -0,0 +1,280 @@
+import glob
+import hashlib
+import hmac
+import os
+import re
+import uuid
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from . import backup as backup_mod
+from . import kdf as kdf_mod
+from .crypto import SessionKey
+
+# A chain for "vault.psafe" is:
+#   vault.psafe                       full base (seq 0)
+#   vault.delta-0001.psafe, ...       deltas, each against a parent backup
+#   vault.manifest-0000.psafe, ...    keyed hashes of every entry as of that backup
+# The "delta-"/"manifest-" tags keep other files named after the vault (e.g.
+# a dated copy "vault.20251018.psafe") out of the chain: full backups and
+# pruning delete chain files by name.
+# All files use the streaming backup format; a delta stores changed entries as
+# [site, password] and deleted ones as [site, null]. A chain's files are keyed
+# by one session derived from its password (each embeds the wrapped key, so
+# any of them opens alone with the password): an operation on a chain runs the
+# KDF once, not once per file. Chains from before this used password-keyed files.
+FULL = "full"
+DELTA = "delta"
+UNCHANGED = "unchanged"
+HASH_KEY_SIZE = 32
+_HASH_SIZE = 16
+DELTA_TAG = "delta"
+MANIFEST_TAG = "manifest"
+_SEQ_RE = re.compile(r"-(\d{4,})\.psafe")
+
+
+class BackupResult:
+    """What backup() wrote: `kind` is FULL, DELTA or UNCHANGED (nothing written)."""
+
+    __slots__ = ("kind", "path", "seq", "added", "changed", "deleted")
+
+    def __init__(
+        self,
+        kind: str,
+        path: Optional[str],
+        seq: int,
+        added: int = 0,
+        changed: int = 0,
+        deleted: int = 0,
+    ) -> None:
+        self.kind = kind
+        self.path = path
+        self.seq = seq
+        self.added = added
+        self.changed = changed
+        self.deleted = deleted
+
+    def __repr__(self) -> str:
+        return (
+            f"BackupResult({self.kind}, seq={self.seq}, +{self.added} "
+            f"~{self.changed} -{self.deleted})"
+        )
+
+
+def _stem(base_path: str) -> str:
+    root, ext = os.path.splitext(base_path)
+    return root if ext else base_path
+
+
+def delta_path(base_path: str, seq: int) -> str:
+    return f"{_stem(base_path)}.{DELTA_TAG}-{seq:04d}.psafe"
+
+
+def manifest_path(base_path: str, seq: int) -> str:
+    return f"{_stem(base_path)}.{MANIFEST_TAG}-{seq:04d}.psafe"
+
+
+def _numbered(base_path: str, tag: str) -> Dict[int, str]:
+    # chain files "<stem>.<tag>-NNNN.psafe" by sequence number
+    prefix = f"{_stem(base_path)}.{tag}"
+    found = {}
+    for path in glob.glob(glob.escape(prefix) + "-*.psafe"):
+        match = _SEQ_RE.fullmatch(path, len(prefix))
+        if match:
+            found[int(match.group(1))] = path
+    return found
+
+
+def chain_files(base_path: str) -> List[str]:
+    """The base and delta files of the chain at `base_path`, in sequence order."""
+    if not os.path.exists(base_path):
+        return []
+    deltas = _numbered(base_path, DELTA_TAG)
+    return [base_path] + [deltas[seq] for seq in sorted(deltas) if seq > 0]
+
+
+def entry_hash(hash_key: bytes, site: str, pwd: str) -> str:
+    """Keyed hash of one entry; without the key it reveals nothing about the password."""
+    data = backup_mod.json_line([site, pwd])
+    return hmac.new(hash_key, data, hashlib.sha256).hexdigest()[: _HASH_SIZE * 2]
+
+
+def _read(
+    path: str, password: str, session: Optional[SessionKey] = None
+) -> Tuple[Dict, List[Tuple[str, Optional[str]]], Optional[SessionKey]]:
+    """
+    (meta, records, session) of one chain file. With the chain's `session` no KDF
+    runs; a file keyed by another session (e.g. left over from an older chain)
+    falls back to `password`. The session returned is the one the file opened with.
+    """
+    with open(path, "rb") as f:
+        try:
+            reader = backup_mod.BackupReader(f, password, session)
+            records = list(reader.records())
+        except ValueError:
+            if session is None:
+                raise
+            f.seek(0)
+            reader = backup_mod.BackupReader(f, password)
+            records = list(reader.records())
+    return reader.meta or {}, records, reader.session
+
+
+def _read_manifest(
+    base_path: str, seq: int, password: str, session: Optional[SessionKey] = None
+) -> Tuple[Dict, Dict[str, str], Optional[SessionKey]]:
+    meta, records, session = _read(manifest_path(base_path, seq), password, session)
+    return meta, dict(records), session
+
+
+def _write(path: str, records: Iterable, session: SessionKey, meta: Dict) -> None:
+    backup_mod.save_backup_entries(records, None, path, meta, session=session)
+
+
+def _new_session(password: str) -> SessionKey:
+    # a fresh data key wrapped under `password`, with parameters calibrated once
+    return SessionKey.derive(password, None, kdf_mod.calibrate())
+
+
+def _remove(paths: Iterable[str]) -> None:
+    for path in paths:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def _full(
+    entries: Iterable[Tuple[str, str]],
+    password: str,
+    base_path: str,
+    session: Optional[SessionKey] = None,
+) -> BackupResult:
+    session = session or _new_session(password)
+    chain = uuid.uuid4().hex
+    hash_key = os.urandom(HASH_KEY_SIZE)
+    hashes: Dict[str, str] = {}
+
+    def hashed() -> Iterator[Tuple[str, str]]:
+        for site, pwd in entries:
+            hashes[site] = entry_hash(hash_key, site, pwd)
+            yield site, pwd
+
+    # Drop the old manifests first so no delta is built on the old chain if this
+    # is interrupted; old deltas left behind are skipped by restore (other chain)
+    _remove(_numbered(base_path, MANIFEST_TAG).values())
+    _write(base_path, hashed(), session, {"chain": chain, "seq": 0, "kind": FULL})
+    _remove(_numbered(base_path, DELTA_TAG).values())
+    _write(
+        manifest_path(base_path, 0),
+        hashes.items(),
+        session,
+        {"chain": chain, "seq": 0, "hash_key": hash_key.hex()},
+    )
+    return BackupResult(FULL, base_path, 0, added=len(hashes))
+
+
+def backup(
+    entries: Iterable[Tuple[str, str]],
+    password: str,
+    base_path: str,
+    differential: bool = False,
+    full: bool = False,
+) -> BackupResult:
+    """
+    Back up `entries` to the chain at `base_path`. The first backup (or full=True)
+    writes a full base; later ones write a delta holding only entries added,
+    changed or deleted since the previous backup, or since the base if
+    `differential`. Nothing is written when nothing changed. The KDF runs once,
+    to open the base manifest (or to key a new chain).
+    """
+    manifests = _numbered(base_path, MANIFEST_TAG)
+    if full or not os.path.exists(base_path) or 0 not in manifests:
+        return _full(entries, password, base_path)
+
+    base_meta, _, session = _read_manifest(base_path, 0, password)
+    # a chain from before chain sessions: its deltas from now on get one
+    session = session or _new_session(password)
+    chain = base_meta.get("chain")
+    latest = max(manifests)
+    parent = 0 if differential else latest
+    meta, old, _ = _read_manifest(base_path, parent, password, session)
+    if meta.get("chain") != chain:
+        return _full(entries, password, base_path, session)
+    hash_key = bytes.fromhex(base_meta["hash_key"])
+
+    hashes: Dict[str, str] = {}
+    changes: List[Tuple[str, Optional[str]]] = []
+    added = changed = 0
+    for site, pwd in entries:
+        digest = hashes[site] = entry_hash(hash_key, site, pwd)
+        previous = old.get(site)
+        if previous == digest:
+            continue
+        changes.append((site, pwd))
+        if previous is None:
+            added += 1
+        else:
+            changed += 1
+    deleted = [site for site in old if site not in hashes]
+    changes.extend((site, None) for site in deleted)
+    if not changes:
+        return BackupResult(UNCHANGED, None, parent)
+
+    seq = latest + 1
+    path = delta_path(base_path, seq)
+    _write(path, changes, session, {"chain": chain, "seq": seq, "parent": parent, "kind": DELTA})
+    _write(
+        manifest_path(base_path, seq),
+        hashes.items(),
+        session,
+        {"chain": chain, "seq": seq, "hash_key": base_meta["hash_key"]},
+    )
+    # only the base manifest (for differentials) and the newest one are read again
+    _remove(stale for stale_seq, stale in manifests.items() if stale_seq not in (0, seq))
+    return BackupResult(DELTA, path, seq, added, changed, len(deleted))
+
+
+def restore(base_path: str, password: str) -> Dict[str, str]:
+    """
+    Replay the chain at `base_path`: the base, then each delta on the path from
+    the newest delta back to the base. Deltas left over from an older chain are
+    skipped. Raises ValueError if a file fails to verify or a delta is missing.
+    The KDF runs once, for the base; its session opens the deltas.
+    """
+    if not os.path.exists(base_path):
+        raise FileNotFoundError(base_path)
+    meta, records, session = _read(base_path, password)
+    chain = meta.get("chain")
+    state = dict(records)
+    deltas = {}
+    for seq, path in _numbered(base_path, DELTA_TAG).items():
+        delta_meta, delta_records, delta_session = _read(path, password, session)
+        # a chain whose base predates chain sessions: the first keyed delta has it
+        session = session or delta_session
+        if delta_meta.get("chain") != chain or delta_meta.get("seq") != seq:
+            # left over from an older chain
+            continue
+        deltas[seq] = (delta_meta.get("parent", seq - 1), delta_records)
+    if not deltas:
+        return state
+
+    order = []
+    seq = max(deltas)
+    while seq != 0:
+        if seq not in deltas:
+            raise ValueError(f"Backup chain is missing delta {seq}")
+        order.append(seq)
+        seq = deltas[seq][0]
+    for seq in reversed(order):
+        for site, pwd in deltas[seq][1]:
+            if pwd is None:
+                state.pop(site, None)
+            else:
+                state[site] = pwd
+    return state
+
+
+def collapse(base_path: str, password: str) -> BackupResult:
+    """Replay the chain into a new full base and remove its deltas."""
+    state = restore(base_path, password)
+    return _full(state.items(), password, base_path)
@@ -0,0 +1,107 @@
+from typing import Any, Callable, Dict, Iterable, List, MutableMapping, Optional, Tuple
+
+# A staged change: the stored value, or None for a deletion
+Change = Optional[str]
+
+
+class Batch:
+    """
+    Changes staged by one thread inside Vault.batch(). Reads through a batch see
+    them on top of the enclosing batch (`parent`) or the committed entries; other
+    threads see nothing until the outermost batch is applied.
+    """
+
+    __slots__ = ("parent", "changes", "cleared")
+
+    def __init__(self, parent: Optional["Batch"] = None) -> None:
+        self.parent = parent
+        self.changes: Dict[str, Change] = {}
+        self.cleared = False  # every entry committed before the batch is gone
+
+    def __len__(self) -> int:
+        return len(self.changes)
+
+    def put(self, site: str, value: str) -> None:
+        self.changes[site] = value
+
+    def delete(self, site: str) -> None:
+        self.changes[site] = None
+
+    def clear(self) -> None:
+        self.changes.clear()
+        self.cleared = True
+
+    def lookup(self, site: str) -> Tuple[bool, Change]:
+        """(True, change) if some batch in the chain decides `site`, else (False, None)."""
+        batch: Optional[Batch] = self
+        while batch is not None:
+            if site in batch.changes:
+                return True, batch.changes[site]
+            if batch.cleared:
+                return True, None
+            batch = batch.parent
+        return False, None
+
+    def overlay(
+        self, rows: Iterable[Tuple[str, Any]], convert: Optional[Callable[[str], Any]] = None
+    ) -> Dict[str, Any]:
+        """
+        Committed (site, value) `rows` with the staged changes applied; staged
+        passwords go through `convert` first (e.g. len for summaries).
+        """
+        if self.cleared:
+            result: Dict[str, Any] = {}
+        elif self.parent is not None:
+            result = self.parent.overlay(rows, convert)
+        else:
+            result = dict(rows)
+        for site, change in self.changes.items():
+            if change is None:
+                result.pop(site, None)
+            else:
+                result[site] = change if convert is None else convert(change)
+        return result
+
+    def merge_into(self, parent: "Batch") -> None:
+        """Hand the changes of a nested batch that completed to the enclosing one."""
+        if self.cleared:
+            parent.clear()
+        parent.changes.update(self.changes)
+
+    def apply(
+        self, data: MutableMapping[str, str]
+    ) -> Tuple[Dict[str, Optional[str]], List[str], List[str]]:
+        """
+        Apply the changes to the committed `data`. Returns the undo log (old value,
+        or None if the site was absent), the written sites and the removed sites.
+        """
+        undo: Dict[str, Optional[str]] = {}
+        written: List[str] = []
+        removed: List[str] = []
+        if self.cleared:
+            for site in list(data):
+                if self.changes.get(site) is None:
+                    undo[site] = data[site]
+                    del data[site]
+                    removed.append(site)
+        for site, change in self.changes.items():
+            if change is None:
+                if site in data:
+                    undo[site] = data[site]
+                    del data[site]
+                    removed.append(site)
+                continue
+            if site not in undo:
+                undo[site] = data[site] if site in data else None
+            data[site] = change
+            written.append(site)
+        return undo, written, removed
+
+    @staticmethod
+    def revert(data: MutableMapping[str, str], undo: Dict[str, Optional[str]]) -> None:
+        """Put `data` back as it was before apply() returned `undo`."""
+        for site, old in undo.items():
+            if old is None:
+                data.pop(site, None)
+            else:
+                data[site] = old
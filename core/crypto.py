@@ -1,13 +1,148 @@
 import os
 import base64
-from typing import Tuple
+import hashlib
+import hmac
+from typing import Iterable, List, Optional, Sequence, Tuple, Union
 from cryptography.hazmat.primitives.ciphers.aead import AESGCM
 from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
 from cryptography.hazmat.primitives import hashes
 
+from . import kdf as kdf_mod
+
 
 NONCE_SIZE = 12
 KEY_SIZE = 32  # 32 Bytes -> 128 bits
+PBKDF2_ITERATIONS = 390000
+KEY_CHECK_SIZE = 16
+_KEY_CHECK_LABEL = b"personal-safe key check"
+_WRAP_LABEL = b"personal-safe data key"
+# nonce | wrapped data key | GCM tag
+WRAPPED_KEY_SIZE = NONCE_SIZE + KEY_SIZE + 16
+_SUBKEY_SALT = b"personal-safe entry keys"
+# Vault header flags, stored after the wrapped data key
+FLAG_SUBKEYS = 0x01
+
+
+# bytes, bytearray or memoryview
+Buffer = Union[bytes, bytearray, memoryview]
+
+
+class IncorrectPasswordError(ValueError):
+    """The master password does not unlock the vault."""
+
+
+class Cipher:
+    """
+    AES-GCM keyed once and reused for many records. Works on bytes-like objects
+    (memoryview slices of a file are not copied) and returns sealed records as
+    raw bytes: nonce | ciphertext | tag, without base64.
+    """
+
+    __slots__ = ("_aesgcm",)
+
+    def __init__(self, key: bytes) -> None:
+        if len(key) not in (16, 24, 32):
+            raise ValueError("key must be 16, 24, or 32 bytes")
+        self._aesgcm = AESGCM(key)
+
+    def seal(self, plaintext: Buffer, associated_data: Optional[Buffer] = None) -> bytes:
+        nonce = os.urandom(NONCE_SIZE)
+        return nonce + self._aesgcm.encrypt(nonce, plaintext, associated_data)
+
+    def open(self, sealed: Buffer, associated_data: Optional[Buffer] = None) -> bytes:
+        """Raises cryptography's InvalidTag if `sealed` or its associated data was altered."""
+        view = memoryview(sealed)
+        return self._aesgcm.decrypt(view[:NONCE_SIZE], view[NONCE_SIZE:], associated_data)
+
+    def encrypt_many(
+        self,
+        plaintexts: Sequence[Buffer],
+        associated_data: Optional[Sequence[Optional[Buffer]]] = None,
+    ) -> List[bytes]:
+        """seal() each record, with `associated_data[i]` for record i if given."""
+        if associated_data is not None and len(associated_data) != len(plaintexts):
+            raise ValueError("associated_data must have one item per record")
+        # one urandom call for all nonces
+        nonces = memoryview(os.urandom(NONCE_SIZE * len(plaintexts)))
+        encrypt = self._aesgcm.encrypt
+        out = []
+        for i, plaintext in enumerate(plaintexts):
+            nonce = nonces[i * NONCE_SIZE : (i + 1) * NONCE_SIZE]
+            aad = associated_data[i] if associated_data is not None else None
+            out.append(nonce.tobytes() + encrypt(nonce, plaintext, aad))
+        return out
+
+    def decrypt_many(
+        self,
+        sealed: Iterable[Buffer],
+        associated_data: Optional[Sequence[Optional[Buffer]]] = None,
+    ) -> List[bytes]:
+        """open() each record; fails on the first one that does not authenticate."""
+        decrypt = self._aesgcm.decrypt
+        out = []
+        for i, record in enumerate(sealed):
+            view = memoryview(record)
+            aad = associated_data[i] if associated_data is not None else None
+            out.append(decrypt(view[:NONCE_SIZE], view[NONCE_SIZE:], aad))
+        return out
+
+
+class KeySchedule:
+    """
+    Per-record keys derived from a data key with HKDF-SHA256 (RFC 5869): one
+    extract with a fixed salt, then one expand block per record with the record
+    id as info. Records are sealed under their own subkey, so they can be sealed,
+    re-sealed and verified independently, and random nonces only have to be
+    unique per record rather than across the whole vault.
+
+    Same interface as Cipher; the associated data is also the record id.
+    """
+
+    __slots__ = ("_expand",)
+
+    def __init__(self, key: bytes) -> None:
+        # HKDF-Extract; the HMAC keyed with the PRK is copied for every expand
+        prk = hmac.new(_SUBKEY_SALT, key, hashlib.sha256).digest()
+        self._expand = hmac.new(prk, digestmod=hashlib.sha256)
+
+    def subkey(self, record_id: Buffer) -> bytes:
+        # HKDF-Expand for a single 32-byte block: T(1) = HMAC(PRK, info | 0x01)
+        mac = self._expand.copy()
+        mac.update(record_id)
+        mac.update(b"\x01")
+        return mac.digest()
+
+    def seal(self, plaintext: Buffer, associated_data: Optional[Buffer] = None) -> bytes:
+        record_id = associated_data or b""
+        return Cipher(self.subkey(record_id)).seal(plaintext, record_id)
+
+    def open(self, sealed: Buffer, associated_data: Optional[Buffer] = None) -> bytes:
+        record_id = associated_data or b""
+        return Cipher(self.subkey(record_id)).open(sealed, record_id)
+
+    def encrypt_many(
+        self,
+        plaintexts: Sequence[Buffer],
+        associated_data: Optional[Sequence[Optional[Buffer]]] = None,
+    ) -> List[bytes]:
+        if associated_data is None:
+            associated_data = [None] * len(plaintexts)
+        if len(associated_data) != len(plaintexts):
+            raise ValueError("associated_data must have one item per record")
+        return [self.seal(p, a) for p, a in zip(plaintexts, associated_data)]
+
+    def decrypt_many(
+        self,
+        sealed: Iterable[Buffer],
+        associated_data: Optional[Sequence[Optional[Buffer]]] = None,
+    ) -> List[bytes]:
+        if associated_data is None:
+            return [self.open(record) for record in sealed]
+        return [self.open(record, a) for record, a in zip(sealed, associated_data)]
+
+
+# Seals individually stored records (see SessionKey.record_cipher)
+RecordCipher = Union[Cipher, KeySchedule]
 
 
 class CryptoUtils:
@@ -23,16 +158,8 @@ class CryptoUtils:
         Encrypt plaintext with AES-GCM
         Returns a base64 string with nonce and cipher text
         """
-        if len(key) not in (16, 24, 32):
-            raise ValueError("key must be 16, 24, or 32 bytes")
-        aesgcm = AESGCM(key)
-
-        # A String only to be used once for increased security.
-        nonce = os.urandom(NONCE_SIZE)
-
-        # Creates the cipher tag
-        ct = aesgcm.encrypt(nonce, plaintext.encode(), associated_data=None)
-        return base64.b64encode(nonce + ct).decode()
+        # The nonce is random and only used once; seal() prepends it to the cipher text
+        return base64.b64encode(Cipher(key).seal(plaintext.encode())).decode()
 
     @staticmethod
     def decrypt(token_b64: str, key: bytes) -> str:
@@ -40,19 +167,37 @@ class CryptoUtils:
         Decrypt a base64 token produced by encrypt()
         Returns the plaintext string
         """
-        if len(key) not in (16, 24, 32):
-            raise ValueError("key must be 16, 24, or 32 bytes")
         data = base64.b64decode(token_b64.encode())
+        return Cipher(key).open(data).decode()
 
-        # Slice the data to obtain the nonce and cipher tag
-        nonce, ct = data[:NONCE_SIZE], data[NONCE_SIZE:]
+    @staticmethod
+    def encrypt_many(
+        plaintexts: Sequence[Buffer],
+        key: bytes,
+        associated_data: Optional[Sequence[Optional[Buffer]]] = None,
+    ) -> List[bytes]:
+        """
+        Encrypt a batch of byte records with one keyed cipher
+        Returns raw nonce + cipher text records (see Cipher)
+        """
+        return Cipher(key).encrypt_many(plaintexts, associated_data)
 
-        aesgcm = AESGCM(key)
-        plaintext = aesgcm.decrypt(nonce, ct, associated_data=None)
-        return plaintext.decode()
+    @staticmethod
+    def decrypt_many(
+        sealed: Iterable[Buffer],
+        key: bytes,
+        associated_data: Optional[Sequence[Optional[Buffer]]] = None,
+    ) -> List[bytes]:
+        """
+        Decrypt records produced by encrypt_many()
+        Returns the plaintext bytes
+        """
+        return Cipher(key).decrypt_many(sealed, associated_data)
 
     @staticmethod
-    def derive_key(password: str, salt: bytes, iterations: int = 390000) -> bytes:
+    def derive_key(
+        password: str, salt: bytes, iterations: int = PBKDF2_ITERATIONS
+    ) -> bytes:
         """
         Derive a KEY_SIZE key from a password using PBKDF2-HMAC
         Returns raw bytes suitable for AESGCM
@@ -70,3 +215,126 @@ class CryptoUtils:
     def generate_salt(length: int = 16) -> bytes:
         """Return a random salt"""
         return os.urandom(length)
+
+
+class SessionKey:
+    """
+    Key material for an unlocked vault.
+    Derived once at login and reused for every save during the session, so only
+    unlocking pays for the KDF. The salt and KDF parameters stay stable until the
+    vault is re-keyed.
+
+    Vaults use envelope encryption: `key` is a random data key that encrypts the
+    entries, and `kek`, derived from the master password, wraps it (`wrapped` is
+    stored in the vault header). Changing the password or KDF only rewraps the data
+    key (see rewrap()). Legacy vaults encrypt directly with the derived key, in
+    which case key is kek and wrapped is None.
+
+    `flags` (FLAG_*) are stored in the header next to the wrapped key; new vaults
+    seal individually stored records under per-record subkeys (FLAG_SUBKEYS).
+    """
+
+    __slots__ = ("key", "salt", "kdf", "kek", "wrapped", "flags")
+
+    def __init__(
+        self,
+        key: bytes,
+        salt: bytes,
+        kdf: Optional[kdf_mod.KdfParams] = None,
+        kek: Optional[bytes] = None,
+        wrapped: Optional[bytes] = None,
+        flags: int = 0,
+    ) -> None:
+        self.key = key
+        self.salt = salt
+        self.kdf = kdf or kdf_mod.LEGACY
+        self.kek = kek if kek is not None else key
+        self.wrapped = wrapped
+        self.flags = flags
+
+    @classmethod
+    def derive(
+        cls,
+        password: str,
+        salt: Optional[bytes] = None,
+        kdf: Optional[kdf_mod.KdfParams] = None,
+        check: Optional[bytes] = None,
+        wrapped: Optional[bytes] = None,
+        flags: int = 0,
+    ) -> "SessionKey":
+        """
+        Run the KDF once. Without a salt this is a new vault: a fresh salt and data
+        key are generated and, unless `kdf` is given, parameters are calibrated for
+        this machine. An existing salt without `kdf` means a legacy PBKDF2 vault.
+        A `check` from the header is verified and a `wrapped` data key unwrapped;
+        both raise IncorrectPasswordError if the password is wrong. `flags` come
+        from the header of an envelope vault; new vaults get FLAG_SUBKEYS.
+        """
+        if kdf is None:
+            kdf = kdf_mod.LEGACY if salt is not None else kdf_mod.calibrate()
+        if salt is None:
+            salt = CryptoUtils.generate_salt()
+            kek = kdf.derive(password, salt, KEY_SIZE)
+            return cls._wrap(os.urandom(KEY_SIZE), salt, kdf, kek, FLAG_SUBKEYS)
+        kek = kdf.derive(password, salt, KEY_SIZE)
+        session = cls(kek, salt, kdf)
+        if check is not None:
+            session.verify(check)
+        if wrapped is None:
+            return session
+        try:
+            key = AESGCM(kek).decrypt(
+                wrapped[:NONCE_SIZE], bytes(wrapped[NONCE_SIZE:]), _WRAP_LABEL
+            )
+        except Exception:
+            if check is not None:
+                raise ValueError("Wrapped vault key is corrupt")
+            raise IncorrectPasswordError("Incorrect master password")
+        return cls(key, salt, kdf, kek, bytes(wrapped), flags)
+
+    @classmethod
+    def _wrap(
+        cls, key: bytes, salt: bytes, kdf: kdf_mod.KdfParams, kek: bytes, flags: int
+    ) -> "SessionKey":
+        nonce = os.urandom(NONCE_SIZE)
+        wrapped = nonce + AESGCM(kek).encrypt(nonce, key, _WRAP_LABEL)
+        return cls(key, salt, kdf, kek, wrapped, flags)
+
+    @property
+    def envelope(self) -> bool:
+        return self.wrapped is not None
+
+    @property
+    def subkeys(self) -> bool:
+        return bool(self.flags & FLAG_SUBKEYS)
+
+    def record_cipher(self) -> RecordCipher:
+        """Cipher for individually sealed records, using per-record subkeys if flagged."""
+        return KeySchedule(self.key) if self.subkeys else Cipher(self.key)
+
+    def rewrap(
+        self, password: str, kdf: Optional[kdf_mod.KdfParams] = None
+    ) -> "SessionKey":
+        """
+        Same data key wrapped under `password` with a fresh salt and `kdf` (default:
+        calibrated). Only headers change; nothing encrypted with the data key does.
+        """
+        kdf = kdf or kdf_mod.calibrate()
+        salt = CryptoUtils.generate_salt()
+        kek = kdf.derive(password, salt, KEY_SIZE)
+        return self._wrap(self.key, salt, kdf, kek, self.flags)
+
+    def key_check(self) -> bytes:
+        """Value stored in vault headers to authenticate the password without decrypting."""
+        return hmac.new(self.kek, _KEY_CHECK_LABEL, hashlib.sha256).digest()[:KEY_CHECK_SIZE]
+
+    def verify(self, check: bytes) -> None:
+        """Raise IncorrectPasswordError unless `check` matches this key."""
+        if not hmac.compare_digest(self.key_check(), bytes(check)):
+            raise IncorrectPasswordError("Incorrect master password")
+
+    def encrypt(self, plaintext: str) -> str:
+        return CryptoUtils.encrypt(plaintext, self.key)
+
+    def decrypt(self, token_b64: str) -> str:
+        return CryptoUtils.decrypt(token_b64, self.key)
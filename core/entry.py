@@ -0,0 +1,238 @@
+"""
+Vault entry records.
+
+Every vault value is a string. A bare password (schema 0, what every vault held
+before entries had more fields) decodes to an Entry with only a password; an
+Entry with anything else is stored as a NUL-prefixed, schema-versioned JSON
+array. Values are encrypted per entry, so they carry tag names; in memory tags
+are small interned ids shared by every entry.
+
+An entry's stamp (modified, version), used to merge backups, lives in its
+record, so every backend stores it with the row. It is the only record of when
+an entry changed: next_stamp() is what sets `modified`, whenever the vault
+stores a value. Backups and merges carry values without it (see split_stamp())
+and the stamp next to them.
+"""
+import json
+import threading
+import time
+from typing import Dict, Iterable, List, Mapping, Optional, Tuple
+
+SCHEMA_VERSION = 1
+_MARKER = "\x00"  # never the first character of a real password; see encode()
+
+# (modified, version): unix seconds of the last change and a counter bumped by it
+Stamp = Tuple[int, int]
+
+# Decoded entries of 100k typical logins (see tests/test_entry.py) stay under this
+MEMORY_BUDGET_100K = 40 * 1024 * 1024
+
+
+class TagTable:
+    """Interns tag names to small ints and tag sets to shared tuples."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._ids: Dict[str, int] = {}
+        self._names: List[str] = []
+        self._sets: Dict[Tuple[int, ...], Tuple[int, ...]] = {(): ()}
+
+    def intern(self, name: str) -> int:
+        with self._lock:
+            tag_id = self._ids.get(name)
+            if tag_id is None:
+                tag_id = self._ids[name] = len(self._names)
+                self._names.append(name)
+            return tag_id
+
+    def ids(self, names: Iterable[str]) -> Tuple[int, ...]:
+        """Sorted, de-duplicated ids of `names`, as a tuple shared by equal tag sets."""
+        key = tuple(sorted({self.intern(name) for name in names if name}))
+        return self._sets.setdefault(key, key)
+
+    def name(self, tag_id: int) -> str:
+        return self._names[tag_id]
+
+    def names(self, tag_ids: Iterable[int]) -> List[str]:
+        return [self._names[tag_id] for tag_id in tag_ids]
+
+
+TAGS = TagTable()
+
+
+class Entry:
+    """
+    One vault entry. Timestamps are unix seconds (0 if unknown); tags are TAGS ids.
+    (modified, version) is the entry's stamp, set by the vault when it stores the
+    entry (version 0: never stored by a vault).
+    """
+
+    __slots__ = (
+        "site", "password", "username", "url", "notes", "tags", "created", "modified", "version"
+    )
+
+    def __init__(
+        self,
+        site: str,
+        password: str,
+        username: str = "",
+        url: str = "",
+        notes: str = "",
+        tags: Tuple[int, ...] = (),
+        created: int = 0,
+        modified: int = 0,
+        version: int = 0,
+    ) -> None:
+        self.site = site
+        self.password = password
+        self.username = username
+        self.url = url
+        self.notes = notes
+        self.tags = tags
+        self.created = created
+        self.modified = modified
+        self.version = version
+
+    @classmethod
+    def new(
+        cls, site: str, password: str, tag_names: Iterable[str] = (), now: Optional[float] = None, **fields
+    ) -> "Entry":
+        """An entry created now, with tags given by name; storing it stamps it."""
+        created = int(time.time() if now is None else now)
+        return cls(site, password, tags=TAGS.ids(tag_names), created=created, **fields)
+
+    @property
+    def tag_names(self) -> List[str]:
+        return TAGS.names(self.tags)
+
+    @property
+    def is_flat(self) -> bool:
+        """True if the entry is just a password and is stored as one."""
+        return not (
+            self.username or self.url or self.notes or self.tags
+            or self.created or self.modified or self.version
+        )
+
+    @property
+    def stamp(self) -> Optional[Stamp]:
+        return (self.modified, self.version) if self.version else None
+
+    def encode(self) -> str:
+        """The stored value: the bare password for flat entries, else the current schema."""
+        if self.is_flat and not self.password.startswith(_MARKER):
+            return self.password
+        fields = [
+            SCHEMA_VERSION,
+            self.password,
+            self.username,
+            self.url,
+            self.notes,
+            TAGS.names(self.tags),
+            self.created,
+            self.modified,
+            self.version,
+        ]
+        return _MARKER + json.dumps(fields, ensure_ascii=False, separators=(",", ":"))
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, Entry):
+            return NotImplemented
+        return all(getattr(self, name) == getattr(other, name) for name in self.__slots__)
+
+    def __repr__(self) -> str:
+        return f"Entry({self.site!r}, user={self.username!r}, tags={self.tag_names})"
+
+
+def _fields(site: str, value: str) -> list:
+    # the field list of a record (not a bare password)
+    try:
+        fields = json.loads(value[1:])
+        if fields[0] == SCHEMA_VERSION and len(fields) == 9:
+            return fields
+    except (ValueError, KeyError, IndexError, TypeError):
+        pass
+    raise ValueError(f"Unreadable entry record for {site!r}")
+
+
+def decode(site: str, value: str) -> Entry:
+    """The Entry stored as `value`; raises ValueError for an unknown or damaged schema."""
+    if not value.startswith(_MARKER):
+        return Entry(site, value)
+    _, password, username, url, notes, tag_names, created, modified, version = _fields(
+        site, value
+    )
+    return Entry(
+        site,
+        password,
+        username or "",
+        url or "",
+        notes or "",
+        TAGS.ids(tag_names or ()),
+        int(created or 0),
+        int(modified or 0),
+        int(version or 0),
+    )
+
+
+def password_of(value: str) -> str:
+    """The password in a stored value, without building an Entry for flat ones."""
+    return value if not value.startswith(_MARKER) else _fields("", value)[1]
+
+
+def secret_length(value: str) -> int:
+    """Length of the password in a stored value; backends keep it for masked display."""
+    return len(password_of(value))
+
+
+def with_password(value: Optional[str], site: str, password: str) -> str:
+    """`value` with its password replaced, keeping the other fields of a rich entry."""
+    if value is None or not value.startswith(_MARKER):
+        return password if not password.startswith(_MARKER) else Entry(site, password).encode()
+    entry = decode(site, value)
+    entry.password = password
+    return entry.encode()
+
+
+def stamp_of(site: str, value: str) -> Optional[Stamp]:
+    """The stamp stored in `value`, or None if it was never stamped."""
+    if not value.startswith(_MARKER):
+        return None
+    fields = _fields(site, value)
+    return (fields[7], fields[8]) if fields[8] else None
+
+
+def next_stamp(site: str, previous: Optional[str], now: Optional[float] = None) -> Stamp:
+    """The stamp of a change made now to the entry stored as `previous` (None: a new entry)."""
+    stamp = stamp_of(site, previous) if previous is not None else None
+    return int(time.time() if now is None else now), (stamp[1] if stamp else 0) + 1
+
+
+def with_stamp(site: str, value: str, stamp: Stamp) -> str:
+    """`value` stamped (modified, version) = `stamp`."""
+    entry = decode(site, value)
+    entry.modified, entry.version = stamp
+    return entry.encode()
+
+
+def split_stamp(site: str, value: str) -> Tuple[str, Optional[Stamp]]:
+    """
+    (value without its stamp, stamp) as backups and merges carry entries, so two
+    copies of an entry compare equal however often each was stamped. A stamped
+    entry holding only a password splits into the bare password.
+    """
+    if not value.startswith(_MARKER):
+        return value, None
+    fields = _fields(site, value)
+    if not fields[8]:
+        return value, None
+    stamp = (fields[7], fields[8])
+    password = fields[1]
+    if not any(fields[2:7]) and not password.startswith(_MARKER):
+        return password, stamp
+    fields[0], fields[7], fields[8] = SCHEMA_VERSION, 0, 0
+    return _MARKER + json.dumps(fields, ensure_ascii=False, separators=(",", ":")), stamp
+
+
+def migrate(data: Mapping[str, str]) -> Dict[str, Entry]:
+    """Entries for a site -> value mapping, whether its values are flat passwords or records."""
+    return {site: decode(site, value) for site, value in data.items()}
@@ -0,0 +1,201 @@
+"""
+Streaming export of vault entries as CSV, JSON lines or an encrypted backup.
+
+Scriptable without the UI:
+    python -m core.exporters vault.json export.csv --fields site,password --filter "*.example.com"
+"""
+import argparse
+import csv
+import fnmatch
+import getpass
+import io
+import json
+import os
+import sys
+from typing import TYPE_CHECKING, Callable, Iterable, Iterator, List, Optional, Sequence, Tuple, Union
+
+from . import backup as backup_mod
+from . import entry as entry_mod
+from . import storage
+from .entry import Stamp
+
+if TYPE_CHECKING:
+    from .vault import Vault
+
+CSV = "csv"
+JSONL = "jsonl"
+ENCRYPTED = "encrypted"  # streaming backup (see backup.write_backup); importable
+FORMATS = (CSV, JSONL, ENCRYPTED)
+_EXTENSIONS = {".csv": CSV, ".jsonl": JSONL, ".ndjson": JSONL, ".psafe": ENCRYPTED}
+
+FIELDS = ("site", "password", "username", "url", "notes", "tags", "modified", "version")
+DEFAULT_FIELDS = ("site", "password")
+
+SiteFilter = Union[str, Callable[[str], bool], None]
+Row = Tuple[str, str, Optional[Stamp]]
+
+
+def format_for(path: str) -> str:
+    """Export format implied by the extension of `path`."""
+    fmt = _EXTENSIONS.get(os.path.splitext(path)[1].lower())
+    if fmt is None:
+        raise ValueError(f"Cannot tell the export format of {path!r}; use .csv, .jsonl or .psafe")
+    return fmt
+
+
+def site_matcher(site_filter: SiteFilter) -> Optional[Callable[[str], bool]]:
+    """
+    A predicate for `site_filter`: a callable as is, a glob pattern ("*.example.com")
+    or else a substring, both case-insensitive; None matches everything.
+    """
+    if site_filter is None or callable(site_filter):
+        return site_filter
+    pattern = site_filter.lower()
+    if any(ch in pattern for ch in "*?["):
+        return lambda site: fnmatch.fnmatchcase(site.lower(), pattern)
+    return lambda site: pattern in site.lower()
+
+
+def check_fields(fields: Sequence[str]) -> Tuple[str, ...]:
+    fields = tuple(fields)
+    unknown = [f for f in fields if f not in FIELDS]
+    if unknown or not fields:
+        raise ValueError(f"Unknown export fields {unknown}; choose from {', '.join(FIELDS)}")
+    return fields
+
+
+def project(rows: Iterable[Row], fields: Sequence[str]) -> Iterator[List[object]]:
+    """The selected `fields` of each (site, stored value, stamp) row, in order."""
+    for site, value, stamp in rows:
+        entry = entry_mod.decode(site, value)
+        values = {
+            "site": site,
+            "password": entry.password,
+            "username": entry.username,
+            "url": entry.url,
+            "notes": entry.notes,
+            "tags": entry.tag_names,
+            "modified": stamp[0] if stamp else None,
+            "version": stamp[1] if stamp else None,
+        }
+        yield [values[f] for f in fields]
+
+
+def write_csv(f: io.TextIOBase, rows: Iterable[Row], fields: Sequence[str]) -> int:
+    writer = csv.writer(f)
+    writer.writerow(fields)
+    count = 0
+    for values in project(rows, fields):
+        writer.writerow(
+            [";".join(v) if isinstance(v, list) else "" if v is None else v for v in values]
+        )
+        count += 1
+    return count
+
+
+def write_jsonl(f: io.TextIOBase, rows: Iterable[Row], fields: Sequence[str]) -> int:
+    count = 0
+    for values in project(rows, fields):
+        f.write(json.dumps(dict(zip(fields, values)), ensure_ascii=False) + "\n")
+        count += 1
+    return count
+
+
+def _backup_rows(rows: Iterable[Row], fields: Sequence[str]) -> Iterator[Tuple[object, ...]]:
+    stamped = "modified" in fields or "version" in fields
+    for site, pwd, stamp in rows:
+        yield (site, pwd, *stamp) if stamped and stamp else (site, pwd)
+
+
+def export_rows(
+    rows: Iterable[Row],
+    path: str,
+    fmt: Optional[str] = None,
+    fields: Sequence[str] = DEFAULT_FIELDS,
+    password: Optional[str] = None,
+) -> int:
+    """
+    Stream (site, stored value, stamp) `rows` to `path` and return how many were
+    written; memory use does not depend on their number. Plaintext files are
+    created readable by the owner only and renamed into place when complete.
+    The encrypted format needs `password` and always holds whole entries
+    (stamps too if selected), so it can be imported again.
+    """
+    fmt = fmt or format_for(path)
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown export format {fmt!r}")
+    fields = check_fields(fields)
+    if fmt == ENCRYPTED:
+        if not password:
+            raise ValueError("Password required for an encrypted export")
+        return backup_mod.save_backup_entries(_backup_rows(rows, fields), password, path)
+
+    tmp = path + ".tmp"
+    try:
+        fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with open(fd, "w", encoding="utf-8", newline="") as f:
+            if fmt == CSV:
+                count = write_csv(f, rows, fields)
+            else:
+                count = write_jsonl(f, rows, fields)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+    return count
+
+
+def export_vault(
+    vault: "Vault",
+    path: str,
+    fmt: Optional[str] = None,
+    fields: Sequence[str] = DEFAULT_FIELDS,
+    site_filter: SiteFilter = None,
+    password: Optional[str] = None,
+) -> int:
+    """Export the entries of `vault` matching `site_filter` (see export_rows and site_matcher)."""
+    return export_rows(vault.iter_entries(site_matcher(site_filter)), path, fmt, fields, password)
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="python -m core.exporters", description="Export vault entries without the UI."
+    )
+    parser.add_argument("vault", help="vault file (vault.json, vault.db, ...)")
+    parser.add_argument("output", help="file to write; the extension picks the format by default")
+    parser.add_argument("--format", choices=FORMATS, help="csv, jsonl or encrypted")
+    parser.add_argument(
+        "--fields",
+        default=",".join(DEFAULT_FIELDS),
+        help=f"comma-separated, from {','.join(FIELDS)} (default: %(default)s)",
+    )
+    parser.add_argument("--filter", dest="site_filter", help="glob pattern or substring of site names")
+    args = parser.parse_args(argv)
+    # Opening a missing file would create an empty vault and export nothing
+    if not storage.vault_exists(args.vault):
+        parser.error(f"no vault at {args.vault}")
+
+    from .vault import Vault
+
+    master_password = getpass.getpass("Master password: ")
+    vault = Vault(master_password, vault_file=args.vault, flush_delay=None)
+    try:
+        count = export_vault(
+            vault,
+            args.output,
+            args.format,
+            [f.strip() for f in args.fields.split(",") if f.strip()],
+            args.site_filter,
+            master_password,
+        )
+    finally:
+        vault.close(flush=False)
+    print(f"Exported {count} entries to {args.output}", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,252 @@
+import csv
+import io
+import os
+import xml.etree.ElementTree as ET
+from typing import TYPE_CHECKING, BinaryIO, Dict, Iterator, Optional
+from urllib.parse import urlsplit
+
+from .entry import Entry
+from .unlock import ProgressCallback, report
+
+if TYPE_CHECKING:
+    from .vault import Vault
+
+# Supported export layouts
+CHROME = "chrome"  # name,url,username,password[,note]
+FIREFOX = "firefox"  # url,username,password,httpRealm,formActionOrigin,guid,...
+BITWARDEN = "bitwarden"  # folder,favorite,type,name,notes,fields,reprompt,login_uri,...
+KEEPASS = "keepass"  # KeePass 2.x XML export
+FORMATS = (CHROME, FIREFOX, BITWARDEN, KEEPASS)
+
+# CSV columns per layout: url, username, password, display name
+_CSV_COLUMNS = {
+    CHROME: ("url", "username", "password", "name"),
+    FIREFOX: ("url", "username", "password", None),
+    BITWARDEN: ("login_uri", "login_username", "login_password", "name"),
+}
+_PROGRESS_STEP = 0.01  # report at most every 1% of the file
+
+
+class Credential:
+    """One login read from an export, before it becomes a vault entry."""
+
+    __slots__ = ("site", "username", "password")
+
+    def __init__(self, site: str, username: str, password: str) -> None:
+        self.site = site
+        self.username = username
+        self.password = password
+
+    def __repr__(self) -> str:
+        return f"Credential({self.site!r}, {self.username!r})"
+
+
+class ImportResult:
+    """Counts from import_file()."""
+
+    __slots__ = ("added", "updated", "unchanged", "duplicates", "conflicts", "invalid")
+
+    def __init__(self) -> None:
+        self.added = 0
+        self.updated = 0
+        self.unchanged = 0  # already in the vault with the same password
+        self.duplicates = 0  # repeated within the file
+        self.conflicts = 0  # in the vault with another password (kept, overwrite=False)
+        self.invalid = 0  # no site or no password
+
+    def __repr__(self) -> str:
+        return (
+            f"ImportResult(+{self.added} ~{self.updated} ={self.unchanged} "
+            f"dup {self.duplicates}, conflicts {self.conflicts}, invalid {self.invalid})"
+        )
+
+
+class _ProgressReader(io.RawIOBase):
+    """Binary file wrapper that reports the fraction of it read so far."""
+
+    def __init__(self, f: BinaryIO, total: int, progress: Optional[ProgressCallback]) -> None:
+        self._f = f
+        self._total = max(total, 1)
+        self._progress = progress
+        self._done = 0
+        self._reported = 0.0
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buf) -> int:
+        data = self._f.read(len(buf))
+        buf[: len(data)] = data
+        self._done += len(data)
+        fraction = min(self._done / self._total, 1.0)
+        if fraction - self._reported >= _PROGRESS_STEP:
+            self._reported = fraction
+            report(self._progress, fraction, "Reading")
+        return len(data)
+
+
+def normalize_site(url: str, fallback: str = "") -> str:
+    """
+    Vault site name for a login: the URL's host, lower-cased and without a
+    leading "www.", or the stripped `fallback` (the entry's title) if the URL
+    has no host.
+    """
+    url = (url or "").strip()
+    if url:
+        host = urlsplit(url if "://" in url else "//" + url).hostname or ""
+        if host.startswith("www."):
+            host = host[4:]
+        if host:
+            return host
+    return (fallback or "").strip()
+
+
+def detect_csv_layout(header) -> Optional[str]:
+    columns = {name.strip() for name in header if name}
+    if "login_password" in columns:
+        return BITWARDEN
+    if {"url", "username", "password"} <= columns:
+        return FIREFOX if "name" not in columns else CHROME
+    return None
+
+
+def iter_csv(f: io.TextIOBase, layout: Optional[str] = None) -> Iterator[Credential]:
+    """Yield the logins of a Chrome, Firefox or Bitwarden CSV export, row by row."""
+    reader = csv.reader(f)
+    header = next(reader, None)
+    if header is None:
+        return
+    header = [name.strip() for name in header]
+    layout = layout or detect_csv_layout(header)
+    if layout not in _CSV_COLUMNS:
+        raise ValueError("Unrecognized CSV export (expected Chrome, Firefox or Bitwarden)")
+    index = {name: i for i, name in enumerate(header)}
+    url_col, user_col, pwd_col, name_col = (
+        index.get(name) if name else None for name in _CSV_COLUMNS[layout]
+    )
+    type_col = index.get("type") if layout == BITWARDEN else None
+    if pwd_col is None:
+        raise ValueError(f"CSV export has no {_CSV_COLUMNS[layout][2]} column")
+
+    def field(row, col) -> str:
+        return row[col] if col is not None and col < len(row) else ""
+
+    for row in reader:
+        if type_col is not None and field(row, type_col) not in ("", "login"):
+            continue
+        yield Credential(
+            normalize_site(field(row, url_col), field(row, name_col)),
+            field(row, user_col),
+            field(row, pwd_col),
+        )
+
+
+def iter_keepass_xml(f: BinaryIO) -> Iterator[Credential]:
+    """
+    Yield the logins of a KeePass 2.x XML export as each <Entry> closes; parsed
+    elements are cleared, so memory does not grow with the file. Old versions
+    kept under <History> are skipped.
+    """
+    history = 0
+    for event, elem in ET.iterparse(f, events=("start", "end")):
+        tag = elem.tag
+        if tag == "History":
+            history += 1 if event == "start" else -1
+            if event == "end":
+                elem.clear()
+            continue
+        if event != "end" or tag != "Entry":
+            continue
+        if not history:
+            fields: Dict[str, str] = {}
+            for string in elem.iterfind("String"):
+                fields[string.findtext("Key") or ""] = string.findtext("Value") or ""
+            yield Credential(
+                normalize_site(fields.get("URL", ""), fields.get("Title", "")),
+                fields.get("UserName", ""),
+                fields.get("Password", ""),
+            )
+        elem.clear()
+
+
+def iter_file(
+    path: str, fmt: Optional[str] = None, progress: Optional[ProgressCallback] = None
+) -> Iterator[Credential]:
+    """Stream the logins of the export at `path`; `fmt` defaults to the file extension and CSV header."""
+    if fmt is not None and fmt not in FORMATS:
+        raise ValueError(f"Unknown import format {fmt!r}")
+    if fmt is None and path.lower().endswith(".xml"):
+        fmt = KEEPASS
+    with open(path, "rb") as raw:
+        f = _ProgressReader(raw, os.path.getsize(path), progress)
+        if fmt == KEEPASS:
+            yield from iter_keepass_xml(io.BufferedReader(f))
+            return
+        text = io.TextIOWrapper(io.BufferedReader(f), encoding="utf-8-sig", newline="")
+        yield from iter_csv(text, fmt)
+
+
+def dedupe(credentials: Iterator[Credential], result: ImportResult) -> Iterator[Credential]:
+    """
+    One credential per distinct login. Exact repeats are dropped; a second
+    login for the same site with another password becomes "site (username)".
+    """
+    seen: Dict[str, str] = {}
+    for cred in credentials:
+        if not cred.site or not cred.password:
+            result.invalid += 1
+            continue
+        site = cred.site
+        if site in seen and seen[site] != cred.password:
+            suffix = cred.username or "2"
+            site = f"{cred.site} ({suffix})"
+            n = 2
+            while site in seen and seen[site] != cred.password:
+                n += 1
+                site = f"{cred.site} ({suffix} {n})"
+        if seen.get(site) == cred.password:
+            result.duplicates += 1
+            continue
+        seen[site] = cred.password
+        yield Credential(site, cred.username, cred.password)
+
+
+def import_file(
+    vault: "Vault",
+    path: str,
+    fmt: Optional[str] = None,
+    overwrite: bool = False,
+    progress: Optional[ProgressCallback] = None,
+) -> ImportResult:
+    """
+    Import the export at `path` into `vault` in one batch and one save, with
+    usernames. Sites already in the vault with another password are kept unless
+    `overwrite`; one with the same password only gains a missing username.
+    `progress(fraction, message)` follows the file as it is read; an exception
+    raised from it (or a parse error) leaves the vault unchanged.
+    """
+    result = ImportResult()
+    report(progress, 0.0, "Reading")
+    with vault.batch():
+        for cred in dedupe(iter_file(path, fmt, progress), result):
+            # one lookup per imported site: the rest of the vault stays sealed
+            current = vault.get_entry(cred.site)
+            if current is None:
+                result.added += 1
+                vault.put_entry(Entry.new(cred.site, cred.password, username=cred.username))
+            elif current.password == cred.password:
+                if cred.username and not current.username:
+                    current.username = cred.username
+                    result.updated += 1
+                    vault.put_entry(current)
+                else:
+                    result.unchanged += 1
+            elif overwrite:
+                result.updated += 1
+                current.password = cred.password
+                current.username = cred.username or current.username
+                vault.put_entry(current)
+            else:
+                result.conflicts += 1
+    report(progress, 1.0, "Imported")
+    return result
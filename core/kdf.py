@@ -0,0 +1,184 @@
+import math
+import os
+import time
+from typing import Dict, List, Optional, Tuple
+
+from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
+from cryptography.hazmat.primitives.kdf.scrypt import Scrypt
+
+try:
+    from cryptography.hazmat.primitives.kdf.argon2 import Argon2id
+
+    _HAS_ARGON2 = True
+except Exception:
+    _HAS_ARGON2 = False
+
+# KDF ids as stored in vault headers
+PBKDF2_SHA256 = 1
+SCRYPT = 2
+ARGON2ID = 3
+
+NAMES = {PBKDF2_SHA256: "pbkdf2-sha256", SCRYPT: "scrypt", ARGON2ID: "argon2id"}
+_PREFERENCE = (ARGON2ID, SCRYPT, PBKDF2_SHA256)  # strongest first
+
+TARGET_UNLOCK_SECONDS = 0.3
+
+MIN_PBKDF2_ITERATIONS = 100_000
+MAX_PBKDF2_ITERATIONS = 10_000_000
+SCRYPT_R = 8
+SCRYPT_P = 1
+MIN_SCRYPT_LOG2_N = 14
+MAX_SCRYPT_LOG2_N = 20  # 1 GiB of memory with r=8
+ARGON2_MEMORY_KIB = 64 * 1024
+ARGON2_LANES = 4
+MAX_ARGON2_ITERATIONS = 64
+
+_PROBE_PBKDF2_ITERATIONS = 20_000
+
+
+class KdfParams:
+    """
+    A KDF and its cost parameters, stored in vault headers as an id plus three u32s:
+      PBKDF2-SHA256: (iterations, 0, 0)
+      scrypt:        (log2 N, r, p)
+      Argon2id:      (iterations, memory in KiB, lanes)
+    """
+
+    __slots__ = ("kdf_id", "params")
+
+    def __init__(self, kdf_id: int, params: Tuple[int, int, int]) -> None:
+        if kdf_id not in NAMES:
+            raise ValueError(f"Unsupported KDF id {kdf_id}")
+        self.kdf_id = kdf_id
+        self.params = tuple(params)
+
+    def __eq__(self, other: object) -> bool:
+        return (
+            isinstance(other, KdfParams)
+            and self.kdf_id == other.kdf_id
+            and self.params == other.params
+        )
+
+    def __hash__(self) -> int:
+        return hash((self.kdf_id, self.params))
+
+    def __repr__(self) -> str:
+        return f"KdfParams({self.name}, {self.params})"
+
+    @property
+    def name(self) -> str:
+        return NAMES[self.kdf_id]
+
+    def to_dict(self) -> Dict[str, object]:
+        """JSON form used by files that are not binary vaults (backups, recovery slots)."""
+        return {"id": self.kdf_id, "params": list(self.params)}
+
+    @classmethod
+    def from_dict(cls, field: Dict[str, object]) -> "KdfParams":
+        return cls(int(field["id"]), tuple(int(p) for p in field["params"]))
+
+    def cost(self) -> int:
+        """Rough relative work factor, comparable between parameters of the same KDF."""
+        a, b, c = self.params
+        if self.kdf_id == PBKDF2_SHA256:
+            return a
+        if self.kdf_id == SCRYPT:
+            return (1 << a) * b * c
+        return a * b
+
+    def derive(self, password: str, salt: bytes, length: int = 32) -> bytes:
+        a, b, c = self.params
+        if self.kdf_id == PBKDF2_SHA256:
+            kdf = PBKDF2HMAC(
+                algorithm=hashes.SHA256(), length=length, salt=salt, iterations=a
+            )
+        elif self.kdf_id == SCRYPT:
+            kdf = Scrypt(salt=salt, length=length, n=1 << a, r=b, p=c)
+        else:
+            if not _HAS_ARGON2:
+                raise ValueError("Argon2id is not available in this build")
+            kdf = Argon2id(
+                salt=salt, length=length, iterations=a, memory_cost=b, lanes=c
+            )
+        return kdf.derive(password.encode())
+
+
+def pbkdf2(iterations: int) -> KdfParams:
+    return KdfParams(PBKDF2_SHA256, (iterations, 0, 0))
+
+
+# Parameters of vaults written before KDFs were recorded in the header
+LEGACY = pbkdf2(390000)
+
+
+def available() -> List[int]:
+    """KDF ids usable on this machine, strongest first."""
+    ids = []
+    for kdf_id in _PREFERENCE:
+        if kdf_id == ARGON2ID:
+            if not _HAS_ARGON2:
+                continue
+            try:
+                KdfParams(ARGON2ID, (1, 8, 1)).derive("probe", b"\0" * 16)
+            except Exception:
+                continue
+        ids.append(kdf_id)
+    return ids
+
+
+def _time_derive(params: KdfParams) -> float:
+    salt = os.urandom(16)
+    start = time.perf_counter()
+    params.derive("calibration-probe", salt)
+    return max(time.perf_counter() - start, 1e-6)
+
+
+def _calibrate(kdf_id: int, target: float) -> KdfParams:
+    if kdf_id == PBKDF2_SHA256:
+        elapsed = _time_derive(pbkdf2(_PROBE_PBKDF2_ITERATIONS))
+        iterations = int(_PROBE_PBKDF2_ITERATIONS * target / elapsed) // 1000 * 1000
+        iterations = min(max(iterations, MIN_PBKDF2_ITERATIONS), MAX_PBKDF2_ITERATIONS)
+        return pbkdf2(iterations)
+    if kdf_id == SCRYPT:
+        probe = KdfParams(SCRYPT, (MIN_SCRYPT_LOG2_N, SCRYPT_R, SCRYPT_P))
+        elapsed = _time_derive(probe)
+        log2_n = MIN_SCRYPT_LOG2_N + int(math.floor(math.log2(max(target / elapsed, 1))))
+        log2_n = min(log2_n, MAX_SCRYPT_LOG2_N)
+        return KdfParams(SCRYPT, (log2_n, SCRYPT_R, SCRYPT_P))
+    probe = KdfParams(ARGON2ID, (1, ARGON2_MEMORY_KIB, ARGON2_LANES))
+    elapsed = _time_derive(probe)
+    iterations = min(max(int(target / elapsed), 1), MAX_ARGON2_ITERATIONS)
+    return KdfParams(ARGON2ID, (iterations, ARGON2_MEMORY_KIB, ARGON2_LANES))
+
+
+_calibrated: Dict[Tuple[int, float], KdfParams] = {}
+
+
+def calibrate(
+    kdf_id: Optional[int] = None, target: float = TARGET_UNLOCK_SECONDS
+) -> KdfParams:
+    """
+    Benchmark this machine and return parameters for `kdf_id` (default: the strongest
+    available KDF) that take about `target` seconds to derive. Results are cached
+    for the life of the process.
+    """
+    if kdf_id is None:
+        kdf_id = available()[0]
+    cached = _calibrated.get((kdf_id, target))
+    if cached is None:
+        cached = _calibrated[(kdf_id, target)] = _calibrate(kdf_id, target)
+    return cached
+
+
+def is_outdated(params: KdfParams, target: float = TARGET_UNLOCK_SECONDS) -> bool:
+    """
+    True if a vault using `params` should be re-tuned on this machine: a stronger KDF
+    is available, or unlocking takes under half or over twice the target.
+    """
+    best = calibrate(target=target)
+    if _PREFERENCE.index(params.kdf_id) > _PREFERENCE.index(best.kdf_id):
+        return True
+    if params.kdf_id != best.kdf_id:
+        return False
+    return not (best.cost() / 2 <= params.cost() <= best.cost() * 2)
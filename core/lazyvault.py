@@ -0,0 +1,235 @@
+import json
+import struct
+import threading
+from typing import Dict, Iterator, MutableMapping, Tuple, Union
+
+from .crypto import RecordCipher, SessionKey
+from . import entry as entry_mod, parallel, vaultfile
+
+_INDEX_LEN = struct.Struct(">I")
+
+
+class SealedValue:
+    """Location of one sealed password inside the values area of an indexed vault file."""
+
+    __slots__ = ("offset", "length", "size")
+
+    def __init__(self, offset: int, length: int, size: int) -> None:
+        self.offset = offset
+        self.length = length
+        self.size = size  # password length in characters, for masked display
+
+
+def is_indexed_vault(path: str) -> bool:
+    """Return True if `path` is a binary vault using the indexed (v3) layout."""
+    try:
+        with open(path, "rb") as f:
+            return vaultfile.read_header(f).version == vaultfile.INDEXED_VERSION
+    except (OSError, ValueError):
+        return False
+
+
+class LazyEntries(MutableMapping):
+    """
+    Site -> password mapping backed by an indexed vault file.
+    File format (vaultfile.INDEXED_VERSION):
+      header | index length (u32 BE) | nonce + sealed index | sealed values
+    The index lists every site with the offset, length and password length of its
+    value. Values are sealed one by one with the site name as associated data (and
+    subkey id, see SessionKey.record_cipher) and are only decrypted when read, so unlocking costs one small decrypt and plaintext
+    passwords are not kept in memory. Values set during the session stay as plain
+    strings until the next write() seals them.
+    """
+
+    def __init__(self, path: str, session: SessionKey) -> None:
+        self.path = path
+        self._session = session
+        self._cipher = session.record_cipher()
+        self._entries: Dict[str, Union[str, SealedValue]] = {}
+        self._values_start = 0
+        # Guards the entries and the file swap; FileBackend uses it as the vault lock,
+        # so write() snapshots a batch being applied whole
+        self.lock = threading.RLock()
+        # One write() at a time: a second waits (releasing `lock`) for the first to
+        # swap its file in, so sealed values never point into a replaced file
+        self._idle = threading.Condition(self.lock)
+        self._writing = False
+
+    @classmethod
+    def open(cls, path: str, session: SessionKey) -> "LazyEntries":
+        """Read and decrypt only the site index of the vault at `path`."""
+        entries = cls(path, session)
+        with open(path, "rb") as f:
+            header = vaultfile.read_header(f)
+            (index_len,) = _INDEX_LEN.unpack(f.read(_INDEX_LEN.size))
+            sealed = f.read(index_len)
+            entries._values_start = f.tell()
+        index = entries._cipher.open(sealed, header.encode())
+        for site, offset, length, size in json.loads(index):
+            entries._entries[site] = SealedValue(offset, length, size)
+        return entries
+
+    def __getitem__(self, site: str) -> str:
+        value = self._entries[site]
+        if isinstance(value, str):
+            return value
+        with self.lock:
+            value = self._entries[site]
+            if isinstance(value, str):
+                return value
+            with open(self.path, "rb") as f:
+                f.seek(self._values_start + value.offset)
+                blob = f.read(value.length)
+        return self._cipher.open(blob, site.encode()).decode()
+
+    def __setitem__(self, site: str, pwd: str) -> None:
+        with self.lock:
+            self._entries[site] = pwd
+
+    def __delitem__(self, site: str) -> None:
+        with self.lock:
+            del self._entries[site]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(list(self._entries))
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, site: object) -> bool:
+        return site in self._entries
+
+    def clear(self) -> None:
+        with self.lock:
+            self._entries.clear()
+
+    def secret_length(self, site: str) -> int:
+        """Length of the password for `site` without decrypting it."""
+        value = self._entries[site]
+        return entry_mod.secret_length(value) if isinstance(value, str) else value.size
+
+    def decrypt_all(self) -> Dict[str, str]:
+        """
+        Every entry as plaintext, in order. The values area is read once and sealed
+        values are decrypted together, in parallel for large vaults.
+        """
+        with self.lock:
+            entries = dict(self._entries)
+            sealed = [site for site, value in entries.items() if isinstance(value, SealedValue)]
+            values = memoryview(b"")
+            if sealed:
+                with open(self.path, "rb") as f:
+                    f.seek(self._values_start)
+                    values = memoryview(f.read())
+        blobs = []
+        for site in sealed:
+            value = entries[site]
+            blobs.append(values[value.offset : value.offset + value.length])
+        plain = parallel.decrypt_many(self._cipher, blobs, [site.encode() for site in sealed])
+        opened = dict(zip(sealed, plain))
+        return {
+            site: value if isinstance(value, str) else opened[site].decode()
+            for site, value in entries.items()
+        }
+
+    def rekey(self, session: SessionKey) -> None:
+        """
+        Switch to `session`. With a new data key, sealed values are decrypted with the
+        old key and held as plaintext until the next write() seals them under the new
+        one; a rewrapped session (same data key) keeps them sealed.
+        """
+        with self.lock:
+            # a write in progress seals under the old key; let it swap its file in first
+            while self._writing:
+                self._idle.wait()
+            if session.key != self._session.key:
+                for site in list(self._entries):
+                    self._entries[site] = self[site]
+            self._session = session
+            self._cipher = session.record_cipher()
+
+    def write(self) -> None:
+        """
+        Write the current entries as a new indexed file. New values are sealed
+        outside the lock; entries unchanged since the snapshot are then swapped to
+        their sealed form, dropping any plaintext held for them.
+        """
+        with self.lock:
+            while self._writing:
+                self._idle.wait()
+            self._writing = True
+            snapshot = dict(self._entries)
+            session, cipher, values_start = self._session, self._cipher, self._values_start
+        try:
+            data, written, new_start = _encode(
+                self.path, session, cipher, snapshot, values_start
+            )
+            with self.lock:
+                vaultfile.atomic_write(self.path, data)
+                self._values_start = new_start
+                for site, sealed in written.items():
+                    # a value set or removed since the snapshot stays as it is
+                    if self._entries.get(site) is snapshot[site]:
+                        self._entries[site] = sealed
+        finally:
+            with self.lock:
+                self._writing = False
+                self._idle.notify_all()
+
+
+def _encode(
+    path: str,
+    session: SessionKey,
+    cipher: RecordCipher,
+    snapshot: Dict[str, Union[str, SealedValue]],
+    old_values_start: int,
+) -> Tuple[bytes, Dict[str, SealedValue], int]:
+    # seal all new values in one batch; sealed ones are copied from the old file
+    plain = [site for site, value in snapshot.items() if isinstance(value, str)]
+    sealed = dict(
+        zip(
+            plain,
+            cipher.encrypt_many(
+                [snapshot[site].encode() for site in plain], [site.encode() for site in plain]
+            ),
+        )
+    )
+    blobs = []
+    index = []
+    written: Dict[str, SealedValue] = {}
+    offset = 0
+    old = None
+    try:
+        if len(sealed) < len(snapshot):
+            old = open(path, "rb")
+        for site, value in snapshot.items():
+            if isinstance(value, SealedValue):
+                # still sealed on disk: copy the ciphertext as is
+                old.seek(old_values_start + value.offset)
+                blob = old.read(value.length)
+                size = value.size
+            else:
+                blob = sealed[site]
+                size = entry_mod.secret_length(value)
+            blobs.append(blob)
+            index.append((site, offset, len(blob), size))
+            written[site] = SealedValue(offset, len(blob), size)
+            offset += len(blob)
+    finally:
+        if old is not None:
+            old.close()
+
+    header = vaultfile.VaultHeader.for_session(
+        session, version=vaultfile.INDEXED_VERSION
+    ).encode()
+    index_pt = json.dumps(index, separators=(",", ":")).encode()
+    sealed_index = cipher.seal(index_pt, header)
+    prefix = header + _INDEX_LEN.pack(len(sealed_index)) + sealed_index
+    return prefix + b"".join(blobs), written, len(prefix)
+
+
+def write_entries(path: str, session: SessionKey, entries: Dict[str, str]) -> None:
+    """Write a plain dict as an indexed vault file."""
+    lazy = LazyEntries(path, session)
+    lazy.update(entries)
+    lazy.write()
@@ -0,0 +1,105 @@
+import inspect
+import logging
+import threading
+import time
+from typing import Any, Callable, Optional, Tuple
+
+from .unlock import Dispatch
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DELAY = 0.15  # seconds without a new query before the latest one runs
+
+
+def _call_now(fn: Callable[[], None]) -> None:
+    fn()
+
+
+class LiveFilter:
+    """
+    Evaluates the latest of a stream of queries (a filter box being typed into)
+    on a worker thread. A query runs once no newer one has arrived for `delay`
+    seconds; `run(query, cancelled)` can poll cancelled() to give up on a query
+    that has been superseded, and a stale result is never delivered. A `run`
+    that is a generator delivers every result it yields (say a first page of
+    matches, then all of them) until a newer query supersedes it.
+    on_result(query, result) goes through `dispatch`, e.g. Clock.schedule_once,
+    so a UI gets it on its own thread.
+    """
+
+    def __init__(
+        self,
+        run: Callable[[str, Callable[[], bool]], Any],
+        on_result: Callable[[str, Any], None],
+        delay: float = DEFAULT_DELAY,
+        dispatch: Optional[Dispatch] = None,
+    ) -> None:
+        self._run = run
+        self._on_result = on_result
+        self._delay = delay
+        self._dispatch = dispatch or _call_now
+        self._cond = threading.Condition()
+        self._generation = 0
+        self._pending: Optional[Tuple[int, str, float]] = None  # generation, query, deadline
+        self._closed = False
+        self._thread: Optional[threading.Thread] = None
+
+    def submit(self, query: str, delay: Optional[float] = None) -> None:
+        """Replace any pending or running query with `query`."""
+        with self._cond:
+            if self._closed:
+                return
+            self._generation += 1
+            deadline = time.monotonic() + (self._delay if delay is None else delay)
+            self._pending = (self._generation, query, deadline)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._loop, name="vault-filter", daemon=True)
+                self._thread.start()
+            self._cond.notify()
+
+    def cancel(self) -> None:
+        """Drop the pending query and the result of any running one."""
+        with self._cond:
+            self._generation += 1
+            self._pending = None
+
+    def close(self) -> None:
+        with self._cond:
+            self._closed = True
+            self._generation += 1
+            self._pending = None
+            self._cond.notify()
+
+    def _current(self, generation: int) -> bool:
+        return generation == self._generation
+
+    def _loop(self) -> None:
+        while True:
+            with self._cond:
+                while not self._closed:
+                    if self._pending is None:
+                        self._cond.wait()
+                        continue
+                    remaining = self._pending[2] - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                if self._closed:
+                    return
+                generation, query, _ = self._pending
+                self._pending = None
+
+            cancelled = lambda: not self._current(generation)
+            try:
+                result = self._run(query, cancelled)
+                for part in result if inspect.isgenerator(result) else (result,):
+                    if cancelled():
+                        break
+                    self._dispatch(lambda part=part: self._deliver(generation, query, part))
+            except Exception:
+                logger.exception("Filter query %r failed", query)
+
+    def _deliver(self, generation: int, query: str, result: Any) -> None:
+        # a newer query may have arrived while this result waited for dispatch
+        if self._current(generation):
+            self._on_result(query, result)
@@ -11,6 +11,7 @@ import secrets
 from email.message import EmailMessage
 from tkinter import simpledialog, messagebox
 from typing import Tuple
+from core import storage
 
 masterHashFile = os.path.join(os.path.expanduser("~"), ".vaultMaster.hash")
 recoveryFile = os.path.join(os.path.expanduser("~"), ".vaultRecovery.json")
@@ -24,6 +25,17 @@ def createMasterPassword(password: str):
         f.write(hashed)
     print("Master password created")
 
+def masterPasswordExists() -> bool:
+    "True once a master password is set: a vault exists or a legacy hash file does"
+    return storage.vault_exists() or os.path.exists(masterHashFile)
+
+def retireMasterHash() -> None:
+    "Remove the legacy bcrypt hash once the vault header carries its own key check"
+    try:
+        os.remove(masterHashFile)
+    except FileNotFoundError:
+        pass
+
 def verifyMasterPassword(password: str) -> bool:
     "Check master password"
     password = password.strip()
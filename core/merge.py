@@ -0,0 +1,166 @@
+import time
+from typing import Callable, Dict, Iterable, Iterator, List, Mapping, Optional, Set, Tuple
+
+from .entry import Stamp
+
+# How an incoming entry relates to the vault
+ADDED = "added"  # not in the vault
+UPDATED = "updated"  # incoming is newer by version and time
+CONFLICT = "conflict"  # both changed, or history unknown; needs a resolution
+UNCHANGED = "unchanged"  # same password, or the vault's copy is newer
+
+# Conflict resolutions
+KEEP_NEWER = "newer"  # later modification time wins, the vault on ties
+KEEP_LOCAL = "local"
+KEEP_INCOMING = "incoming"
+RESOLUTIONS = (KEEP_NEWER, KEEP_LOCAL, KEEP_INCOMING)
+
+
+def classify(
+    local: str, local_stamp: Optional[Stamp], incoming: str, incoming_stamp: Optional[Stamp]
+) -> str:
+    """
+    Compare two versions of one entry. Version counters order edits made from a
+    common history; modification times must agree with them, otherwise (or if
+    either side has no stamp) both sides changed and it is a conflict.
+    """
+    if local == incoming:
+        return UNCHANGED
+    if local_stamp is None or incoming_stamp is None:
+        return CONFLICT
+    (local_modified, local_version), (incoming_modified, incoming_version) = (
+        local_stamp,
+        incoming_stamp,
+    )
+    if incoming_version > local_version and incoming_modified >= local_modified:
+        return UPDATED
+    if incoming_version < local_version and incoming_modified <= local_modified:
+        return UNCHANGED
+    return CONFLICT
+
+
+class MergeItem:
+    """One entry that a merge would add, update or has to resolve."""
+
+    __slots__ = ("site", "kind", "local", "incoming", "local_stamp", "incoming_stamp")
+
+    def __init__(
+        self,
+        site: str,
+        kind: str,
+        local: Optional[str],
+        incoming: str,
+        local_stamp: Optional[Stamp],
+        incoming_stamp: Optional[Stamp],
+    ) -> None:
+        self.site = site
+        self.kind = kind
+        self.local = local
+        self.incoming = incoming
+        self.local_stamp = local_stamp
+        self.incoming_stamp = incoming_stamp
+
+    def __repr__(self) -> str:
+        return f"MergeItem({self.site!r}, {self.kind})"
+
+    def incoming_wins(self, resolution: str = KEEP_NEWER) -> bool:
+        if self.kind != CONFLICT:
+            return True
+        if resolution == KEEP_INCOMING:
+            return True
+        if resolution == KEEP_LOCAL:
+            return False
+        local_modified = self.local_stamp[0] if self.local_stamp else 0
+        incoming_modified = self.incoming_stamp[0] if self.incoming_stamp else 0
+        return incoming_modified > local_modified
+
+
+class MergePlan:
+    """
+    The diff between the vault and an incoming backup, from plan(). Entries only
+    in the vault are left alone; `unchanged` only counts the entries that match.
+    The plan reflects the vault when it was made.
+    """
+
+    __slots__ = ("added", "updated", "conflicts", "unchanged")
+
+    def __init__(self) -> None:
+        self.added: List[MergeItem] = []
+        self.updated: List[MergeItem] = []
+        self.conflicts: List[MergeItem] = []
+        self.unchanged = 0
+
+    def __repr__(self) -> str:
+        return (
+            f"MergePlan(+{len(self.added)} ~{len(self.updated)} "
+            f"!{len(self.conflicts)} ={self.unchanged})"
+        )
+
+    def counts(self) -> Dict[str, int]:
+        return {
+            ADDED: len(self.added),
+            UPDATED: len(self.updated),
+            CONFLICT: len(self.conflicts),
+            UNCHANGED: self.unchanged,
+        }
+
+    @property
+    def empty(self) -> bool:
+        return not (self.added or self.updated or self.conflicts)
+
+    def changes(
+        self,
+        resolution: str = KEEP_NEWER,
+        choices: Optional[Mapping[str, str]] = None,
+        now: Optional[float] = None,
+    ) -> Iterator[Tuple[str, str, Stamp]]:
+        """
+        (site, password, stamp) to write. Added and updated entries keep their
+        incoming stamp. A resolved conflict gets a stamp newer than both sides, so
+        merging the same backup again finds nothing to do; the vault's copy is
+        re-stamped even when it wins. `choices` overrides `resolution` per site.
+        """
+        if resolution not in RESOLUTIONS:
+            raise ValueError(f"Unknown conflict resolution {resolution!r}")
+        modified = int(time.time() if now is None else now)
+        for item in self.added + self.updated:
+            yield item.site, item.incoming, item.incoming_stamp or (modified, 1)
+        for item in self.conflicts:
+            chosen = (choices or {}).get(item.site, resolution)
+            versions = [s[1] for s in (item.local_stamp, item.incoming_stamp) if s]
+            stamp = (modified, max(versions, default=0) + 1)
+            if item.incoming_wins(chosen):
+                yield item.site, item.incoming, stamp
+            else:
+                yield item.site, item.local, stamp
+
+
+def plan(
+    local: Mapping[str, str],
+    local_stamp: Callable[[str], Optional[Stamp]],
+    incoming: Iterable[Tuple[str, str, Optional[Stamp]]],
+) -> MergePlan:
+    """
+    Diff `incoming` (site, password, stamp) against `local` in one pass, with a
+    dict lookup per entry. Raises ValueError for malformed or repeated entries.
+    """
+    result = MergePlan()
+    seen: Set[str] = set()
+    for site, pwd, stamp in incoming:
+        if not isinstance(site, str) or not isinstance(pwd, str):
+            raise ValueError("Backup entries malformed")
+        if site in seen:
+            raise ValueError(f"Backup lists {site!r} twice")
+        seen.add(site)
+        current = local.get(site)
+        if current is None:
+            result.added.append(MergeItem(site, ADDED, None, pwd, None, stamp))
+            continue
+        mine = local_stamp(site)
+        kind = classify(current, mine, pwd, stamp)
+        if kind == UNCHANGED:
+            result.unchanged += 1
+        else:
+            item = MergeItem(site, kind, current, pwd, mine, stamp)
+            (result.updated if kind == UPDATED else result.conflicts).append(item)
+    return result
@@ -0,0 +1,56 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Sequence
+
+from .crypto import Buffer, RecordCipher
+
+# Below this many records one thread is faster than handing out the work
+PARALLEL_THRESHOLD = 4096
+MAX_WORKERS = min(8, os.cpu_count() or 1)
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def _pool() -> ThreadPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=MAX_WORKERS, thread_name_prefix="vault-decrypt"
+            )
+        return _executor
+
+
+def decrypt_many(
+    cipher: RecordCipher,
+    sealed: Sequence[Buffer],
+    associated_data: Optional[Sequence[Optional[Buffer]]] = None,
+    threshold: Optional[int] = None,
+    workers: Optional[int] = None,
+) -> List[bytes]:
+    """
+    cipher.decrypt_many() split into one chunk per worker on a shared, bounded thread
+    pool (AES-GCM releases the GIL). Batches under `threshold` records (default
+    PARALLEL_THRESHOLD), and machines with a single core, decrypt on the calling
+    thread. Results keep the input order.
+    """
+    threshold = PARALLEL_THRESHOLD if threshold is None else threshold
+    workers = MAX_WORKERS if workers is None else workers
+    count = len(sealed)
+    if count < threshold or workers < 2:
+        return cipher.decrypt_many(sealed, associated_data)
+    size = -(-count // workers)
+    futures = [
+        _pool().submit(
+            cipher.decrypt_many,
+            sealed[start : start + size],
+            associated_data[start : start + size] if associated_data is not None else None,
+        )
+        for start in range(0, count, size)
+    ]
+    out: List[bytes] = []
+    for future in futures:
+        out.extend(future.result())
+    return out
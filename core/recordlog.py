@@ -0,0 +1,269 @@
+import json
+import os
+import shutil
+import struct
+import threading
+from typing import Dict, Optional, Tuple
+
+from . import kdf as kdf_mod
+from . import parallel
+from .crypto import KEY_CHECK_SIZE, SessionKey
+
+LOG_MAGIC = b"PSLOG"
+LOG_VERSION = 1
+
+# Compact once at least this many records are dead and they outnumber live ones
+COMPACT_MIN_DEAD = 1000
+
+_FRAME_LEN = struct.Struct(">I")
+_SEQ = struct.Struct(">Q")
+_KDF = struct.Struct(">BIII")  # kdf id | 3 x kdf parameter
+
+
+def is_record_log(path: str) -> bool:
+    """Return True if `path` holds an append-only record log."""
+    try:
+        with open(path, "rb") as f:
+            return f.read(len(LOG_MAGIC)) == LOG_MAGIC
+    except OSError:
+        return False
+
+
+_Header = Tuple[bytes, kdf_mod.KdfParams, bytes, Optional[bytes], int]
+
+
+def read_header(path: str) -> _Header:
+    """
+    Return the salt, KDF parameters, key check, wrapped data key (None for a
+    directly keyed log) and flags of a record log.
+    """
+    with open(path, "rb") as f:
+        return _read_header(f)
+
+
+def _read_header(f) -> _Header:
+    head = f.read(len(LOG_MAGIC) + 2)
+    if len(head) < len(LOG_MAGIC) + 2 or head[: len(LOG_MAGIC)] != LOG_MAGIC:
+        raise ValueError("Not a record log")
+    version, salt_len = head[len(LOG_MAGIC)], head[len(LOG_MAGIC) + 1]
+    if version != LOG_VERSION:
+        raise ValueError(f"Unsupported record log version {version}")
+    salt = f.read(salt_len)
+    raw = f.read(_KDF.size)
+    check = f.read(KEY_CHECK_SIZE)
+    wrapped_len = f.read(1)
+    if (
+        len(salt) != salt_len
+        or len(raw) != _KDF.size
+        or len(check) != KEY_CHECK_SIZE
+        or not wrapped_len
+    ):
+        raise ValueError("Truncated record log header")
+    wrapped = f.read(wrapped_len[0])
+    flags = f.read(1)
+    if len(wrapped) != wrapped_len[0] or not flags:
+        raise ValueError("Truncated record log header")
+    kdf_id, *params = _KDF.unpack(raw)
+    return salt, kdf_mod.KdfParams(kdf_id, tuple(params)), check, wrapped or None, flags[0]
+
+
+def _header(session: SessionKey) -> bytes:
+    wrapped = session.wrapped or b""
+    return (
+        LOG_MAGIC
+        + bytes((LOG_VERSION, len(session.salt)))
+        + session.salt
+        + _KDF.pack(session.kdf.kdf_id, *session.kdf.params)
+        + session.key_check()
+        + bytes((len(wrapped),))
+        + wrapped
+        + bytes((session.flags,))
+    )
+
+
+class RecordLog:
+    """
+    Vault file made of individually AES-GCM sealed put/delete records.
+    File format:
+      header: b"PSLOG" | version (u8, 1) | salt length (u8) | salt
+              | kdf id (u8) | 3 x kdf parameter (u32 BE)
+              | key check (16)
+              | wrapped key length (u8) | wrapped data key (empty if directly keyed)
+              | flags (u8)
+      frames: length (u32 BE) | nonce | ciphertext
+    Each record is sealed with its sequence number as associated data, so records
+    cannot be reordered or replayed. With crypto.FLAG_SUBKEYS the sequence number
+    also selects the record's subkey. Changing one entry appends one frame; the log is
+    rewritten with only live records once dead records pass COMPACT_MIN_DEAD.
+    """
+
+    def __init__(self, path: str, session: SessionKey) -> None:
+        self.path = path
+        self._session = session
+        self._cipher = session.record_cipher()
+        self._lock = threading.Lock()
+        self._live: set = set()
+        self._records = 0
+        self._end: Optional[int] = None  # offset after the last good frame
+        self._broken = False
+        self._compactor: Optional[threading.Thread] = None
+
+    @property
+    def dead_records(self) -> int:
+        return self._records - len(self._live)
+
+    def replay(self) -> Dict[str, str]:
+        """Read the whole log and return the live entries."""
+        with self._lock:
+            return self._replay()
+
+    def put(self, site: str, pwd: str) -> None:
+        with self._lock:
+            self._append({"op": "put", "site": site, "pwd": pwd})
+            self._live.add(site)
+        self.maybe_compact()
+
+    def delete(self, site: str) -> None:
+        with self._lock:
+            self._append({"op": "del", "site": site})
+            self._live.discard(site)
+        self.maybe_compact()
+
+    def rewrite(self, entries: Dict[str, str]) -> None:
+        """Replace the log with one put record per entry."""
+        with self._lock:
+            self._write_compacted(entries)
+
+    def rewrap(self, session: SessionKey) -> None:
+        """
+        Switch to `session`, which must use the same data key (see SessionKey.rewrap):
+        the header is replaced and the sealed frames are copied unchanged.
+        """
+        if session.key != self._session.key:
+            raise ValueError("rewrap() needs a session with the same data key")
+        with self._lock:
+            tmp = self.path + ".tmp"
+            header = _header(session)
+            with open(self.path, "rb") as src, open(tmp, "wb") as dst:
+                _read_header(src)
+                old_len = src.tell()
+                dst.write(header)
+                shutil.copyfileobj(src, dst)
+                dst.flush()
+                os.fsync(dst.fileno())
+            os.replace(tmp, self.path)
+            self._session = session
+            if self._end is not None:
+                self._end += len(header) - old_len
+
+    def compact(self) -> None:
+        """Drop dead records by replaying the log and rewriting only live entries."""
+        with self._lock:
+            if self._broken:
+                return
+            self._write_compacted(self._replay())
+
+    def maybe_compact(self, background: bool = True) -> None:
+        """Compact if enough dead records piled up; by default on a daemon thread."""
+        dead = self.dead_records
+        if dead < COMPACT_MIN_DEAD or dead <= len(self._live):
+            return
+        if not background:
+            self.compact()
+            return
+        if self._compactor is not None and self._compactor.is_alive():
+            return
+        self._compactor = threading.Thread(target=self.compact, daemon=True)
+        self._compactor.start()
+
+    def wait_for_compaction(self) -> None:
+        if self._compactor is not None:
+            self._compactor.join()
+
+    # Internals; callers hold self._lock
+
+    def _seal(self, seq: int, record: dict) -> bytes:
+        plaintext = json.dumps(record, separators=(",", ":")).encode()
+        sealed = self._cipher.seal(plaintext, _SEQ.pack(seq))
+        return _FRAME_LEN.pack(len(sealed)) + sealed
+
+    def _replay(self) -> Dict[str, str]:
+        data: Dict[str, str] = {}
+        self._live = set()
+        self._records = 0
+        self._end = None
+        try:
+            f = open(self.path, "rb")
+        except FileNotFoundError:
+            return data
+        with f:
+            _read_header(f)
+            start = f.tell()
+            view = memoryview(f.read())
+        # frame all records first so they can be decrypted as one batch
+        frames = []
+        pos = 0
+        while pos + _FRAME_LEN.size <= len(view):
+            (length,) = _FRAME_LEN.unpack_from(view, pos)
+            if pos + _FRAME_LEN.size + length > len(view):
+                # torn write at the tail: ignore it, the next append overwrites it
+                break
+            pos += _FRAME_LEN.size
+            frames.append(view[pos : pos + length])
+            pos += length
+        try:
+            plaintexts = parallel.decrypt_many(
+                self._cipher, frames, [_SEQ.pack(seq) for seq in range(len(frames))]
+            )
+        except Exception:
+            # wrong password or tampering; refuse to append to this file
+            self._broken = True
+            raise ValueError("Record log failed authentication")
+        for plaintext in plaintexts:
+            record = json.loads(plaintext)
+            if record["op"] == "put":
+                data[record["site"]] = record["pwd"]
+            else:
+                data.pop(record["site"], None)
+        self._records = len(frames)
+        self._live = set(data)
+        self._end = start + pos
+        return data
+
+    def _append(self, record: dict) -> None:
+        if self._broken:
+            raise ValueError("Record log failed authentication; refusing to write")
+        if self._end is None:
+            if os.path.exists(self.path):
+                self._replay()
+            else:
+                with open(self.path, "wb") as f:
+                    f.write(_header(self._session))
+                    self._end = f.tell()
+        frame = self._seal(self._records, record)
+        with open(self.path, "r+b") as f:
+            f.seek(self._end)
+            f.write(frame)
+            f.truncate()
+            self._end = f.tell()
+        self._records += 1
+
+    def _write_compacted(self, entries: Dict[str, str]) -> None:
+        tmp = self.path + ".tmp"
+        with open(tmp, "wb") as f:
+            f.write(_header(self._session))
+            records = [
+                json.dumps({"op": "put", "site": site, "pwd": pwd}, separators=(",", ":")).encode()
+                for site, pwd in entries.items()
+            ]
+            seqs = [_SEQ.pack(seq) for seq in range(len(records))]
+            for sealed in self._cipher.encrypt_many(records, seqs):
+                f.write(_FRAME_LEN.pack(len(sealed)) + sealed)
+            f.flush()
+            os.fsync(f.fileno())
+            end = f.tell()
+        os.replace(tmp, self.path)
+        self._live = set(entries)
+        self._records = len(entries)
+        self._end = end
+        self._broken = False
@@ -0,0 +1,71 @@
+import base64
+import json
+import os
+
+from . import kdf as kdf_mod
+from . import vaultfile
+from .crypto import SessionKey
+
+# Stored next to the vault file: "<vault file>.recovery"
+RECOVERY_SUFFIX = ".recovery"
+RECOVERY_KEY_BYTES = 20  # 32 base32 characters
+
+
+def recovery_path(vault_file: str) -> str:
+    return vault_file + RECOVERY_SUFFIX
+
+
+def has_recovery_slot(vault_file: str) -> bool:
+    return os.path.exists(recovery_path(vault_file))
+
+
+def generate_recovery_key() -> str:
+    """Random key for the user to write down, e.g. "ABCD-EFGH-..." (8 groups of 4)."""
+    raw = base64.b32encode(os.urandom(RECOVERY_KEY_BYTES)).decode("ascii")
+    return "-".join(raw[i : i + 4] for i in range(0, len(raw), 4))
+
+
+def _normalize(recovery_key: str) -> str:
+    return "".join(recovery_key.split()).replace("-", "").upper()
+
+
+def write_recovery_slot(session: SessionKey, recovery_key: str, vault_file: str) -> None:
+    """
+    Store the vault's data key wrapped under `recovery_key`, so a forgotten master
+    password can be reset without losing the vault. `session` must be envelope keyed.
+    File format (JSON):
+      {"kdf": {"id", "params"}, "salt": b64, "check": b64, "wrapped": b64, "flags": int}
+    """
+    if not session.envelope:
+        raise ValueError("Recovery keys need an envelope-encrypted vault")
+    slot = session.rewrap(_normalize(recovery_key))
+    obj = {
+        "kdf": slot.kdf.to_dict(),
+        "salt": base64.b64encode(slot.salt).decode("ascii"),
+        "check": base64.b64encode(slot.key_check()).decode("ascii"),
+        "wrapped": base64.b64encode(slot.wrapped).decode("ascii"),
+        "flags": slot.flags,
+    }
+    path = recovery_path(vault_file)
+    vaultfile.atomic_write(path, json.dumps(obj).encode("utf-8"))
+    try:
+        os.chmod(path, 0o600)
+    except Exception:
+        pass
+
+
+def recover(recovery_key: str, vault_file: str) -> SessionKey:
+    """
+    Unwrap the data key with `recovery_key`. Raises FileNotFoundError if the vault
+    has no recovery slot and IncorrectPasswordError if the key is wrong.
+    """
+    with open(recovery_path(vault_file), "r", encoding="utf-8") as f:
+        obj = json.load(f)
+    return SessionKey.derive(
+        _normalize(recovery_key),
+        base64.b64decode(obj["salt"]),
+        kdf_mod.KdfParams.from_dict(obj["kdf"]),
+        base64.b64decode(obj["check"]),
+        base64.b64decode(obj["wrapped"]),
+        int(obj.get("flags", 0)),
+    )
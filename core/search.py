@@ -0,0 +1,176 @@
+import bisect
+import threading
+from collections import Counter
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+DEFAULT_LIMIT = 50
+# Substring candidates ranked per query (or `limit` if larger); an unselective
+# query ("com") ranks a sample
+CANDIDATE_LIMIT = 500
+# Postings longer than this are skipped when counting fuzzy matches
+FUZZY_POSTING_LIMIT = 2000
+# Share of the query's trigrams a fuzzy match must contain
+FUZZY_THRESHOLD = 0.6
+# Substring candidates scanned between polls of a search's `cancelled`
+CANCEL_CHECK_EVERY = 1024
+
+Cancelled = Optional[Callable[[], bool]]
+
+
+def _key(site: str) -> str:
+    key = site.lower()
+    return site if key == site else key
+
+
+def trigrams(key: str) -> Set[str]:
+    return {key[i : i + 3] for i in range(len(key) - 2)}
+
+
+class SearchIndex:
+    """
+    Case-insensitive site search. A sorted (key, site) list answers prefix
+    queries by bisection; trigram postings answer substring and fuzzy queries.
+    Both are updated per site by add()/discard(), never rebuilt.
+    Ranking: exact match, then prefixes, then substrings by match position and
+    length, then fuzzy matches by the share of trigrams they hold.
+    """
+
+    def __init__(self, sites: Iterable[str] = ()) -> None:
+        self._lock = threading.Lock()
+        # Parallel lists sorted by (key, site): no per-site tuples for the collector to scan
+        self._keys: List[str] = []
+        self._sites: List[str] = []
+        self._postings: Dict[str, Set[str]] = {}
+        for key, site in sorted((_key(site), site) for site in sites):
+            self._keys.append(key)
+            self._sites.append(site)
+            for gram in trigrams(key):
+                self._postings.setdefault(gram, set()).add(site)
+
+    def __len__(self) -> int:
+        return len(self._sites)
+
+    def _find(self, key: str, site: str) -> Tuple[int, bool]:
+        # (position of site, or where it belongs; whether it is there)
+        i = bisect.bisect_left(self._keys, key)
+        while i < len(self._keys) and self._keys[i] == key and self._sites[i] < site:
+            i += 1
+        found = i < len(self._keys) and self._keys[i] == key and self._sites[i] == site
+        return i, found
+
+    def add(self, site: str) -> None:
+        key = _key(site)
+        with self._lock:
+            i, found = self._find(key, site)
+            if found:
+                return
+            self._keys.insert(i, key)
+            self._sites.insert(i, site)
+            for gram in trigrams(key):
+                self._postings.setdefault(gram, set()).add(site)
+
+    def discard(self, site: str) -> None:
+        key = _key(site)
+        with self._lock:
+            i, found = self._find(key, site)
+            if not found:
+                return
+            del self._keys[i]
+            del self._sites[i]
+            for gram in trigrams(key):
+                posting = self._postings.get(gram)
+                if posting is not None:
+                    posting.discard(site)
+                    if not posting:
+                        del self._postings[gram]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._keys.clear()
+            self._sites.clear()
+            self._postings.clear()
+
+    def search(self, query: str, limit: int = DEFAULT_LIMIT, cancelled: Cancelled = None) -> List[str]:
+        """
+        Up to `limit` sites matching `query`, best first; an empty query matches none.
+        A large `limit` ranks every match of a short query, which takes a while on
+        a big index: once `cancelled()` returns True the search stops early, with
+        incomplete results, so the index is free for the next query.
+        """
+        query = query.strip().lower()
+        if not query or limit <= 0:
+            return []
+        with self._lock:
+            results = self._prefix(query, limit)
+            if len(results) < limit:
+                seen = set(results)
+                for site in self._substring(query, limit - len(results), seen, cancelled):
+                    results.append(site)
+                    seen.add(site)
+            if cancelled is not None and cancelled():
+                return results
+            if len(results) < limit and len(query) >= 4:
+                results.extend(self._fuzzy(query, limit - len(results), set(results)))
+            return results
+
+    def _prefix(self, query: str, limit: int) -> List[str]:
+        # Sorted order puts an exact match first
+        i = bisect.bisect_left(self._keys, query)
+        found = []
+        for key, site in zip(self._keys[i : i + limit], self._sites[i : i + limit]):
+            if not key.startswith(query):
+                break
+            found.append(site)
+        return found
+
+    def _substring(
+        self, query: str, limit: int, exclude: Set[str], cancelled: Cancelled = None
+    ) -> List[str]:
+        if len(query) >= 3:
+            # every match holds all the query's trigrams: scan the rarest posting
+            postings = [self._postings.get(gram) for gram in trigrams(query)]
+            if not all(postings):
+                return []
+            candidates: Iterable[str] = min(postings, key=len)
+        else:
+            # too short for a trigram: the postings of trigrams containing it
+            candidates = (
+                site
+                for gram, posting in self._postings.items()
+                if query in gram
+                for site in posting
+            )
+        ranked = []
+        seen = set()
+        cap = max(CANDIDATE_LIMIT, limit)
+        for i, site in enumerate(candidates):
+            if cancelled is not None and i % CANCEL_CHECK_EVERY == 0 and cancelled():
+                return []
+            if site in exclude or site in seen:
+                continue
+            key = _key(site)
+            pos = key.find(query)
+            if pos >= 0:
+                seen.add(site)
+                ranked.append((pos, len(key), key, site))
+                if len(ranked) >= cap:
+                    break
+        ranked.sort()
+        return [site for _, _, _, site in ranked[:limit]]
+
+    def _fuzzy(self, query: str, limit: int, exclude: Set[str]) -> List[str]:
+        grams = trigrams(query)
+        needed = max(2, int(len(grams) * FUZZY_THRESHOLD + 0.999))
+        counts: Counter = Counter()
+        for gram in grams:
+            posting = self._postings.get(gram)
+            # a trigram shared by most sites says little and costs much
+            if posting and len(posting) <= FUZZY_POSTING_LIMIT:
+                counts.update(posting)
+        ranked = [
+            (-hits, len(site), site.lower(), site)
+            for site, hits in counts.items()
+            if hits >= needed and site not in exclude
+        ]
+        ranked.sort()
+        return [site for _, _, _, site in ranked[:limit]]
@@ -0,0 +1,336 @@
+import os
+import sqlite3
+import threading
+from typing import Dict, Iterator, MutableMapping, Optional, Tuple, Union
+
+from .crypto import IncorrectPasswordError, SessionKey
+from . import entry as entry_mod, parallel, vaultfile
+from .unlock import ProgressCallback, derive_stage
+
+SQLITE_MAGIC = b"SQLite format 3\x00"
+_CHECK_PLAINTEXT = b"personal-safe"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value BLOB NOT NULL
+);
+CREATE TABLE IF NOT EXISTS entries (
+    id INTEGER PRIMARY KEY,
+    site TEXT NOT NULL UNIQUE,
+    value BLOB NOT NULL,
+    size INTEGER NOT NULL
+);
+"""
+
+
+def is_sqlite_vault(path: str) -> bool:
+    """Return True if `path` is a SQLite database."""
+    try:
+        with open(path, "rb") as f:
+            return f.read(len(SQLITE_MAGIC)) == SQLITE_MAGIC
+    except OSError:
+        return False
+
+
+def _meta_rows(session: SessionKey) -> Tuple[Tuple[str, bytes], ...]:
+    """The encoded KDF header and a key-check value sealed against it."""
+    encoded = vaultfile.VaultHeader.for_session(session).encode()
+    check = session.record_cipher().seal(_CHECK_PLAINTEXT, encoded)
+    return ("header", encoded), ("check", check)
+
+
+def _connect(path: str) -> sqlite3.Connection:
+    if os.path.exists(path) and os.path.getsize(path) and not is_sqlite_vault(path):
+        raise ValueError(f"{path} is not a SQLite vault")
+    conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+    try:
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.executescript(_SCHEMA)
+    except Exception:
+        conn.close()
+        raise
+    return conn
+
+
+def _verify_check(session: SessionKey, meta: Dict[str, bytes]) -> None:
+    # the check value is sealed with the data key, against the stored header
+    try:
+        session.record_cipher().open(meta.get("check", b""), meta["header"])
+    except Exception:
+        raise IncorrectPasswordError("Incorrect master password")
+
+
+def _check_unkeyed(conn: sqlite3.Connection) -> None:
+    # entries without the header that keys them: never re-key over them
+    if conn.execute("SELECT 1 FROM entries LIMIT 1").fetchone() is not None:
+        raise ValueError("Vault database has no header")
+
+
+def _write_meta(conn: sqlite3.Connection, session: SessionKey) -> None:
+    with conn:
+        conn.execute("BEGIN")
+        conn.executemany("INSERT INTO meta (key, value) VALUES (?, ?)", _meta_rows(session))
+
+
+class SqliteEntries(MutableMapping):
+    """
+    Site -> password mapping over the entries table. Only site names and password
+    lengths are held in memory; a password is fetched by an indexed lookup and
+    decrypted when read. Values set in memory stay plain until the backend writes them.
+    """
+
+    def __init__(self, backend: "SqliteBackend", sizes: Dict[str, int]) -> None:
+        self._backend = backend
+        self._entries: Dict[str, Union[str, int]] = dict(sizes)
+
+    def __getitem__(self, site: str) -> str:
+        value = self._entries[site]
+        if isinstance(value, str):
+            return value
+        return self._backend.fetch(site)
+
+    def __setitem__(self, site: str, pwd: str) -> None:
+        self._entries[site] = pwd
+
+    def __delitem__(self, site: str) -> None:
+        del self._entries[site]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(list(self._entries))
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, site: object) -> bool:
+        return site in self._entries
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def decrypt_all(self) -> Dict[str, str]:
+        """Every entry as plaintext, in order; stored rows are decrypted in one batch."""
+        entries = dict(self._entries)
+        stored = {}
+        if any(not isinstance(value, str) for value in entries.values()):
+            stored = self._backend.read_all()
+        return {
+            site: value if isinstance(value, str) else stored[site]
+            for site, value in entries.items()
+            if isinstance(value, str) or site in stored
+        }
+
+    def secret_length(self, site: str) -> int:
+        value = self._entries[site]
+        return entry_mod.secret_length(value) if isinstance(value, str) else value
+
+    def is_stored(self, site: str) -> bool:
+        """True if the value for `site` is only held in the database."""
+        return not isinstance(self._entries[site], str)
+
+    def mark_written(self, site: str, pwd: str) -> None:
+        # Drop the plaintext once the row is stored, unless it changed meanwhile
+        if self._entries.get(site) == pwd:
+            self._entries[site] = entry_mod.secret_length(pwd)
+
+
+class SqliteBackend:
+    """
+    Vault stored in SQLite (WAL mode), one row per entry. Each password is sealed
+    with AES-GCM using the site name as associated data and, for vaults with
+    per-record subkeys, as subkey id. The KDF header and a
+    key-check value live in the meta table, so a wrong password is detected on open.
+    put/delete are single-row transactions and reads go through the unique site index.
+    """
+
+    incremental = True
+
+    def __init__(self, path: str, session: SessionKey, conn: sqlite3.Connection) -> None:
+        self.path = path
+        self.session = session
+        self.lock = threading.RLock()
+        self._conn = conn
+        self._cipher = session.record_cipher()
+        self._entries: Optional[SqliteEntries] = None
+
+    @classmethod
+    def open(
+        cls,
+        master_password: str,
+        path: str,
+        progress: Optional[ProgressCallback] = None,
+    ) -> "SqliteBackend":
+        """
+        Open (or create) the database at `path` and derive the session key from the
+        header stored in it. Raises IncorrectPasswordError if the password is wrong.
+        """
+        conn = _connect(path)
+        try:
+            meta = dict(conn.execute("SELECT key, value FROM meta"))
+            if "header" in meta:
+                header = vaultfile.VaultHeader.decode(meta["header"])
+                session = derive_stage(progress, lambda: header.derive(master_password))
+                _verify_check(session, meta)
+            else:
+                _check_unkeyed(conn)
+                session = derive_stage(progress, lambda: SessionKey.derive(master_password))
+                _write_meta(conn, session)
+        except Exception:
+            conn.close()
+            raise
+        return cls(path, session, conn)
+
+    @classmethod
+    def open_with_session(cls, path: str, session: SessionKey) -> "SqliteBackend":
+        """
+        Open (or create) the database at `path` with an already derived or unwrapped
+        data key (e.g. an unlocked vault's, or one from a recovery key); no KDF runs.
+        Raises IncorrectPasswordError if it is not this vault's key.
+        """
+        conn = _connect(path)
+        try:
+            meta = dict(conn.execute("SELECT key, value FROM meta"))
+            if "header" in meta:
+                _verify_check(session, meta)
+            else:
+                _check_unkeyed(conn)
+                _write_meta(conn, session)
+        except Exception:
+            conn.close()
+            raise
+        return cls(path, session, conn)
+
+    def rekey(self, session: SessionKey) -> None:
+        """
+        Re-seal every row and the key check under `session` in one transaction.
+        A rewrapped session (same data key) only replaces the meta rows.
+        """
+        cipher = session.record_cipher()
+        with self.lock:
+            resealed = []
+            if session.key != self.session.key:
+                rows = self._conn.execute("SELECT id, site, value FROM entries").fetchall()
+                sites = [site.encode() for _, site, _ in rows]
+                plain = self._cipher.decrypt_many([blob for _, _, blob in rows], sites)
+                sealed = cipher.encrypt_many(plain, sites)
+                resealed = [(blob, row[0]) for blob, row in zip(sealed, rows)]
+            with self._conn:
+                self._conn.execute("BEGIN")
+                self._conn.executemany(
+                    "UPDATE entries SET value = ? WHERE id = ?", resealed
+                )
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)",
+                    _meta_rows(session),
+                )
+            self.session = session
+            self._cipher = cipher
+
+    def _seal(self, site: str, pwd: str) -> bytes:
+        return self._cipher.seal(pwd.encode(), site.encode())
+
+    def _open(self, site: str, blob: bytes) -> str:
+        return self._cipher.open(blob, site.encode()).decode()
+
+    def load(self) -> SqliteEntries:
+        """Return a mapping holding only site names and sizes; values load on access."""
+        if self._entries is None:
+            with self.lock:
+                rows = self._conn.execute("SELECT site, size FROM entries ORDER BY id")
+                self._entries = SqliteEntries(self, dict(rows))
+        return self._entries
+
+    def fetch(self, site: str) -> str:
+        with self.lock:
+            row = self._conn.execute(
+                "SELECT value FROM entries WHERE site = ?", (site,)
+            ).fetchone()
+        if row is None:
+            raise KeyError(site)
+        return self._open(site, row[0])
+
+    def read_all(self) -> Dict[str, str]:
+        """Decrypt the whole table, in parallel for large vaults (see parallel.decrypt_many)."""
+        with self.lock:
+            rows = self._conn.execute("SELECT site, value FROM entries ORDER BY id").fetchall()
+        plain = parallel.decrypt_many(
+            self._cipher, [blob for _, blob in rows], [site.encode() for site, _ in rows]
+        )
+        return {site: pwd.decode() for (site, _), pwd in zip(rows, plain)}
+
+    def put(self, site: str, pwd: str) -> None:
+        with self.lock:
+            with self._conn:
+                self._conn.execute("BEGIN")
+                self._conn.execute(
+                    "INSERT INTO entries (site, value, size) VALUES (?, ?, ?) "
+                    "ON CONFLICT(site) DO UPDATE SET value = excluded.value, size = excluded.size",
+                    (site, self._seal(site, pwd), entry_mod.secret_length(pwd)),
+                )
+            if self._entries is not None:
+                self._entries.mark_written(site, pwd)
+
+    def delete(self, site: str) -> None:
+        with self.lock:
+            with self._conn:
+                self._conn.execute("BEGIN")
+                self._conn.execute("DELETE FROM entries WHERE site = ?", (site,))
+
+    def save(self, entries: MutableMapping[str, str]) -> None:
+        """Make the table match `entries` in one transaction; rows already stored are kept."""
+        with self.lock:
+            plain = {}
+            for site in list(entries):
+                if isinstance(entries, SqliteEntries) and entries.is_stored(site):
+                    continue
+                plain[site] = entries[site]
+            sealed = self._cipher.encrypt_many(
+                [pwd.encode() for pwd in plain.values()], [site.encode() for site in plain]
+            )
+            pending = [
+                (site, blob, entry_mod.secret_length(pwd)) for (site, pwd), blob in zip(plain.items(), sealed)
+            ]
+            keep = set(entries)
+            with self._conn:
+                self._conn.execute("BEGIN")
+                stored = [row[0] for row in self._conn.execute("SELECT site FROM entries")]
+                self._conn.executemany(
+                    "DELETE FROM entries WHERE site = ?",
+                    ((site,) for site in stored if site not in keep),
+                )
+                self._conn.executemany(
+                    "INSERT INTO entries (site, value, size) VALUES (?, ?, ?) "
+                    "ON CONFLICT(site) DO UPDATE SET value = excluded.value, size = excluded.size",
+                    pending,
+                )
+            if isinstance(entries, SqliteEntries):
+                for site, pwd in plain.items():
+                    entries.mark_written(site, pwd)
+
+    def iterate(self, batch_size: int = 500) -> Iterator[Tuple[str, str]]:
+        """Yield decrypted (site, password) pairs from the table, a batch at a time."""
+        last_id = 0
+        while True:
+            with self.lock:
+                rows = self._conn.execute(
+                    "SELECT id, site, value FROM entries WHERE id > ? ORDER BY id LIMIT ?",
+                    (last_id, batch_size),
+                ).fetchall()
+            if not rows:
+                return
+            last_id = rows[-1][0]
+            sites = [site for _, site, _ in rows]
+            plain = self._cipher.decrypt_many(
+                [blob for _, _, blob in rows], [site.encode() for site in sites]
+            )
+            for site, pwd in zip(sites, plain):
+                yield site, pwd.decode()
+
+    def flush(self) -> None:
+        # every change is committed as it happens
+        pass
+
+    def close(self, flush: bool = True) -> None:
+        with self.lock:
+            self._conn.close()
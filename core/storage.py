@@ -1,71 +1,352 @@
 import json
 import base64
 import os
-from typing import Dict, Optional
-from .crypto import CryptoUtils
+import time
+from typing import Dict, List, Optional, Tuple
+from .crypto import IncorrectPasswordError, SessionKey
+from . import lazyvault, recordlog, sqlitebackend, vaultfile
+from .lazyvault import LazyEntries
+from .recovery import recovery_path
+from .unlock import ProgressCallback, derive_stage
 
 
 VAULT_FILE = "vault.json"
+SQLITE_FILE = "vault.db"
+
+# On-disk formats: one encrypted JSON blob, an append-only log of sealed records,
+# a sealed site index with individually sealed values (core.lazyvault), or a SQLite
+# database with one row per entry (core.sqlitebackend).
+# Blobs are written as the binary v2 container (core.vaultfile); legacy v1 text
+# files are still read and are upgraded the next time they are saved.
+FORMAT_BLOB = "blob"
+FORMAT_LOG = "log"
+FORMAT_INDEXED = "indexed"
+FORMAT_SQLITE = "sqlite"
+DEFAULT_FORMAT = FORMAT_BLOB
 
 
 def vault_exists(vault_file: Optional[str] = None) -> bool:
-    """Return True if the vault file exists on disk."""
+    """Return True if the vault file exists on disk (VAULT_FILE or SQLITE_FILE by default)."""
+    if vault_file is None:
+        return os.path.exists(VAULT_FILE) or os.path.exists(SQLITE_FILE)
+    return os.path.exists(vault_file)
+
+
+def set_aside_vault() -> List[str]:
+    """
+    Rename the default vault files out of the way (to "<name>.<timestamp>.locked") so a
+    new vault can be created when the old password is lost. Recovery slots move with
+    them, so a recovery key found later still opens the set-aside file. Returns the new paths.
+    """
+    stamp = time.strftime("%Y%m%d-%H%M%S")
+    moved = []
+    for path in (VAULT_FILE, SQLITE_FILE, SQLITE_FILE + "-wal", SQLITE_FILE + "-shm"):
+        if os.path.exists(path):
+            target = f"{path}.{stamp}.locked"
+            os.replace(path, target)
+            moved.append(target)
+            if os.path.exists(recovery_path(path)):
+                os.replace(recovery_path(path), recovery_path(target))
+                moved.append(recovery_path(target))
+    return moved
+
+
+def has_key_check(vault_file: Optional[str] = None) -> bool:
+    """
+    Return True if the vault file stores a key-check value, so the master password is
+    verified by the same KDF run that unlocks it. False for missing and legacy files.
+    """
+    path = vault_file or VAULT_FILE
+    try:
+        if recordlog.is_record_log(path) or sqlitebackend.is_sqlite_vault(path):
+            return True
+        if vaultfile.is_vault_file(path):
+            with open(path, "rb") as f:
+                return vaultfile.read_header(f).has_key_check
+    except (OSError, ValueError):
+        pass
+    return False
+
+
+def vault_format(vault_file: Optional[str] = None) -> str:
+    """Return the format of the vault file, or DEFAULT_FORMAT if it does not exist yet."""
+    path = vault_file or VAULT_FILE
+    if not os.path.exists(path):
+        return DEFAULT_FORMAT
+    if recordlog.is_record_log(path):
+        return FORMAT_LOG
+    if sqlitebackend.is_sqlite_vault(path):
+        return FORMAT_SQLITE
+    if lazyvault.is_indexed_vault(path):
+        return FORMAT_INDEXED
+    return FORMAT_BLOB
+
+
+def _read_vault_file(path: str) -> Tuple[Optional[bytes], str]:
+    """Return (salt, ciphertext) from a v1 vault file, or (None, "") if it is missing/empty."""
+    try:
+        with open(path, "r") as f:
+            lines = f.read().splitlines()
+    except FileNotFoundError:
+        return None, ""
+    if not lines:
+        return None, ""
+    return base64.b64decode(lines[0]), "\n".join(lines[1:])
+
+
+def unlock(
+    master_password: str,
+    vault_file: Optional[str] = None,
+    progress: Optional[ProgressCallback] = None,
+) -> Tuple[Dict[str, str], SessionKey]:
+    """
+    Read the vault file once, derive the session key from its salt and decrypt it.
+    Returns (entries, session); entries are empty if the file is missing.
+    Raises IncorrectPasswordError if the password does not match the vault.
+    `progress(fraction, message)` is called before and after the KDF runs.
+    """
+    path = vault_file or VAULT_FILE
+    if recordlog.is_record_log(path):
+        data, session, _ = unlock_record_log(master_password, path, progress)
+        return data, session
+    if sqlitebackend.is_sqlite_vault(path):
+        return _unlock_sqlite(master_password, path, progress)
+    if lazyvault.is_indexed_vault(path):
+        entries, session = unlock_indexed(master_password, path, progress)
+        return entries.decrypt_all(), session
+    if vaultfile.is_vault_file(path):
+        return _unlock_v2(master_password, path, progress)
+
+    try:
+        salt, ciphertext = _read_vault_file(path)
+    except Exception as e:
+        raise ValueError("Vault file is unreadable") from e
+
+    session = derive_stage(progress, lambda: SessionKey.derive(master_password, salt))
+    if salt is None:
+        return {}, session
+    try:
+        return json.loads(session.decrypt(ciphertext)), session
+    except Exception:
+        # v1 files have no key check; a failed decrypt is the only signal
+        raise IncorrectPasswordError("Incorrect master password")
+
+
+def _payload_error(has_key_check: bool) -> ValueError:
+    # With a matching key check the password is right, so the file itself is damaged
+    if has_key_check:
+        return ValueError("Vault file is corrupt")
+    return IncorrectPasswordError("Incorrect master password")
+
+
+def _unlock_v2(
+    master_password: str, path: str, progress: Optional[ProgressCallback] = None
+) -> Tuple[Dict[str, str], SessionKey]:
+    try:
+        header, view = vaultfile.read(path)
+    except Exception as e:
+        # Never open an existing file with a fresh session: the next save would replace it
+        raise ValueError("Vault file header is unreadable or unsupported") from e
+    session = derive_stage(progress, lambda: header.derive(master_password))
+    try:
+        return json.loads(vaultfile.open_payload(header, view, session.key)), session
+    except Exception:
+        raise _payload_error(header.has_key_check)
+
+
+def _open_sqlite(
+    master_password: str, path: str, session: Optional[SessionKey]
+) -> sqlitebackend.SqliteBackend:
+    # an unlocked vault's session opens its database without running the KDF again
+    if session is not None:
+        return sqlitebackend.SqliteBackend.open_with_session(path, session)
+    return sqlitebackend.SqliteBackend.open(master_password, path)
+
+
+def _unlock_sqlite(
+    master_password: str, path: str, progress: Optional[ProgressCallback] = None
+) -> Tuple[Dict[str, str], SessionKey]:
+    try:
+        backend = sqlitebackend.SqliteBackend.open(master_password, path, progress)
+    except IncorrectPasswordError:
+        raise
+    except Exception as e:
+        raise ValueError("Vault database is corrupt") from e
+    try:
+        return backend.read_all(), backend.session
+    finally:
+        backend.close()
+
+
+def unlock_indexed(
+    master_password: str,
+    vault_file: Optional[str] = None,
+    progress: Optional[ProgressCallback] = None,
+) -> Tuple[LazyEntries, SessionKey]:
+    """
+    Unlock an indexed vault by decrypting only its site index.
+    Passwords are decrypted one at a time when read from the returned mapping.
+    """
+    path = vault_file or VAULT_FILE
+    with open(path, "rb") as f:
+        header = vaultfile.read_header(f)
+    session = derive_stage(progress, lambda: header.derive(master_password))
+    try:
+        return LazyEntries.open(path, session), session
+    except Exception:
+        raise _payload_error(header.has_key_check)
+
+
+def unlock_record_log(
+    master_password: str,
+    vault_file: Optional[str] = None,
+    progress: Optional[ProgressCallback] = None,
+) -> Tuple[Dict[str, str], SessionKey, recordlog.RecordLog]:
+    """
+    Like unlock() for a record log vault, also returning the replayed RecordLog so
+    later changes can be appended without reading the file again.
+    """
     path = vault_file or VAULT_FILE
-    return os.path.exists(path)
+    salt, params, check, wrapped, flags = recordlog.read_header(path)
+    session = derive_stage(
+        progress,
+        lambda: SessionKey.derive(master_password, salt, params, check, wrapped, flags),
+    )
+    log = recordlog.RecordLog(path, session)
+    try:
+        return log.replay(), session, log
+    except ValueError:
+        # the key check matched, so the log is damaged; it now refuses writes
+        raise ValueError("Vault file is corrupt")
 
 
 def save_vault(
-    vault: Dict[str, str], master_password: str, vault_file: Optional[str] = None
+    vault: Dict[str, str],
+    master_password: str,
+    vault_file: Optional[str] = None,
+    session: Optional[SessionKey] = None,
+    fmt: Optional[str] = None,
 ) -> None:
     """
-    Save the vault to disk. File format:
-      line1: base64(salt)
-      line2: base64(ciphertext)
+    Save the vault to disk. Blobs use the binary v2 container (see core.vaultfile):
+      header (magic, version, KDF id and parameters, salt) | nonce | ciphertext
+    Legacy v1 files (base64 salt line + base64 ciphertext) are rewritten as v2.
 
-    We derive the encryption key from the provided master_password and a new random salt.
+    With a `session` the already-derived key and its salt are reused. Without one we
+    derive the encryption key from the provided master_password and a new random salt.
+    `fmt` defaults to the format the file already has; FORMAT_LOG writes a compacted
+    record log (see core.recordlog), FORMAT_INDEXED an indexed vault (core.lazyvault)
+    and FORMAT_SQLITE updates a SQLite vault (core.sqlitebackend).
     """
     path = vault_file or VAULT_FILE
+    fmt = fmt or vault_format(path)
 
-    salt = CryptoUtils.generate_salt()
-    key = CryptoUtils.derive_key(master_password, salt)
+    if fmt == FORMAT_SQLITE:
+        # the database keeps its own salt and KDF parameters
+        backend = _open_sqlite(master_password, path, session)
+        try:
+            backend.save(vault)
+        finally:
+            backend.close()
+        return
 
-    # encrypt the JSON payload
-    plaintext = json.dumps(vault)
-    ciphertext = CryptoUtils.encrypt(plaintext, key)
+    if session is None:
+        session = SessionKey.derive(master_password)
 
-    header = base64.b64encode(salt).decode()
-    with open(path, "w") as f:
-        f.write(header + "\n" + ciphertext)
+    if fmt == FORMAT_LOG:
+        recordlog.RecordLog(path, session).rewrite(vault)
+        return
+    if fmt == FORMAT_INDEXED:
+        lazyvault.write_entries(path, session, vault)
+        return
+    write_blob(path, session, vault)
 
 
-def load_vault(
-    master_password: str, vault_file: Optional[str] = None
-) -> Dict[str, str]:
+def rewrap_vault(session: SessionKey, vault_file: Optional[str] = None) -> None:
     """
-    Load the vault using master_password to derive the key from the salt stored in the first line.
-    Backwards-compatible: if file doesn't contain a header, attempt to decrypt the whole file with
-    a key derived from the provided password and a default salt (will likely fail).
+    Rewrite the headers of the vault at `vault_file` for `session`, which holds the
+    vault's data key wrapped under a new password (see SessionKey.rewrap). Used when
+    the data key was recovered without the old password. The data key is checked
+    against the vault first; IncorrectPasswordError means it is not this vault's.
     """
     path = vault_file or VAULT_FILE
-    try:
-        with open(path, "r") as f:
-            lines = f.read().splitlines()
+    if not os.path.exists(path):
+        raise FileNotFoundError(path)
+    fmt = vault_format(path)
+    if fmt == FORMAT_LOG:
+        log = recordlog.RecordLog(path, session)
+        try:
+            log.replay()
+        except ValueError:
+            raise IncorrectPasswordError("Key does not match this vault")
+        log.rewrap(session)
+    elif fmt == FORMAT_SQLITE:
+        backend = sqlitebackend.SqliteBackend.open_with_session(path, session)
+        try:
+            backend.rekey(session)
+        finally:
+            backend.close()
+    elif fmt == FORMAT_INDEXED:
+        try:
+            entries = LazyEntries.open(path, session)
+        except Exception:
+            raise IncorrectPasswordError("Key does not match this vault")
+        # re-seals the index under the new header; values are copied as they are
+        entries.write()
+    else:
+        header, view = vaultfile.read(path)
+        try:
+            data = json.loads(vaultfile.open_payload(header, view, session.key))
+        except Exception:
+            raise IncorrectPasswordError("Key does not match this vault")
+        write_blob(path, session, data)
+
+
+def write_blob(path: str, session: SessionKey, vault: Dict[str, str]) -> None:
+    """Encrypt the JSON payload into a v2 container and atomically replace `path`."""
+    plaintext = json.dumps(vault).encode()
+    header = vaultfile.VaultHeader.for_session(session)
+    vaultfile.atomic_write(path, vaultfile.seal(header, session.key, plaintext))
 
-        if not lines:
-            return {}
 
-        # Expect first line = salt, remaining = ciphertext
+def load_vault(
+    master_password: str,
+    vault_file: Optional[str] = None,
+    session: Optional[SessionKey] = None,
+) -> Dict[str, str]:
+    """
+    Load the vault using master_password to derive the key from the salt stored in the header.
+    Record logs are replayed record by record.
+    If a `session` for this file is given its key is used and no derivation happens.
+    Returns an empty dict if the file is missing or decryption fails.
+    """
+    if session is None:
         try:
-            salt = base64.b64decode(lines[0])
-            ciphertext = "\n".join(lines[1:])
-            key = CryptoUtils.derive_key(master_password, salt)
-            plaintext = CryptoUtils.decrypt(ciphertext, key)
-            return json.loads(plaintext)
-        except Exception:
-            # Decryption failed (wrong password or corrupt file)
+            data, _ = unlock(master_password, vault_file)
+        except ValueError:
+            # wrong password or corrupt file
             return {}
-    except FileNotFoundError:
-        return {}
+        return data
 
-    # Fallback empty dict on any unexpected path
-    return {}
+    path = vault_file or VAULT_FILE
+    try:
+        if recordlog.is_record_log(path):
+            return recordlog.RecordLog(path, session).replay()
+        if sqlitebackend.is_sqlite_vault(path):
+            backend = _open_sqlite(master_password, path, session)
+            try:
+                return backend.read_all()
+            finally:
+                backend.close()
+        if lazyvault.is_indexed_vault(path):
+            return LazyEntries.open(path, session).decrypt_all()
+        if vaultfile.is_vault_file(path):
+            header, view = vaultfile.read(path)
+            return json.loads(vaultfile.open_payload(header, view, session.key))
+        salt, ciphertext = _read_vault_file(path)
+        if salt is None:
+            return {}
+        return json.loads(session.decrypt(ciphertext))
+    except Exception:
+        # Decryption failed (wrong password or corrupt file)
+        return {}
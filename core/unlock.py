@@ -0,0 +1,134 @@
+import logging
+import threading
+from typing import Any, Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+# progress(fraction, message) with fraction in [0, 1]
+ProgressCallback = Callable[[float, str], None]
+# Runs a callback on the thread that should see it (e.g. the UI thread)
+Dispatch = Callable[[Callable[[], None]], None]
+
+
+# Unlock stages; deriving the key is by far the slowest
+DERIVING = "Deriving key"
+DECRYPTING = "Decrypting vault"
+DECRYPT_FRACTION = 0.8
+
+
+class UnlockCancelled(Exception):
+    """Raised inside the worker when an UnlockTask is cancelled."""
+
+
+def report(progress: Optional[ProgressCallback], fraction: float, message: str) -> None:
+    if progress is not None:
+        progress(fraction, message)
+
+
+def derive_stage(progress: Optional[ProgressCallback], derive: Callable[[], Any]) -> Any:
+    """Run the KDF step of an unlock, reporting the stages around it."""
+    report(progress, 0.0, DERIVING)
+    result = derive()
+    report(progress, DECRYPT_FRACTION, DECRYPTING)
+    return result
+
+
+def _call_now(fn: Callable[[], None]) -> None:
+    fn()
+
+
+class UnlockTask:
+    """
+    Future-like handle for an unlock running on a worker thread (see Vault.open_async).
+    Progress and completion callbacks are passed through `dispatch`, so a UI can have
+    them delivered on its own thread; by default they run on the worker.
+
+    cancel() cannot interrupt a KDF that is already running; the worker stops at the
+    next progress checkpoint, closes anything it opened and reports no result.
+    """
+
+    def __init__(
+        self,
+        on_progress: Optional[ProgressCallback] = None,
+        on_done: Optional[Callable[[Any], None]] = None,
+        on_error: Optional[Callable[[BaseException], None]] = None,
+        dispatch: Optional[Dispatch] = None,
+    ) -> None:
+        self._on_progress = on_progress
+        self._on_done = on_done
+        self._on_error = on_error
+        self._dispatch = dispatch or _call_now
+        self._cancelled = threading.Event()
+        self._finished = threading.Event()
+        self._result: Any = None
+        self._error: Optional[BaseException] = None
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self, work: Callable[[ProgressCallback], Any]) -> "UnlockTask":
+        """Run `work(progress)` on a daemon thread; `progress` raises once cancelled."""
+        self._thread = threading.Thread(
+            target=self._run, args=(work,), name="vault-unlock", daemon=True
+        )
+        self._thread.start()
+        return self
+
+    def cancel(self) -> None:
+        self._cancelled.set()
+
+    def cancelled(self) -> bool:
+        return self._cancelled.is_set()
+
+    def done(self) -> bool:
+        return self._finished.is_set()
+
+    def result(self, timeout: Optional[float] = None) -> Any:
+        """Wait for the unlock and return its result, re-raising its error."""
+        if not self._finished.wait(timeout):
+            raise TimeoutError("Unlock still running")
+        if self._error is not None:
+            raise self._error
+        if self.cancelled():
+            raise UnlockCancelled()
+        return self._result
+
+    def _progress(self, fraction: float, message: str) -> None:
+        if self._cancelled.is_set():
+            raise UnlockCancelled()
+        if self._on_progress is not None:
+            on_progress = self._on_progress
+            self._dispatch(lambda: on_progress(fraction, message))
+
+    def _run(self, work: Callable[[ProgressCallback], Any]) -> None:
+        try:
+            result = work(self._progress)
+        except UnlockCancelled:
+            self._finished.set()
+            return
+        except BaseException as e:
+            self._error = e
+            self._finished.set()
+            if self._on_error is not None and not self.cancelled():
+                on_error = self._on_error
+                self._dispatch(lambda: on_error(e))
+            return
+
+        if self.cancelled():
+            # finished after cancel(): nobody will use the result
+            _discard(result)
+            self._finished.set()
+            return
+        self._result = result
+        self._finished.set()
+        if self._on_done is not None:
+            on_done = self._on_done
+            self._dispatch(lambda: on_done(result))
+
+
+def _discard(result: Any) -> None:
+    close = getattr(result, "close", None)
+    if close is None:
+        return
+    try:
+        close(flush=False)
+    except Exception:
+        logger.exception("Failed to close result of a cancelled unlock")
@@ -1,85 +1,540 @@
-from typing import Dict, List, Tuple
-from . import storage
+import contextlib
+import threading
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Mapping, Optional, Tuple
+from . import backend as backend_mod
+from . import kdf as kdf_mod
+from . import autobackup, backupchain, batch as batch_mod, entry as entry_mod, merge, recovery
+from . import search as search_mod, storage, writebehind
+from . import unlock
+from .crypto import SessionKey
+from .backend import StorageBackend
 from core import backup as backup_mod  # adjust import path
 
 
 class Vault:
-    def __init__(self, master_password: str) -> None:
-        # load_vault now requires a master password to derive the key
+    def __init__(
+        self,
+        master_password: str,
+        vault_file: Optional[str] = None,
+        storage_format: Optional[str] = None,
+        flush_delay: Optional[float] = writebehind.DEFAULT_DELAY,
+        progress: Optional[unlock.ProgressCallback] = None,
+    ) -> None:
+        # Derive the key once at unlock; every later save reuses the session key.
+        # The key check in the header authenticates the password in the same KDF run;
+        # IncorrectPasswordError is raised if it does not match.
+        # A storage_format different from the file's converts it on the next save.
         self._master_password = master_password
-        self._data: Dict[str, str] = storage.load_vault(master_password)
+        self._backend: StorageBackend = backend_mod.open_backend(
+            master_password, vault_file, storage_format, flush_delay, progress
+        )
+        self._session = self._backend.session
+        # Held from deriving a new key-encryption key until it is installed, so a
+        # retune cannot overwrite a password change that raced it
+        self._rekey_lock = threading.RLock()
+        # Guards _data against the backend taking a snapshot mid-change
+        self._lock = self._backend.lock
+        self._data: Dict[str, str] = self._backend.load()
+        # (callback, whether it takes the changed sites)
+        self._listeners: List[Tuple[Callable[..., None], bool]] = []
+        # The open batch() of each thread, if any
+        self._local = threading.local()
+        # Built by the first search(), then kept up to date under _lock
+        self._index: Optional[search_mod.SearchIndex] = None
+        try:
+            unlock.report(progress, 1.0, "Unlocked")
+        except unlock.UnlockCancelled:
+            self._backend.close(flush=False)
+            raise
+
+    @classmethod
+    def open_async(
+        cls,
+        master_password: str,
+        vault_file: Optional[str] = None,
+        storage_format: Optional[str] = None,
+        flush_delay: Optional[float] = writebehind.DEFAULT_DELAY,
+        on_progress: Optional[unlock.ProgressCallback] = None,
+        on_done: Optional[Callable[["Vault"], None]] = None,
+        on_error: Optional[Callable[[BaseException], None]] = None,
+        dispatch: Optional[unlock.Dispatch] = None,
+    ) -> unlock.UnlockTask:
+        """
+        Unlock on a worker thread and return an UnlockTask (future with cancel()).
+        Callbacks go through `dispatch`, e.g. Clock.schedule_once in the UI. Wrong
+        passwords reach on_error as IncorrectPasswordError; a cancelled unlock calls
+        neither on_done nor on_error and closes the vault if it was already open.
+        """
+        task = unlock.UnlockTask(on_progress, on_done, on_error, dispatch)
+
+        def _open(progress: unlock.ProgressCallback) -> "Vault":
+            return cls(master_password, vault_file, storage_format, flush_delay, progress)
+
+        return task.start(_open)
+
+    def _save(self) -> None:
+        self._backend.save(self._data)
+
+    def _batch(self) -> Optional[batch_mod.Batch]:
+        return getattr(self._local, "batch", None)
+
+    @contextlib.contextmanager
+    def batch(self) -> Iterator["Vault"]:
+        """
+        Group changes: add/delete/clear (and imports) inside `with vault.batch():`
+        are staged in memory and applied with one save when the block exits, or
+        dropped if it raises. The calling thread reads its staged changes; other
+        threads see the entries as they were until the whole batch is applied.
+        Nested batches join the enclosing one, rolling back only their own changes.
+        """
+        parent = self._batch()
+        current = batch_mod.Batch(parent)
+        self._local.batch = current
+        try:
+            yield self
+        finally:
+            self._local.batch = parent
+        if parent is not None:
+            current.merge_into(parent)
+        elif current.changes or current.cleared:
+            self._commit(current)
+
+    transaction = batch
+
+    def _commit(self, batch: batch_mod.Batch) -> None:
+        with self._lock:
+            undo, written, removed = batch.apply(self._data)
+            try:
+                self._save()
+            except BaseException:
+                batch.revert(self._data, undo)
+                raise
+            if self._index is not None:
+                for site in removed:
+                    self._index.discard(site)
+                for site in written:
+                    self._index.add(site)
+        self._changed(written + removed)
+
+    def add_listener(self, callback: Callable[..., None], sites: bool = False) -> None:
+        """
+        Call `callback()` after every change to the entries, on the changing thread.
+        With sites=True it is called as callback(sites): the sites added, changed
+        or removed, or None after clear().
+        """
+        self._listeners.append((callback, sites))
+
+    def remove_listener(self, callback: Callable[..., None]) -> None:
+        self._listeners = [(cb, sites) for cb, sites in self._listeners if cb != callback]
+
+    def _changed(self, sites: Optional[List[str]]) -> None:
+        for callback, with_sites in list(self._listeners):
+            if with_sites:
+                callback(sites)
+            else:
+                callback()
+
+    def flush(self) -> None:
+        """Write any pending change to disk now."""
+        self._backend.flush()
+
+    def close(self, flush: bool = True) -> None:
+        """Stop background writes, flushing pending changes first unless flush=False."""
+        self._backend.close(flush=flush)
+
+    def kdf_outdated(self) -> bool:
+        """True if this vault's KDF should be re-tuned for this machine."""
+        return kdf_mod.is_outdated(self._session.kdf)
+
+    def retune_kdf(self, params: Optional[kdf_mod.KdfParams] = None) -> None:
+        """
+        Rewrap the data key with a fresh salt and `params` (default: calibrated for
+        this machine) and rewrite the headers. Slow; call it off the UI thread.
+        """
+        with self._rekey_lock:
+            self._rekey(self._master_password, params)
+
+    def change_password(self, new_password: str) -> None:
+        """Rewrap the data key under `new_password`; entries are not re-encrypted."""
+        with self._rekey_lock:
+            self._rekey(new_password, None)
+            self._master_password = new_password
+
+    def ensure_key_check(self) -> None:
+        """Write the vault now if the file has no key-check value yet (new or legacy vault)."""
+        if not storage.has_key_check(self._backend.path):
+            self._save()
+            self.flush()
+
+    def create_recovery_key(self) -> str:
+        """
+        Generate a recovery key, store the data key wrapped under it next to the
+        vault and return it for the user to write down (see reset_password()).
+        A legacy, directly keyed vault is moved to envelope encryption first.
+        """
+        with self._rekey_lock:
+            if not self._session.envelope:
+                self._rekey(self._master_password, None)
+            key = recovery.generate_recovery_key()
+            recovery.write_recovery_slot(self._session, key, self._backend.path)
+        return key
+
+    def has_recovery_key(self) -> bool:
+        return recovery.has_recovery_slot(self._backend.path)
+
+    @staticmethod
+    def reset_password(
+        recovery_key: str, new_password: str, vault_file: Optional[str] = None
+    ) -> None:
+        """
+        Set a new master password for a vault whose password is lost, using its
+        recovery key. Raises FileNotFoundError if the vault has no recovery key and
+        IncorrectPasswordError if `recovery_key` is wrong.
+        """
+        path = vault_file or backend_mod.default_path()
+        recovered = recovery.recover(recovery_key, path)
+        storage.rewrap_vault(recovered.rewrap(new_password), path)
+
+    def _rekey(self, password: str, params: Optional[kdf_mod.KdfParams]) -> None:
+        # callers hold _rekey_lock; _lock is only taken to install the new session
+        params = params or kdf_mod.calibrate()
+        if self._session.envelope:
+            # O(1): same data key, new key-encryption key
+            session = self._session.rewrap(password, params)
+        else:
+            # legacy vault keyed directly by the password: move to a fresh data key once
+            session = SessionKey.derive(password, None, params)
+        with self._lock:
+            self._backend.rekey(session)
+            self._session = session
 
     def add(self, site: str, pwd: str) -> None:
+        # Set the password of `site`; the other fields of a rich entry are kept
         if not site or not pwd:
             return
-        self._data[site] = pwd
-        storage.save_vault(self._data, self._master_password)
+        with self._lock:
+            previous = self._raw_get(site)
+            self._put(site, entry_mod.with_password(previous, site, pwd), previous)
+
+    def put_entry(self, entry: entry_mod.Entry) -> None:
+        """Add or replace `entry` with all its fields; it is stamped as changed now."""
+        if not entry.site or not entry.password:
+            return
+        with self._lock:
+            self._put(entry.site, entry.encode(), self._raw_get(entry.site))
+
+    def get_entry(self, site: str) -> Optional[entry_mod.Entry]:
+        value = self._raw_get(site)
+        return entry_mod.decode(site, value) if value is not None else None
+
+    def _put(self, site: str, value: str, previous: Optional[str]) -> None:
+        # `previous` is the value being replaced; the new one is stamped past it
+        value = entry_mod.with_stamp(site, value, entry_mod.next_stamp(site, previous))
+        batch = self._batch()
+        if batch is not None:
+            batch.put(site, value)
+            return
+        with self._lock:
+            self._data[site] = value
+            self._backend.put(site, value)
+            if self._index is not None:
+                self._index.add(site)
+        self._changed([site])
+
+    def add_many(self, entries: Iterable[Tuple[str, str]]) -> int:
+        """
+        Add or replace every (site, password) in `entries` with one save and
+        return how many were written. If iterating `entries` raises, nothing is applied.
+        """
+        count = 0
+
+        def counted() -> Iterator[Tuple[str, str, entry_mod.Stamp]]:
+            nonlocal count
+            for site, pwd in entries:
+                if site and pwd:
+                    if not isinstance(site, str) or not isinstance(pwd, str):
+                        raise ValueError("Entries malformed")
+                    count += 1
+                    previous = self._raw_get(site)
+                    value = entry_mod.with_password(previous, site, pwd)
+                    yield site, value, entry_mod.next_stamp(site, previous)
+
+        self._apply_import(counted(), replace_existing=False)
+        return count
 
     def items(self) -> List[Tuple[str, str]]:
-        return list(self._data.items())
+        """(site, password) of every entry."""
+        return [(site, entry_mod.password_of(value)) for site, value in self._raw_items()]
+
+    def entries(self) -> List[entry_mod.Entry]:
+        return [entry_mod.decode(site, value) for site, value in self._raw_items()]
+
+    def _raw_items(self) -> List[Tuple[str, str]]:
+        # (site, stored value) pairs, as backups and merges see them
+        with self._lock:
+            # lazy backends decrypt everything in one (possibly parallel) batch
+            decrypt_all = getattr(self._data, "decrypt_all", None)
+            rows = list(decrypt_all().items() if decrypt_all is not None else self._data.items())
+        batch = self._batch()
+        return list(batch.overlay(rows).items()) if batch is not None else rows
+
+    def summaries(self) -> List[Tuple[str, int]]:
+        """
+        (site, password length) pairs for masked display; lazy backends keep the
+        lengths next to the sealed values, so nothing is decrypted.
+        """
+        def length(value: str) -> int:
+            return len(entry_mod.password_of(value))
+
+        with self._lock:
+            secret_length = getattr(self._data, "secret_length", None)
+            if secret_length is not None:
+                rows = [(site, secret_length(site)) for site in self._data]
+            else:
+                rows = [(site, length(value)) for site, value in self._data.items()]
+        batch = self._batch()
+        return list(batch.overlay(rows, length).items()) if batch is not None else rows
+
+    def secret_length(self, site: str) -> Optional[int]:
+        """Password length of `site`, or None if it is absent; lazy backends decrypt nothing."""
+        if self._batch() is None:
+            with self._lock:
+                secret_length = getattr(self._data, "secret_length", None)
+                if secret_length is not None:
+                    return secret_length(site) if site in self._data else None
+        value = self._raw_get(site)
+        return len(entry_mod.password_of(value)) if value is not None else None
 
     def is_empty(self) -> bool:
+        if self._batch() is not None:
+            return not self.get_sites()
         return not self._data
 
     def get_sites(self) -> List[str]:
         # Return list of site names
-        return list(self._data.keys())
+        with self._lock:
+            sites = list(self._data.keys())
+        batch = self._batch()
+        if batch is not None:
+            return list(batch.overlay((site, None) for site in sites))
+        return sites
 
     def delete(self, site: str) -> bool:
         # Delete entry by site name
         # true if deleted, false if not found
+        batch = self._batch()
+        if batch is not None:
+            found, change = batch.lookup(site)
+            if not (change is not None if found else site in self._data):
+                return False
+            batch.delete(site)
+            return True
         if site in self._data:
-            del self._data[site]
-            storage.save_vault(self._data, self._master_password)
+            with self._lock:
+                del self._data[site]
+                self._backend.delete(site)
+                if self._index is not None:
+                    self._index.discard(site)
+            self._changed([site])
             return True
         return False
 
     def get(self, site):
-        return self._data.get(site)
+        value = self._raw_get(site)
+        return entry_mod.password_of(value) if value is not None else None
+
+    def _raw_get(self, site: str) -> Optional[str]:
+        batch = self._batch()
+        if batch is not None:
+            found, change = batch.lookup(site)
+            if found:
+                return change
+        with self._lock:
+            return self._data.get(site)
+
+    def search(
+        self,
+        query: str,
+        limit: int = search_mod.DEFAULT_LIMIT,
+        cancelled: search_mod.Cancelled = None,
+    ) -> List[str]:
+        """
+        Up to `limit` committed sites matching `query`, best first (see
+        search.SearchIndex; `cancelled` stops a long search early). The first call
+        indexes the vault, which takes a moment for large vaults (without blocking
+        other calls); later changes update the index as they happen.
+        """
+        index = self._index
+        if index is None:
+            with self._lock:
+                sites = list(self._data)
+            # built outside the lock, which readers and writers need meanwhile
+            built = search_mod.SearchIndex(sites)
+            with self._lock:
+                if self._index is None:
+                    current = set(self._data)
+                    indexed = set(sites)
+                    for site in current - indexed:
+                        built.add(site)
+                    for site in indexed - current:
+                        built.discard(site)
+                    self._index = built
+                index = self._index
+        return index.search(query, limit, cancelled)
+
+    def iter_entries(
+        self, site_filter: Optional[Callable[[str], bool]] = None
+    ) -> Iterator[Tuple[str, str, Optional[entry_mod.Stamp]]]:
+        """
+        Stream committed (site, stored value, stamp) from the backend without
+        building a copy of the vault; only sites accepted by `site_filter` are
+        yielded. entry.decode() turns a value into its Entry.
+        """
+        for site, value in self._backend.iterate():
+            if site_filter is None or site_filter(site):
+                yield (site, *entry_mod.split_stamp(site, value))
 
     def export_encrypted_backup(self, filepath: str, master_password: str) -> None:
         """
-        Export the entire vault (self._data) to an encrypted backup file.
+        Export the entire vault to an encrypted backup file, streaming entries from
+        the backend so the backup is never held in memory as a whole.
         `master_password` must be provided (it is not read from disk here).
         """
         if self._data is None:
             raise ValueError("Vault has no data to export")
         if not master_password:
             raise ValueError("Master password required for export")
-        
-        # Convert items in vault to dict for JSON
-        data_to_backup = {site: pwd for site, pwd in self.items()}
-        
-        # Choose what to export
-        obj = {"entries": data_to_backup}
-        backup_mod.save_encrypted_backup_file(obj, master_password, filepath)
+        backup_mod.save_backup_entries(
+            self._stamped(self._backend.iterate()), master_password, filepath
+        )
 
     def import_encrypted_backup(self, filepath: str, master_password: str, replace_existing: bool = True) -> None:
         """
         Import an encrypted backup from `filepath`, decrypting with `master_password`.
         If replace_existing is True, the vault's internal data will be replaced by backup entries.
-        Otherwise, backup entries will be merged (backup wins on key collisions).
+        Otherwise, backup entries will be merged: newer entries win and conflicts go
+        to the backup (see plan_merge() to preview and resolve them first).
+        Entries are applied as their chunks verify; if a later chunk fails, the
+        vault is rolled back and ValueError is raised.
         """
         if not master_password:
             raise ValueError("Master password required for import")
-        data = backup_mod.load_encrypted_backup_file(filepath, master_password)
-        if not isinstance(data, dict) or "entries" not in data:
-            raise ValueError("Backup file missing entries")
-        entries = data["entries"] or {}
-        if not isinstance(entries, dict):
-            raise ValueError("Backup entries malformed")
-
-        if replace_existing:
-            self._data = dict(entries)
-        else:
-            # merge, backup entries win
-            self._data = {**(self._data or {}), **entries}
+        if not replace_existing:
+            plan = self.plan_merge(filepath, master_password)
+            self.apply_merge(plan, merge.KEEP_INCOMING)
+            return
+        self._apply_import(backup_mod.iter_backup_records(filepath, master_password), True)
+
+    def plan_merge(self, filepath: str, master_password: str) -> merge.MergePlan:
+        """
+        Diff the backup at `filepath` against the vault (see merge.plan): which
+        entries it would add or update, which conflict and how many match.
+        Nothing is changed; pass the plan to apply_merge().
+        """
+        if not master_password:
+            raise ValueError("Master password required for import")
+        local: Dict[str, str] = {}
+        local_stamps: Dict[str, Optional[entry_mod.Stamp]] = {}
+        for site, value in self._raw_items():
+            local[site], local_stamps[site] = entry_mod.split_stamp(site, value)
+        return merge.plan(
+            local, local_stamps.get, backup_mod.iter_backup_records(filepath, master_password)
+        )
+
+    def apply_merge(
+        self,
+        plan: merge.MergePlan,
+        resolution: str = merge.KEEP_NEWER,
+        choices: Optional[Mapping[str, str]] = None,
+    ) -> int:
+        """
+        Apply `plan` with one save, resolving conflicts by `resolution` or the
+        per-site `choices` (merge.KEEP_*). Returns the number of entries written.
+        """
+        changes = list(plan.changes(resolution, choices))
+        if changes:
+            self._apply_import(iter(changes), replace_existing=False)
+        return len(changes)
+
+    def backup_incremental(
+        self,
+        base_path: str,
+        master_password: str,
+        differential: bool = False,
+        full: bool = False,
+    ) -> backupchain.BackupResult:
+        """
+        Back up to the chain at `base_path` (see backupchain.backup): a full base the
+        first time, then deltas with only the entries changed since the last backup
+        (or since the base if `differential`).
+        """
+        if not master_password:
+            raise ValueError("Master password required for export")
+        # without stamps, so an entry only counts as changed when its contents did
+        unstamped = (
+            (site, entry_mod.split_stamp(site, value)[0])
+            for site, value in self._backend.iterate()
+        )
+        return backupchain.backup(unstamped, master_password, base_path, differential, full)
+
+    def restore_backup_chain(
+        self, base_path: str, master_password: str, replace_existing: bool = True
+    ) -> None:
+        """Replay the backup chain at `base_path` into the vault, like import_encrypted_backup."""
+        if not master_password:
+            raise ValueError("Master password required for import")
+        state = backupchain.restore(base_path, master_password)
+        self._apply_import(
+            ((site, pwd, None) for site, pwd in state.items()), replace_existing
+        )
+
+    def auto_backup(
+        self,
+        directory: str,
+        retention: Optional[autobackup.Retention] = None,
+        force: bool = False,
+    ) -> Optional[str]:
+        """
+        Snapshot the vault into `directory` under the unlocked session key, so no
+        KDF runs, unless it matches the newest snapshot there; old snapshots are
+        rotated (see autobackup.snapshot). Returns the new file or None.
+        """
+        rows = list(self._stamped(self._raw_items()))
+        return autobackup.snapshot(rows, self._session, directory, retention, force)
+
+    def _stamped(self, entries: Iterable[Tuple[str, str]]) -> Iterator[Tuple[Any, ...]]:
+        # backup rows: [site, value, modified, version] when the entry has a stamp
+        for site, value in entries:
+            value, stamp = entry_mod.split_stamp(site, value)
+            yield (site, value, *stamp) if stamp else (site, value)
+
+    def _apply_import(
+        self,
+        entries: Iterator[Tuple[str, str, Optional[entry_mod.Stamp]]],
+        replace_existing: bool,
+    ) -> None:
+        # entries are (site, value, stamp); a None stamp marks the entry changed now
+        with self.batch():
+            batch = self._batch()
+            if replace_existing:
+                batch.clear()
+            for site, value, stamp in entries:
+                if not isinstance(site, str) or not isinstance(value, str):
+                    raise ValueError("Backup entries malformed")
+                if stamp is None:
+                    stamp = entry_mod.next_stamp(site, self._raw_get(site))
+                batch.put(site, entry_mod.with_stamp(site, value, stamp))
 
-        storage.save_vault(self._data, self._master_password)
-        
     def clear(self) -> None:
         """Clear all vault entries and save the empty vault."""
-        self._data = {}  # remove all entries
+        batch = self._batch()
+        if batch is not None:
+            batch.clear()
+            return
+        with self._lock:
+            self._data.clear()  # remove all entries
+            if self._index is not None:
+                self._index.clear()
         # Persist the empty vault to disk
-        from . import storage
-        storage.save_vault(self._data, self._master_password)
+        self._save()
+        self._changed(None)
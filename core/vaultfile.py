@@ -0,0 +1,197 @@
+import os
+import struct
+from typing import Optional, Tuple
+
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+
+from . import kdf as kdf_mod
+from .crypto import KEY_CHECK_SIZE, WRAPPED_KEY_SIZE, NONCE_SIZE, SessionKey
+
+MAGIC = b"PSAFE"
+FORMAT_VERSION = 2  # header | nonce | one ciphertext holding the whole vault
+INDEXED_VERSION = 3  # header | sealed site index | individually sealed values
+_VERSIONS = (FORMAT_VERSION, INDEXED_VERSION)
+
+KDF_PBKDF2_SHA256 = kdf_mod.PBKDF2_SHA256
+KDF_SCRYPT = kdf_mod.SCRYPT
+KDF_ARGON2ID = kdf_mod.ARGON2ID
+
+# magic | version | kdf id | salt length | 3 x kdf parameter | extension length
+_FIXED = struct.Struct(">5sBBBIIIH")
+
+
+class VaultHeader:
+    """
+    Header of a binary (v2/v3) vault file:
+      magic (5) | version (u8) | kdf id (u8) | salt length (u8)
+      kdf parameters (3 x u32 BE) | extension length (u16 BE)
+      salt | extension bytes
+    followed by the nonce and raw AES-GCM ciphertext. The encoded header is passed
+    to AES-GCM as associated data, so tampering with KDF parameters fails decryption.
+    The extension holds the session's key-check value, so a wrong password is caught
+    right after the KDF runs, followed by the wrapped data key and a flags byte
+    (crypto.FLAG_*) in envelope-encrypted vaults. Files written before these have
+    a shorter (or empty) extension.
+    """
+
+    __slots__ = ("version", "kdf_id", "kdf_params", "salt", "ext")
+
+    def __init__(
+        self,
+        kdf_id: int,
+        kdf_params: Tuple[int, int, int],
+        salt: bytes,
+        ext: bytes = b"",
+        version: int = FORMAT_VERSION,
+    ) -> None:
+        self.version = version
+        self.kdf_id = kdf_id
+        self.kdf_params = kdf_params
+        self.salt = salt
+        self.ext = ext
+
+    @classmethod
+    def for_session(
+        cls, session: SessionKey, version: int = FORMAT_VERSION
+    ) -> "VaultHeader":
+        return cls(
+            session.kdf.kdf_id,
+            session.kdf.params,
+            session.salt,
+            session.key_check()
+            + (session.wrapped + bytes((session.flags,)) if session.wrapped else b""),
+            version=version,
+        )
+
+    @property
+    def size(self) -> int:
+        return _FIXED.size + len(self.salt) + len(self.ext)
+
+    def encode(self) -> bytes:
+        return (
+            _FIXED.pack(
+                MAGIC,
+                self.version,
+                self.kdf_id,
+                len(self.salt),
+                *self.kdf_params,
+                len(self.ext),
+            )
+            + self.salt
+            + self.ext
+        )
+
+    @classmethod
+    def decode(cls, buf) -> "VaultHeader":
+        if len(buf) < _FIXED.size:
+            raise ValueError("Truncated vault header")
+        magic, version, kdf_id, salt_len, p1, p2, p3, ext_len = _FIXED.unpack_from(buf)
+        if magic != MAGIC:
+            raise ValueError("Not a binary vault file")
+        if version not in _VERSIONS:
+            raise ValueError(f"Unsupported vault format version {version}")
+        if kdf_id not in kdf_mod.NAMES:
+            raise ValueError(f"Unsupported KDF id {kdf_id}")
+        end = _FIXED.size + salt_len + ext_len
+        if len(buf) < end:
+            raise ValueError("Truncated vault header")
+        salt = bytes(buf[_FIXED.size : _FIXED.size + salt_len])
+        ext = bytes(buf[_FIXED.size + salt_len : end])
+        return cls(kdf_id, (p1, p2, p3), salt, ext, version)
+
+    @property
+    def kdf(self) -> kdf_mod.KdfParams:
+        return kdf_mod.KdfParams(self.kdf_id, self.kdf_params)
+
+    @property
+    def has_key_check(self) -> bool:
+        return len(self.ext) >= KEY_CHECK_SIZE
+
+    @property
+    def wrapped_key(self) -> Optional[bytes]:
+        if len(self.ext) < KEY_CHECK_SIZE + WRAPPED_KEY_SIZE:
+            return None
+        return self.ext[KEY_CHECK_SIZE : KEY_CHECK_SIZE + WRAPPED_KEY_SIZE]
+
+    @property
+    def flags(self) -> int:
+        end = KEY_CHECK_SIZE + WRAPPED_KEY_SIZE
+        return self.ext[end] if len(self.ext) > end else 0
+
+    def derive(self, password: str) -> SessionKey:
+        """
+        Run the KDF recorded in this header and unwrap the data key. Raises
+        IncorrectPasswordError if the password does not match the key check.
+        """
+        check = self.ext[:KEY_CHECK_SIZE] if self.has_key_check else None
+        return SessionKey.derive(
+            password, self.salt, self.kdf, check, self.wrapped_key, self.flags
+        )
+
+
+def is_vault_file(path: str) -> bool:
+    """Return True if `path` starts with the binary vault magic."""
+    try:
+        with open(path, "rb") as f:
+            return f.read(len(MAGIC)) == MAGIC
+    except OSError:
+        return False
+
+
+def read_header(f) -> VaultHeader:
+    """Read just the header from an open binary file, leaving it positioned after it."""
+    fixed = f.read(_FIXED.size)
+    if len(fixed) < _FIXED.size:
+        raise ValueError("Truncated vault header")
+    fields = _FIXED.unpack(fixed)
+    salt_len, ext_len = fields[3], fields[-1]
+    return VaultHeader.decode(fixed + f.read(salt_len + ext_len))
+
+
+def read(path: str) -> Optional[Tuple[VaultHeader, memoryview]]:
+    """
+    Read the whole file with a single readinto() into a preallocated buffer.
+    Returns (header, view of the file) or None if the file is missing or empty.
+    """
+    try:
+        f = open(path, "rb", buffering=0)
+    except FileNotFoundError:
+        return None
+    with f:
+        size = os.fstat(f.fileno()).st_size
+        if size == 0:
+            return None
+        buf = bytearray(size)
+        view = memoryview(buf)
+        read_total = 0
+        while read_total < size:
+            n = f.readinto(view[read_total:])
+            if not n:
+                break
+            read_total += n
+    view = view[:read_total]
+    return VaultHeader.decode(view), view
+
+
+def open_payload(header: VaultHeader, view: memoryview, key: bytes) -> bytes:
+    """Authenticate and decrypt the payload that follows `header` in `view`."""
+    start = header.size
+    nonce = view[start : start + NONCE_SIZE]
+    return AESGCM(key).decrypt(nonce, view[start + NONCE_SIZE :], view[:start])
+
+
+def seal(header: VaultHeader, key: bytes, plaintext: bytes) -> bytes:
+    """Return the complete file contents for `plaintext` under `header`."""
+    encoded = header.encode()
+    nonce = os.urandom(NONCE_SIZE)
+    return encoded + nonce + AESGCM(key).encrypt(nonce, plaintext, encoded)
+
+
+def atomic_write(path: str, data: bytes) -> None:
+    """Write to a temp file next to `path` and swap it in, so a crash never leaves half a vault."""
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
@@ -0,0 +1,99 @@
+import atexit
+import logging
+import threading
+import time
+from typing import Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DELAY = 0.5  # seconds of quiet before a pending save is written
+RETRY_DELAY = 5.0  # seconds before retrying a failed background write
+
+
+class WriteBehind:
+    """
+    Coalesces saves: mark_dirty() schedules `write` on a background thread once no
+    new change arrived for `delay` seconds, so N quick edits cost one write.
+    flush() writes any pending change immediately; close() flushes and stops the thread.
+    Pending changes are also flushed at interpreter exit.
+    """
+
+    def __init__(self, write: Callable[[], None], delay: float = DEFAULT_DELAY) -> None:
+        self._write = write
+        self.delay = delay
+        self.writes = 0
+        self.last_error: Optional[BaseException] = None
+        self._cond = threading.Condition()
+        self._flush_lock = threading.Lock()
+        self._dirty = False
+        self._deadline = 0.0
+        self._closed = False
+        self._thread: Optional[threading.Thread] = None
+        atexit.register(self.flush)
+
+    @property
+    def dirty(self) -> bool:
+        return self._dirty
+
+    def mark_dirty(self) -> None:
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("Write-behind flusher is closed")
+            self._dirty = True
+            self._deadline = time.monotonic() + self.delay
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name="vault-write-behind", daemon=True
+                )
+                self._thread.start()
+            self._cond.notify()
+
+    def flush(self) -> None:
+        """Write pending changes now. Raises if the write fails."""
+        with self._flush_lock:
+            with self._cond:
+                if not self._dirty:
+                    return
+                self._dirty = False
+            try:
+                self._write()
+            except BaseException as e:
+                with self._cond:
+                    self._dirty = True
+                self.last_error = e
+                raise
+            self.writes += 1
+            self.last_error = None
+
+    def close(self, flush: bool = True) -> None:
+        """Stop the background thread, writing pending changes first unless flush=False."""
+        if flush:
+            self.flush()
+        with self._cond:
+            self._closed = True
+            self._dirty = False
+            self._cond.notify()
+        if self._thread is not None:
+            self._thread.join()
+        atexit.unregister(self.flush)
+
+    def _run(self) -> None:
+        with self._cond:
+            while True:
+                while not self._dirty and not self._closed:
+                    self._cond.wait()
+                if self._closed:
+                    return
+                remaining = self._deadline - time.monotonic()
+                if remaining > 0:
+                    self._cond.wait(remaining)
+                    continue
+                self._cond.release()
+                try:
+                    self.flush()
+                except Exception:
+                    logger.exception("Background vault write failed; will retry")
+                finally:
+                    self._cond.acquire()
+                if self._dirty and self.last_error is not None:
+                    self._deadline = time.monotonic() + RETRY_DELAY
@@ -0,0 +1,15 @@
+import pytest
+from core import kdf
+
+# Cheap KDF parameters: calibrating and deriving for real would dominate the suite
+FAST = kdf.pbkdf2(1000)
+
+
+def pytest_configure(config):
+    config.addinivalue_line("markers", "real_kdf: run with the calibrated KDF")
+
+
+@pytest.fixture(autouse=True)
+def fast_kdf(request, monkeypatch):
+    if request.node.get_closest_marker("real_kdf") is None:
+        monkeypatch.setattr(kdf, "calibrate", lambda kdf_id=None, target=None: FAST)
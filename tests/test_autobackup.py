@@ -0,0 +1,149 @@
+import io
+import os
+import threading
+
+import pytest
+from core import autobackup, backup, kdf
+from core.crypto import IncorrectPasswordError, SessionKey
+from core.vault import Vault
+from conftest import FAST
+
+DAY = 86400.0
+
+
+def _vault(tmp_path, password="pw"):
+    v = Vault(password, vault_file=str(tmp_path / "vault.json"), flush_delay=None)
+    v.add("a", "1")
+    v.add("b", "2")
+    return v
+
+
+def _no_kdf(monkeypatch):
+    def fail(*args, **kwargs):
+        raise AssertionError("KDF ran")
+
+    monkeypatch.setattr(kdf.KdfParams, "derive", fail)
+
+
+def test_session_keyed_backup_opens_with_session_or_password():
+    session = SessionKey.derive("pw", None, FAST)
+    buf = io.BytesIO()
+    backup.write_backup(buf, [("a", "1")], None, {"k": 1}, session=session)
+
+    buf.seek(0)
+    reader = backup.BackupReader(buf, session=session)
+    assert reader.header.session_keyed and reader.header.kdf == FAST
+    assert list(reader.records()) == [("a", "1")] and reader.meta == {"k": 1}
+    buf.seek(0)
+    assert list(backup.BackupReader(buf, "pw").records()) == [("a", "1")]
+    buf.seek(0)
+    with pytest.raises(IncorrectPasswordError):
+        backup.BackupReader(buf, "wrong")
+    buf.seek(0)
+    other = SessionKey.derive("pw", None, FAST)
+    with pytest.raises(ValueError):
+        list(backup.BackupReader(buf, session=other).records())
+
+
+def test_snapshot_skips_unchanged_and_needs_no_kdf(tmp_path, monkeypatch):
+    v = _vault(tmp_path)
+    directory = str(tmp_path / "backups")
+    _no_kdf(monkeypatch)
+    first = v.auto_backup(directory)
+    assert first is not None
+    assert v.auto_backup(directory) is None
+    v.add("c", "3")
+    v.delete("c")
+    assert v.auto_backup(directory) is None
+    v.add("a", "changed")
+    # back-date the first snapshot so the next one gets a different name
+    os.rename(first, os.path.join(directory, autobackup.snapshot_name(1_700_000_000)))
+    second = v.auto_backup(directory)
+    assert second is not None
+    assert len(autobackup.list_snapshots(directory)) == 2
+    with open(second, "rb") as f:
+        records = backup.BackupReader(f, session=v._session).records()
+        assert sorted(records) == [("a", "changed"), ("b", "2")]
+
+
+def test_snapshot_opens_with_password_of_its_time(tmp_path):
+    v = _vault(tmp_path)
+    path = v.auto_backup(str(tmp_path / "backups"))
+    v.change_password("new")
+    info = backup.verify_backup(path, "pw")
+    assert info.verified and info.entries == 2
+    assert not backup.verify_backup(path, "new").verified
+
+
+def test_content_hash_ignores_order():
+    session = SessionKey.derive("pw", None, FAST)
+    entries = [("a", "1"), ("b", "2"), ("c", "3")]
+    digest = autobackup.content_hash(session, entries)
+    assert autobackup.content_hash(session, entries[::-1]) == digest
+    assert autobackup.content_hash(session, entries[:2]) != digest
+    assert autobackup.content_hash(session, [("a", "1"), ("b", "2"), ("c", "4")]) != digest
+
+
+def test_gfs_keep():
+    start = 1_700_000_000.0
+    stamps = [start + hour * 3600 for hour in range(24 * 400)]
+    keep = autobackup.gfs_keep(stamps, autobackup.Retention(daily=7, weekly=4, monthly=12))
+    newest = max(stamps)
+    assert newest in keep
+    days = {autobackup._day(when) for when in keep}
+    months = {autobackup._month(when) for when in keep}
+    # one per day for a week; the weeks and months overlap the most recent days
+    assert len(keep) <= 7 + 4 + 12 and len(months) == 12
+    assert all(autobackup._day(newest - d * DAY) in days for d in range(7))
+    assert autobackup.gfs_keep([], autobackup.Retention()) == set()
+
+
+def test_rotate_removes_dropped_snapshots(tmp_path):
+    directory = tmp_path / "backups"
+    directory.mkdir()
+    start = 1_700_000_000.0
+    for day in range(10):
+        for hour in (1, 13):
+            (directory / autobackup.snapshot_name(start + day * DAY + hour * 3600)).write_bytes(b"x")
+    (directory / "notes.txt").write_bytes(b"x")
+    removed = autobackup.rotate(str(directory), autobackup.Retention(daily=3, weekly=0, monthly=0))
+    assert len(removed) == 17
+    assert len(autobackup.list_snapshots(str(directory))) == 3
+    assert (directory / "notes.txt").exists()
+
+
+def test_scheduler_backs_up_after_n_changes(tmp_path):
+    v = _vault(tmp_path)
+    done = threading.Event()
+    written = []
+
+    def on_backup(path):
+        written.append(path)
+        done.set()
+
+    scheduler = autobackup.BackupScheduler(
+        v, str(tmp_path / "backups"), interval=0, changes=3, on_backup=on_backup
+    ).start()
+    try:
+        v.add("c", "3")
+        v.add("d", "4")
+        assert not done.wait(0.2)
+        v.add("e", "5")
+        assert done.wait(5)
+    finally:
+        scheduler.stop()
+    assert len(backup.load_encrypted_backup_file(written[0], "pw")["entries"]) == 5
+    v.add("f", "6")
+    assert scheduler._pending == 0
+
+
+def test_scheduler_interval(tmp_path):
+    v = _vault(tmp_path)
+    done = threading.Event()
+    scheduler = autobackup.BackupScheduler(
+        v, str(tmp_path / "backups"), interval=0.05, changes=0, on_backup=lambda p: done.set()
+    ).start()
+    try:
+        assert done.wait(5)
+    finally:
+        scheduler.stop()
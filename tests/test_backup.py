@@ -0,0 +1,186 @@
+import io
+import os
+import time
+import tracemalloc
+
+import pytest
+from core import backup, storage
+from core.vault import Vault
+from conftest import FAST
+
+
+def _entries(n):
+    return ((f"site{i}.example", f"password-{i}") for i in range(n))
+
+
+def _frames(data):
+    """Split a streaming backup into its header and frames."""
+    reader = io.BytesIO(data)
+    header = backup.StreamHeader.read(reader).raw
+    frames = []
+    while True:
+        raw = reader.read(4)
+        if not raw:
+            return header, frames
+        frames.append(raw + reader.read(int.from_bytes(raw, "big")))
+
+
+def _write(n, chunk_size=256):
+    f = io.BytesIO()
+    assert backup.write_backup(f, _entries(n), "pw", {"note": "x"}, chunk_size, FAST) == n
+    return f.getvalue()
+
+
+def _read(data, password="pw"):
+    reader = backup.BackupReader(io.BytesIO(data), password)
+    return list(reader.records()), reader.meta
+
+
+def test_stream_roundtrip():
+    records, meta = _read(_write(500))
+    assert records == list(_entries(500))
+    assert meta == {"note": "x"}
+    assert _read(_write(0)) == ([], {"note": "x"})
+
+
+def test_file_helpers_roundtrip(tmp_path):
+    path = str(tmp_path / "b.psafe")
+    backup.save_encrypted_backup_file({"entries": dict(_entries(10)), "v": 1}, "pw", path)
+    assert backup.is_stream_backup(path)
+    assert backup.load_encrypted_backup_file(path, "pw") == {"v": 1, "entries": dict(_entries(10))}
+    with pytest.raises(ValueError):
+        backup.load_encrypted_backup_file(path, "wrong")
+
+
+def test_legacy_json_backup_still_loads(tmp_path):
+    path = str(tmp_path / "old.psafe")
+    with open(path, "wb") as f:
+        f.write(backup.create_encrypted_backup_bytes({"entries": {"a": "1"}}, "pw"))
+    assert backup.load_encrypted_backup_file(path, "pw") == {"entries": {"a": "1"}}
+    assert list(backup.iter_backup_entries(path, "pw")) == [("a", "1")]
+
+
+@pytest.mark.parametrize("damage", ["flip", "drop", "swap", "truncate"])
+def test_damaged_stream_is_rejected(damage):
+    header, frames = _frames(_write(200))
+    assert len(frames) > 4
+    if damage == "flip":
+        frame = bytearray(frames[2])
+        frame[10] ^= 1
+        frames[2] = bytes(frame)
+    elif damage == "drop":
+        del frames[2]
+    elif damage == "swap":
+        frames[1], frames[2] = frames[2], frames[1]
+    else:
+        del frames[-1]  # the trailer
+    records = []
+    with pytest.raises(ValueError):
+        for record in backup.BackupReader(io.BytesIO(header + b"".join(frames)), "pw").records():
+            records.append(record)
+    # everything returned came from chunks that verified
+    assert records == list(_entries(len(records)))
+
+
+def test_memory_stays_bounded(tmp_path):
+    n = 50_000
+    path = str(tmp_path / "big.psafe")
+    with open(path, "wb") as f:
+        tracemalloc.start()
+        backup.write_backup(f, _entries(n), "pw", params=FAST)
+        _, write_peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    with open(path, "rb") as f:
+        tracemalloc.start()
+        count = sum(1 for _ in backup.BackupReader(f, "pw").records())
+        _, read_peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    assert count == n
+    assert os.path.getsize(path) > 1_000_000
+    assert write_peak < 4 * backup.CHUNK_SIZE
+    assert read_peak < 4 * backup.CHUNK_SIZE
+
+
+def test_vault_import_rolls_back_on_bad_chunk(tmp_path):
+    path = str(tmp_path / "b.psafe")
+    with open(path, "wb") as f:
+        backup.write_backup(f, _entries(300), "pw", chunk_size=256, params=FAST)
+    with open(path, "rb") as f:
+        header, frames = _frames(f.read())
+    frame = bytearray(frames[-2])
+    frame[-1] ^= 1
+    frames[-2] = bytes(frame)
+    with open(path, "wb") as f:
+        f.write(header + b"".join(frames))
+
+    v = Vault("master", vault_file=str(tmp_path / "vault.json"), flush_delay=None)
+    v.add("keep", "me")
+    v.add("site1.example", "old")
+    with pytest.raises(ValueError):
+        v.import_encrypted_backup(path, "pw")
+    assert sorted(v.items()) == [("keep", "me"), ("site1.example", "old")]
+
+
+@pytest.mark.parametrize("fmt", [storage.FORMAT_BLOB, storage.FORMAT_SQLITE])
+def test_vault_export_import(tmp_path, fmt):
+    name = "vault.db" if fmt == storage.FORMAT_SQLITE else "vault.json"
+    v = Vault("master", vault_file=str(tmp_path / name), storage_format=fmt, flush_delay=None)
+    for site, pwd in _entries(20):
+        v.add(site, pwd)
+    path = str(tmp_path / "b.psafe")
+    v.export_encrypted_backup(path, "pw")
+
+    other = Vault("master", vault_file=str(tmp_path / ("2" + name)), storage_format=fmt, flush_delay=None)
+    other.add("gone", "x")
+    other.import_encrypted_backup(path, "pw", replace_existing=True)
+    assert sorted(other.items()) == sorted(_entries(20))
+    other.add("extra", "y")
+    other.import_encrypted_backup(path, "pw", replace_existing=False)
+    assert len(other.items()) == 21
+
+
+def test_other_stream_versions_are_rejected(tmp_path):
+    path = str(tmp_path / "b.psafe")
+    backup.save_backup_entries(_entries(3), "pw", path)
+    with open(path, "r+b") as f:
+        f.seek(len(backup.STREAM_MAGIC))
+        f.write(bytes((backup.STREAM_VERSION + 1,)))
+    with open(path, "rb") as f, pytest.raises(ValueError):
+        backup.StreamHeader.read(f)
+
+
+def test_inspect_and_verify(tmp_path):
+    path = str(tmp_path / "b.psafe")
+    backup.save_encrypted_backup_file({"entries": dict(_entries(30))}, "pw", path)
+    info = backup.inspect_backup(path)
+    assert (info.version, info.kdf, info.entries) == (backup.STREAM_VERSION, FAST, None)
+    assert abs(info.created - time.time()) < 60
+
+    info = backup.verify_backup(path, "pw")
+    assert info.verified and info.entries == 30 and info.error is None
+    info = backup.verify_backup(path, "wrong")
+    assert not info.verified and "password" in info.error
+
+    header, frames = _frames(open(path, "rb").read())
+    with open(path, "wb") as f:
+        f.write(header + b"".join(frames[:-1]))
+    assert "truncated" in backup.verify_backup(path, "pw").error
+
+
+def test_verify_directory(tmp_path, monkeypatch):
+    v = Vault("master", vault_file=str(tmp_path / "vault.json"), flush_delay=None)
+    v.add("a", "1")
+    backup.save_encrypted_backup_file({"entries": {"a": "1", "b": "2"}}, "pw", str(tmp_path / "1.psafe"))
+    with open(tmp_path / "2.psafe", "wb") as f:
+        f.write(backup.create_encrypted_backup_bytes({"entries": {"a": "1"}}, "pw"))
+    (tmp_path / "3.psafe").write_bytes(b"junk")
+    before = open(tmp_path / "vault.json", "rb").read()
+
+    results = backup.verify_backups(str(tmp_path), "pw", workers=3)
+    assert [(os.path.basename(r.path), r.verified, r.entries) for r in results] == [
+        ("1.psafe", True, 2),
+        ("2.psafe", True, 1),
+        ("3.psafe", False, None),
+    ]
+    assert results[1].version == backup.JSON_VERSION
+    assert open(tmp_path / "vault.json", "rb").read() == before
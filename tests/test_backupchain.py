@@ -0,0 +1,130 @@
+import os
+
+import pytest
+from core import backupchain
+from core.crypto import SessionKey
+from core.vault import Vault
+
+
+def _entries(n):
+    return {f"site{i}.example": f"password-{i}" for i in range(n)}
+
+
+def test_incremental_chain_replays(tmp_path):
+    base = str(tmp_path / "vault.psafe")
+    data = _entries(2000)
+    assert backupchain.backup(data.items(), "pw", base).kind == backupchain.FULL
+
+    data["site1.example"] = "changed"
+    data["new.example"] = "added"
+    del data["site2.example"]
+    result = backupchain.backup(data.items(), "pw", base)
+    assert (result.kind, result.seq) == (backupchain.DELTA, 1)
+    assert (result.added, result.changed, result.deleted) == (1, 1, 1)
+    assert os.path.getsize(result.path) < os.path.getsize(base) / 20
+
+    assert backupchain.backup(data.items(), "pw", base).kind == backupchain.UNCHANGED
+    data["site3.example"] = "again"
+    assert backupchain.backup(data.items(), "pw", base).seq == 2
+    assert backupchain.chain_files(base) == [
+        base, backupchain.delta_path(base, 1), backupchain.delta_path(base, 2)
+    ]
+    assert backupchain.restore(base, "pw") == data
+    with pytest.raises(ValueError):
+        backupchain.restore(base, "wrong")
+
+
+def test_kdf_runs_once_per_operation(tmp_path, monkeypatch):
+    base = str(tmp_path / "vault.psafe")
+    data = _entries(10)
+    calls = []
+    original = SessionKey.derive.__func__
+
+    def counting_derive(cls, *args, **kwargs):
+        calls.append(1)
+        return original(cls, *args, **kwargs)
+
+    monkeypatch.setattr(SessionKey, "derive", classmethod(counting_derive))
+    backupchain.backup(data.items(), "pw", base)
+    assert len(calls) == 1
+    for i in range(3):
+        data[f"x{i}"] = "y"
+        calls.clear()
+        backupchain.backup(data.items(), "pw", base)
+        assert len(calls) == 1
+    calls.clear()
+    assert backupchain.restore(base, "pw") == data
+    assert len(calls) == 1
+
+
+def test_differential_deltas_are_against_the_base(tmp_path):
+    base = str(tmp_path / "vault.psafe")
+    data = _entries(10)
+    backupchain.backup(data.items(), "pw", base)
+    data["a"] = "1"
+    backupchain.backup(data.items(), "pw", base, differential=True)
+    data["b"] = "2"
+    result = backupchain.backup(data.items(), "pw", base, differential=True)
+    assert result.added == 2
+    os.remove(backupchain.delta_path(base, 1))  # not needed to restore
+    assert backupchain.restore(base, "pw") == data
+
+
+def test_missing_incremental_delta_fails(tmp_path):
+    base = str(tmp_path / "vault.psafe")
+    data = _entries(10)
+    backupchain.backup(data.items(), "pw", base)
+    for i in range(2):
+        data[f"x{i}"] = "y"
+        backupchain.backup(data.items(), "pw", base)
+    os.remove(backupchain.delta_path(base, 1))
+    with pytest.raises(ValueError):
+        backupchain.restore(base, "pw")
+
+
+def test_collapse_starts_a_new_chain(tmp_path):
+    base = str(tmp_path / "vault.psafe")
+    data = _entries(10)
+    backupchain.backup(data.items(), "pw", base)
+    for i in range(3):
+        data[f"x{i}"] = "y"
+        backupchain.backup(data.items(), "pw", base)
+    result = backupchain.collapse(base, "pw")
+    assert result.kind == backupchain.FULL
+    assert backupchain.chain_files(base) == [base]
+    assert sorted(os.listdir(tmp_path)) == ["vault.manifest-0000.psafe", "vault.psafe"]
+    assert backupchain.restore(base, "pw") == data
+    data["z"] = "1"
+    assert backupchain.backup(data.items(), "pw", base).seq == 1
+    assert backupchain.restore(base, "pw") == data
+
+
+def test_full_backup_keeps_similarly_named_files(tmp_path):
+    base = str(tmp_path / "vault.psafe")
+    data = _entries(5)
+    backupchain.backup(data.items(), "pw", base)
+    data["x"] = "y"
+    backupchain.backup(data.items(), "pw", base)
+    foreign = ["vault.20251018.psafe", "vault.0003.manifest", "vault.delta-old.psafe"]
+    for name in foreign:
+        (tmp_path / name).write_bytes(b"not part of the chain")
+    data["z"] = "1"
+    backupchain.backup(data.items(), "pw", base)
+    backupchain.backup(data.items(), "pw", base, full=True)
+    assert sorted(os.listdir(tmp_path)) == sorted(foreign + ["vault.manifest-0000.psafe", "vault.psafe"])
+    assert backupchain.restore(base, "pw") == data
+
+
+def test_vault_backup_and_restore(tmp_path):
+    base = str(tmp_path / "backups" / "vault.psafe")
+    os.makedirs(os.path.dirname(base))
+    v = Vault("master", vault_file=str(tmp_path / "vault.json"), flush_delay=None)
+    v.add("a", "1")
+    assert v.backup_incremental(base, "pw").kind == backupchain.FULL
+    v.add("b", "2")
+    assert v.backup_incremental(base, "pw").added == 1
+
+    other = Vault("master", vault_file=str(tmp_path / "other.json"), flush_delay=None)
+    other.add("c", "3")
+    other.restore_backup_chain(base, "pw")
+    assert sorted(other.items()) == [("a", "1"), ("b", "2")]
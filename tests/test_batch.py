@@ -0,0 +1,111 @@
+import threading
+
+import pytest
+from core.vault import Vault
+
+
+@pytest.fixture(params=["vault.json", "vault.log", "vault.db"])
+def vault(request, tmp_path):
+    v = Vault("pw", vault_file=str(tmp_path / request.param), flush_delay=None)
+    v.add("keep", "1")
+    v.add("old", "2")
+    yield v
+    v.close()
+
+
+def _count_saves(vault):
+    saves = []
+    real_save, real_put, real_delete = vault._backend.save, vault._backend.put, vault._backend.delete
+    vault._backend.save = lambda data: (saves.append("save"), real_save(data))
+    vault._backend.put = lambda site, pwd: (saves.append("put"), real_put(site, pwd))
+    vault._backend.delete = lambda site: (saves.append("delete"), real_delete(site))
+    return saves
+
+
+def test_batch_persists_once(tmp_path, vault):
+    saves = _count_saves(vault)
+    changes = []
+    vault.add_listener(lambda: changes.append(1))
+    with vault.batch():
+        for i in range(1000):
+            vault.add(f"site{i}", f"pw{i}")
+        vault.delete("old")
+        assert vault.get("site5") == "pw5" and vault.get("old") is None
+        assert len(vault.get_sites()) == 1001
+    assert saves == ["save"] and changes == [1]
+    path = vault._backend.path
+    vault.close()
+    reopened = Vault("pw", vault_file=path, flush_delay=None)
+    assert len(reopened.items()) == 1001 and reopened.get("old") is None
+    assert reopened.get_entry("site7").stamp[1] == 1
+    reopened.close()
+
+
+def test_exception_rolls_back(vault):
+    saves = _count_saves(vault)
+    with pytest.raises(RuntimeError):
+        with vault.transaction():
+            vault.add("new", "x")
+            vault.clear()
+            raise RuntimeError("abort")
+    assert dict(vault.items()) == {"keep": "1", "old": "2"}
+    assert saves == []
+
+
+def test_nested_batch_rolls_back_only_itself(vault):
+    with vault.batch():
+        vault.add("a", "1")
+        with pytest.raises(ValueError):
+            vault.add_many([("b", "2"), (None, "x"), ("c", 3)])
+        assert vault.get("b") is None
+        with vault.batch():
+            vault.clear()
+            vault.add("z", "26")
+        assert sorted(vault.get_sites()) == ["z"]
+    assert dict(vault.items()) == {"z": "26"}
+
+
+def test_other_threads_see_committed_state(vault):
+    inside, release = threading.Event(), threading.Event()
+
+    def writer():
+        with vault.batch():
+            vault.add("new", "x")
+            vault.delete("keep")
+            inside.set()
+            release.wait(5)
+
+    t = threading.Thread(target=writer)
+    t.start()
+    inside.wait(5)
+    assert vault.get("new") is None and vault.get("keep") == "1"
+    assert sorted(vault.get_sites()) == ["keep", "old"]
+    release.set()
+    t.join()
+    assert dict(vault.items()) == {"new": "x", "old": "2"}
+
+
+def test_site_listener_gets_the_changed_sites(vault):
+    changed = []
+    vault.add_listener(changed.append, sites=True)
+    vault.add("new", "secret")
+    vault.delete("old")
+    with vault.batch():
+        vault.add("a", "1")
+        vault.add("keep", "22")
+        vault.delete("new")
+    vault.clear()
+    vault.remove_listener(changed.append)
+    vault.add("b", "2")
+    assert changed[:2] == [["new"], ["old"]]
+    assert sorted(changed[2]) == ["a", "keep", "new"] and changed[3] is None
+    assert len(changed) == 4
+
+
+def test_secret_length(vault):
+    vault.add("long", "x" * 40)
+    assert vault.secret_length("long") == 40 and vault.secret_length("missing") is None
+    with vault.batch():
+        vault.add("long", "short")
+        vault.delete("keep")
+        assert vault.secret_length("long") == 5 and vault.secret_length("keep") is None
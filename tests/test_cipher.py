@@ -0,0 +1,60 @@
+import base64
+
+import pytest
+from cryptography.exceptions import InvalidTag
+from core.crypto import NONCE_SIZE, Cipher, CryptoUtils, KeySchedule
+
+KEY = bytes(range(32))
+
+
+def test_seal_open_roundtrip_with_memoryview():
+    cipher = Cipher(KEY)
+    sealed = cipher.seal(memoryview(b"xxsecretxx")[2:-2], b"site")
+    assert len(sealed) == NONCE_SIZE + len(b"secret") + 16
+    assert cipher.open(memoryview(b"pad" + sealed)[3:], b"site") == b"secret"
+    with pytest.raises(InvalidTag):
+        cipher.open(sealed, b"other")
+
+
+def test_many_matches_single_calls():
+    records = [f"pw{i}".encode() for i in range(50)]
+    sites = [f"site{i}".encode() for i in range(50)]
+    sealed = CryptoUtils.encrypt_many(records, KEY, sites)
+    assert len({s[:NONCE_SIZE] for s in sealed}) == 50
+    assert CryptoUtils.decrypt_many(sealed, KEY, sites) == records
+    assert [Cipher(KEY).open(s, a) for s, a in zip(sealed, sites)] == records
+    with pytest.raises(InvalidTag):
+        CryptoUtils.decrypt_many(sealed, KEY, sites[::-1])
+    with pytest.raises(ValueError):
+        CryptoUtils.encrypt_many(records, KEY, sites[:1])
+
+
+def test_str_api_is_compatible():
+    token = CryptoUtils.encrypt("secret", KEY)
+    assert Cipher(KEY).open(base64.b64decode(token)) == b"secret"
+    sealed = Cipher(KEY).seal(b"secret")
+    assert CryptoUtils.decrypt(base64.b64encode(sealed).decode(), KEY) == "secret"
+
+
+def test_subkeys_are_hkdf_sha256():
+    from cryptography.hazmat.primitives import hashes
+    from cryptography.hazmat.primitives.kdf.hkdf import HKDF
+
+    expected = HKDF(
+        algorithm=hashes.SHA256(), length=32, salt=b"personal-safe entry keys", info=b"site1"
+    ).derive(KEY)
+    schedule = KeySchedule(KEY)
+    assert schedule.subkey(b"site1") == expected
+    assert schedule.subkey(memoryview(b"site1")) == expected
+    assert schedule.subkey(b"site2") != expected
+
+
+def test_key_schedule_seals_under_the_record_subkey():
+    schedule = KeySchedule(KEY)
+    sealed = schedule.encrypt_many([b"a", b"b"], [b"site1", b"site2"])
+    assert schedule.decrypt_many(sealed, [b"site1", b"site2"]) == [b"a", b"b"]
+    assert Cipher(schedule.subkey(b"site1")).open(sealed[0], b"site1") == b"a"
+    with pytest.raises(InvalidTag):
+        Cipher(KEY).open(sealed[0], b"site1")
+    with pytest.raises(InvalidTag):
+        schedule.open(sealed[0], b"site2")
@@ -0,0 +1,78 @@
+import tracemalloc
+
+import pytest
+from core import entry
+from core.vault import Vault
+
+
+def test_flat_values_stay_flat():
+    assert entry.Entry("a.com", "pw").encode() == "pw"
+    assert entry.decode("a.com", "pw") == entry.Entry("a.com", "pw")
+    odd = entry.Entry("a.com", "\x00starts-with-marker")
+    assert odd.encode() != odd.password
+    assert entry.decode("a.com", odd.encode()).password == odd.password
+
+
+def test_rich_round_trip_and_interned_tags():
+    e = entry.Entry.new("a.com", "pw", ["work", "mail", "work"], now=1_700_000_000, username="me", notes="n")
+    other = entry.Entry.new("b.com", "pw2", ["mail", "work"])
+    assert e.tags is other.tags and e.tag_names == ["work", "mail"]
+    value = e.encode()
+    assert value.startswith("\x00[1,")
+    assert entry.decode("a.com", value) == e
+    assert entry.password_of(value) == "pw"
+    with pytest.raises(ValueError):
+        entry.decode("a.com", "\x00[99,\"pw\"]")
+
+
+def test_stamp_lives_in_the_record():
+    assert entry.stamp_of("a.com", "pw") is None and entry.split_stamp("a.com", "pw") == ("pw", None)
+    flat = entry.with_stamp("a.com", "pw", (1_700_000_000, 3))
+    assert entry.stamp_of("a.com", flat) == (1_700_000_000, 3)
+    assert entry.split_stamp("a.com", flat) == ("pw", (1_700_000_000, 3))
+    rich = entry.Entry.new("a.com", "pw", username="me", now=5).encode()
+    value, stamp = entry.split_stamp("a.com", entry.with_stamp("a.com", rich, (9, 2)))
+    assert stamp == (9, 2) and entry.decode("a.com", value).username == "me"
+    assert entry.decode("a.com", value).stamp is None
+    with pytest.raises(ValueError):
+        entry.stamp_of("a.com", '\x00[1,"pw","me","","",[],5,5]')
+
+
+def test_vault_keeps_fields_when_password_changes(tmp_path):
+    path = str(tmp_path / "vault.json")
+    vault = Vault("pw", vault_file=path, flush_delay=None)
+    vault.add("flat.com", "p1")
+    vault.put_entry(entry.Entry.new("rich.com", "p2", ["bank"], username="alice"))
+    vault.add("rich.com", "p3")
+    vault.close()
+
+    vault = Vault("pw", vault_file=path, flush_delay=None)
+    rich = vault.get_entry("rich.com")
+    assert (rich.password, rich.username, rich.tag_names) == ("p3", "alice", ["bank"])
+    # one change history: modified is the stamp the vault gave the last write
+    assert rich.modified and rich.stamp == (rich.modified, 2)
+    assert vault.get("rich.com") == "p3" and dict(vault.items())["flat.com"] == "p1"
+    assert dict(vault.summaries())["rich.com"] == 2
+    vault.close()
+
+
+def test_100k_entries_within_memory_budget():
+    stored = {}
+    for i in range(100_000):
+        site = f"site-{i:06d}.example.com"
+        pwd = f"Pa55-word-{i:012d}!xyz"
+        if i % 2:
+            stored[site] = pwd
+        else:
+            stored[site] = entry.Entry.new(
+                site, pwd, ["work", "email"] if i % 4 else ["personal"],
+                username=f"user{i}@mail.example", url=f"https://{site}/login",
+            ).encode()
+    tracemalloc.start()
+    try:
+        entries = entry.migrate(stored)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    assert len(entries) == 100_000
+    assert peak < entry.MEMORY_BUDGET_100K
@@ -0,0 +1,176 @@
+import sqlite3
+import threading
+import time
+
+import pytest
+from core import recordlog, recovery, sqlitebackend, storage, vaultfile
+from core.crypto import CryptoUtils, IncorrectPasswordError, SessionKey
+from core.vault import Vault
+from conftest import FAST
+
+FORMATS = [storage.FORMAT_BLOB, storage.FORMAT_INDEXED, storage.FORMAT_LOG, storage.FORMAT_SQLITE]
+
+
+def _path(tmp_path, fmt):
+    return str(tmp_path / ("vault.db" if fmt == storage.FORMAT_SQLITE else "vault.json"))
+
+
+def _vault(path, fmt, password="old"):
+    v = Vault(password, vault_file=path, storage_format=fmt, flush_delay=None)
+    v.add("a", "1")
+    v.add("b", "2")
+    return v
+
+
+def test_rewrap_keeps_data_key():
+    session = SessionKey.derive("old", None, FAST)
+    assert session.envelope
+    rewrapped = session.rewrap("new", FAST)
+    assert rewrapped.key == session.key
+    assert rewrapped.salt != session.salt
+    again = SessionKey.derive("new", rewrapped.salt, FAST, rewrapped.key_check(), rewrapped.wrapped)
+    assert again.key == session.key
+    with pytest.raises(IncorrectPasswordError):
+        SessionKey.derive("old", rewrapped.salt, FAST, rewrapped.key_check(), rewrapped.wrapped)
+
+
+@pytest.mark.parametrize("fmt", FORMATS)
+def test_change_password_rewraps(tmp_path, fmt):
+    path = _path(tmp_path, fmt)
+    v = _vault(path, fmt)
+    v.change_password("new")
+    v.close()
+    with pytest.raises(IncorrectPasswordError):
+        Vault("old", vault_file=path)
+    assert sorted(Vault("new", vault_file=path).items()) == [("a", "1"), ("b", "2")]
+
+
+def test_retune_does_not_undo_a_racing_password_change(tmp_path, monkeypatch):
+    path = _path(tmp_path, storage.FORMAT_BLOB)
+    v = _vault(path, storage.FORMAT_BLOB)
+    deriving, release = threading.Event(), threading.Event()
+    rewrap = SessionKey.rewrap
+
+    def slow_rewrap(self, password, params):
+        if password == "old":  # the retune, still on the login password
+            deriving.set()
+            release.wait(2)
+        return rewrap(self, password, params)
+
+    monkeypatch.setattr(SessionKey, "rewrap", slow_rewrap)
+    retune = threading.Thread(target=v.retune_kdf)
+    retune.start()
+    assert deriving.wait(2)
+    change = threading.Thread(target=v.change_password, args=("new",))
+    change.start()
+    time.sleep(0.05)
+    release.set()
+    retune.join(2)
+    change.join(2)
+    v.close()
+    with pytest.raises(IncorrectPasswordError):
+        Vault("old", vault_file=path, flush_delay=None)
+    assert Vault("new", vault_file=path, flush_delay=None).get("a") == "1"
+
+
+def test_change_password_leaves_sqlite_rows_alone(tmp_path):
+    path = _path(tmp_path, storage.FORMAT_SQLITE)
+    v = _vault(path, storage.FORMAT_SQLITE)
+    query = "SELECT site, value FROM entries ORDER BY id"
+    before = sqlite3.connect(path).execute(query).fetchall()
+    v.change_password("new")
+    v.close()
+    assert sqlite3.connect(path).execute(query).fetchall() == before
+
+
+def test_change_password_keeps_log_frames(tmp_path):
+    path = _path(tmp_path, storage.FORMAT_LOG)
+    v = _vault(path, storage.FORMAT_LOG)
+    with open(path, "rb") as f:
+        old = f.read()[len(recordlog._header(v._session)):]
+    v.change_password("new")
+    with open(path, "rb") as f:
+        new = f.read()[len(recordlog._header(v._session)):]
+    v.close()
+    assert new == old
+
+
+@pytest.mark.parametrize("fmt", FORMATS)
+def test_recovery_key_resets_password(tmp_path, fmt):
+    path = _path(tmp_path, fmt)
+    v = _vault(path, fmt)
+    key = v.create_recovery_key()
+    v.close()
+    assert recovery.has_recovery_slot(path)
+
+    Vault.reset_password(key.lower().replace("-", " "), "new", path)
+    with pytest.raises(IncorrectPasswordError):
+        Vault("old", vault_file=path)
+    assert sorted(Vault("new", vault_file=path).items()) == [("a", "1"), ("b", "2")]
+    # the slot wraps the same data key, so it keeps working
+    Vault.reset_password(key, "newer", path)
+    assert sorted(Vault("newer", vault_file=path).items()) == [("a", "1"), ("b", "2")]
+
+
+def test_wrong_recovery_key(tmp_path):
+    path = _path(tmp_path, storage.FORMAT_BLOB)
+    v = _vault(path, storage.FORMAT_BLOB)
+    v.create_recovery_key()
+    v.close()
+    with pytest.raises(IncorrectPasswordError):
+        Vault.reset_password(recovery.generate_recovery_key(), "new", path)
+    assert Vault("old", vault_file=path).get("a") == "1"
+
+
+def test_no_recovery_slot(tmp_path):
+    path = _path(tmp_path, storage.FORMAT_BLOB)
+    _vault(path, storage.FORMAT_BLOB).close()
+    with pytest.raises(FileNotFoundError):
+        Vault.reset_password(recovery.generate_recovery_key(), "new", path)
+
+
+def test_legacy_vault_moves_to_envelope(tmp_path):
+    path = _path(tmp_path, storage.FORMAT_BLOB)
+    legacy = SessionKey.derive("old", CryptoUtils.generate_salt(), FAST)
+    assert not legacy.envelope
+    storage.save_vault({"a": "1"}, "old", path, session=legacy)
+
+    v = Vault("old", vault_file=path, flush_delay=None)
+    assert not v.has_recovery_key()
+    key = v.create_recovery_key()
+    assert v.has_recovery_key()
+    assert v._session.envelope and v._session.key != legacy.key
+    v.close()
+    assert vaultfile.read(path)[0].wrapped_key is not None
+    Vault.reset_password(key, "new", path)
+    assert Vault("new", vault_file=path).items() == [("a", "1")]
+
+
+@pytest.mark.parametrize("fmt", FORMATS)
+def test_new_vaults_use_subkeys_and_keep_them(tmp_path, fmt):
+    path = _path(tmp_path, fmt)
+    v = _vault(path, fmt)
+    assert v._session.subkeys
+    key = v.create_recovery_key()
+    v.change_password("new")
+    v.close()
+    v = Vault("new", vault_file=path)
+    assert v._session.subkeys
+    v.close()
+    Vault.reset_password(key, "newer", path)
+    assert sorted(Vault("newer", vault_file=path).items()) == [("a", "1"), ("b", "2")]
+
+
+def test_envelope_vault_without_subkeys_still_opens(tmp_path):
+    path = _path(tmp_path, storage.FORMAT_SQLITE)
+    session = SessionKey.derive("pw", None, FAST)
+    session.flags = 0
+    backend = sqlitebackend.SqliteBackend(path, session, sqlitebackend._connect(path))
+    backend._conn.executemany(
+        "INSERT INTO meta (key, value) VALUES (?, ?)", sqlitebackend._meta_rows(session)
+    )
+    backend.put("a", "1")
+    backend.close()
+    v = Vault("pw", vault_file=path)
+    assert not v._session.subkeys
+    assert v.items() == [("a", "1")]
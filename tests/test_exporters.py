@@ -0,0 +1,84 @@
+import csv
+import json
+import os
+import tracemalloc
+
+import pytest
+from core import entry, exporters
+from core.backup import iter_backup_records
+from core.vault import Vault
+
+
+@pytest.fixture
+def vault(tmp_path):
+    v = Vault("pw", vault_file=str(tmp_path / "vault.json"), flush_delay=None)
+    v.add_many([("mail.example.com", "a,b\"c"), ("example.com", "ex"), ("bank.test", "bk")])
+    yield v
+    v.close()
+
+
+def test_csv_export_with_filter(tmp_path, vault):
+    path = str(tmp_path / "out.csv")
+    assert exporters.export_vault(vault, path, site_filter="*.example.com") == 1
+    with open(path, newline="", encoding="utf-8") as f:
+        assert list(csv.reader(f)) == [["site", "password"], ["mail.example.com", 'a,b"c']]
+    assert os.stat(path).st_mode & 0o077 == 0
+    assert not os.path.exists(path + ".tmp")
+
+
+def test_jsonl_export_selected_fields(tmp_path, vault):
+    path = str(tmp_path / "out.jsonl")
+    count = exporters.export_vault(vault, path, fields=("site", "version"), site_filter="EXAMPLE")
+    with open(path, encoding="utf-8") as f:
+        rows = [json.loads(line) for line in f]
+    assert count == 2
+    assert sorted(r["site"] for r in rows) == ["example.com", "mail.example.com"]
+    assert all(set(r) == {"site", "version"} and r["version"] == 1 for r in rows)
+
+
+def test_encrypted_export_round_trips(tmp_path, vault):
+    path = str(tmp_path / "out.psafe")
+    with pytest.raises(ValueError):
+        exporters.export_vault(vault, path)
+    exporters.export_vault(vault, path, fields=exporters.FIELDS, password="pw")
+    records = {site: (pwd, stamp) for site, pwd, stamp in iter_backup_records(path, "pw")}
+    assert {site: pwd for site, (pwd, _) in records.items()} == dict(vault.items())
+    assert all(stamp is not None for _, stamp in records.values())
+
+
+def test_bad_fields_and_format(tmp_path, vault):
+    with pytest.raises(ValueError):
+        exporters.export_vault(vault, str(tmp_path / "out.csv"), fields=("site", "comment"))
+    with pytest.raises(ValueError):
+        exporters.export_vault(vault, str(tmp_path / "out.txt"))
+
+
+def test_memory_stays_flat(tmp_path):
+    def rows(n):
+        for i in range(n):
+            yield f"site-{i}.example", f"password-{i:08d}" * 4, (1_700_000_000 + i, 1)
+
+    peaks = []
+    for n in (5_000, 50_000):
+        tracemalloc.start()
+        exporters.export_rows(rows(n), str(tmp_path / f"{n}.jsonl"), fields=exporters.FIELDS)
+        peaks.append(tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+    assert peaks[1] < peaks[0] * 2 + 64 * 1024
+
+
+def test_rich_entry_fields(tmp_path, vault):
+    vault.put_entry(entry.Entry.new("shop.test", "s3", ["retail", "card"], username="bob"))
+    path = str(tmp_path / "out.csv")
+    exporters.export_vault(vault, path, fields=("site", "username", "tags"), site_filter="shop")
+    with open(path, newline="", encoding="utf-8") as f:
+        assert list(csv.reader(f))[1] == ["shop.test", "bob", "retail;card"]
+
+
+def test_main_rejects_missing_vault(tmp_path, monkeypatch, capsys):
+    monkeypatch.setattr(exporters.getpass, "getpass", lambda prompt: pytest.fail("prompted"))
+    out = tmp_path / "out.csv"
+    with pytest.raises(SystemExit) as exc:
+        exporters.main([str(tmp_path / "valut.json"), str(out)])
+    assert exc.value.code == 2 and "no vault at" in capsys.readouterr().err
+    assert not out.exists() and not (tmp_path / "valut.json").exists()
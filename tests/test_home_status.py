@@ -0,0 +1,34 @@
+import pytest
+
+pytest.importorskip("kivy")
+
+from app_state import app_state  # noqa: E402
+from core.vault import Vault  # noqa: E402
+from kivy.uix.screenmanager import ScreenManager  # noqa: E402
+from ui.app import PersonalSafeApp  # noqa: E402
+from ui.screens.home_screen import HomeScreen  # noqa: E402
+from ui.screens.login_screen import LoginScreen  # noqa: E402
+
+
+@pytest.fixture
+def vault(tmp_path, monkeypatch):
+    v = Vault("pw", vault_file=str(tmp_path / "vault.json"), flush_delay=None)
+    monkeypatch.setattr(app_state, "vault", v, raising=False)
+    yield v
+    v.close()
+
+
+def test_missing_recovery_key_reaches_home(vault):
+    app = PersonalSafeApp()
+    app.sm = ScreenManager()
+    home = HomeScreen(name="HOME")
+    app.sm.add_widget(home)
+    home.refresh_entries()
+    app.show_status(LoginScreen(name="LOGIN")._login_status(vault))
+    assert "recovery key" in home.notice
+    home.on_pre_enter()
+    assert "recovery key" in home.notice
+
+    vault.create_recovery_key()
+    app.show_status(LoginScreen(name="LOGIN")._login_status(vault))
+    assert home.notice == ""
@@ -0,0 +1,139 @@
+import time
+
+import pytest
+from core import importers
+from core.vault import Vault
+
+CHROME_CSV = """name,url,username,password,note
+GitHub,https://github.com/login,alice,gh-pass,
+Example,https://www.Example.com:8443/path,bob,ex-pass,
+Example,https://example.com/other,carol,ex-pass-2,
+GitHub,https://github.com/login,alice,gh-pass,
+Blank,https://blank.example,dave,,
+"""
+
+FIREFOX_CSV = """url,username,password,httpRealm,formActionOrigin,guid,timeCreated,timeLastUsed,timePasswordChanged
+https://mail.example.org,erin,"pa,ss""word",,https://mail.example.org,{1},1,1,1
+"""
+
+BITWARDEN_CSV = """folder,favorite,type,name,notes,fields,reprompt,login_uri,login_username,login_password,login_totp
+,,login,Bank,,,0,https://bank.example/,frank,bank-pass,
+,,note,Secret note,text,,0,,,,
+,,login,Router,,,0,,admin,router-pass,
+"""
+
+KEEPASS_XML = """<?xml version="1.0" encoding="utf-8"?>
+<KeePassFile><Root><Group><Name>Root</Name>
+  <Entry>
+    <String><Key>Title</Key><Value>Forum</Value></String>
+    <String><Key>UserName</Key><Value>gina</Value></String>
+    <String><Key>Password</Key><Value>forum-new</Value></String>
+    <String><Key>URL</Key><Value>forum.example.net</Value></String>
+    <History><Entry>
+      <String><Key>Title</Key><Value>Forum</Value></String>
+      <String><Key>Password</Key><Value>forum-old</Value></String>
+    </Entry></History>
+  </Entry>
+  <Group><Name>Work</Name>
+    <Entry>
+      <String><Key>Title</Key><Value>VPN</Value></String>
+      <String><Key>Password</Key><Value>vpn-pass</Value></String>
+    </Entry>
+  </Group>
+</Group></Root></KeePassFile>
+"""
+
+
+@pytest.fixture
+def vault(tmp_path):
+    v = Vault("pw", vault_file=str(tmp_path / "vault.json"), flush_delay=None)
+    yield v
+    v.close()
+
+
+def _write(tmp_path, name, text):
+    path = tmp_path / name
+    path.write_text(text, encoding="utf-8")
+    return str(path)
+
+
+def test_normalize_site():
+    assert importers.normalize_site("https://WWW.Example.com:8443/x?y") == "example.com"
+    assert importers.normalize_site("example.com/login") == "example.com"
+    assert importers.normalize_site("", " My Router ") == "My Router"
+
+
+def test_chrome_csv_dedupes(tmp_path, vault):
+    result = importers.import_file(vault, _write(tmp_path, "chrome.csv", CHROME_CSV))
+    assert dict(vault.items()) == {
+        "github.com": "gh-pass",
+        "example.com": "ex-pass",
+        "example.com (carol)": "ex-pass-2",
+    }
+    assert (result.added, result.duplicates, result.invalid) == (3, 1, 1)
+    assert vault.get_entry("github.com").username == "alice"
+    assert vault.get_entry("example.com (carol)").username == "carol"
+
+
+def test_firefox_and_bitwarden_csv(tmp_path, vault):
+    importers.import_file(vault, _write(tmp_path, "ff.csv", FIREFOX_CSV))
+    importers.import_file(vault, _write(tmp_path, "bw.csv", BITWARDEN_CSV))
+    assert dict(vault.items()) == {
+        "mail.example.org": 'pa,ss"word',
+        "bank.example": "bank-pass",
+        "Router": "router-pass",
+    }
+
+
+def test_keepass_xml_skips_history(tmp_path, vault):
+    importers.import_file(vault, _write(tmp_path, "export.xml", KEEPASS_XML))
+    assert dict(vault.items()) == {"forum.example.net": "forum-new", "VPN": "vpn-pass"}
+
+
+def test_existing_entries_kept_unless_overwrite(tmp_path, vault):
+    vault.add("github.com", "mine")
+    vault.add("example.com", "ex-pass")
+    path = _write(tmp_path, "chrome.csv", CHROME_CSV)
+    result = importers.import_file(vault, path)
+    assert vault.get("github.com") == "mine"
+    # same password: the entry only gains its username
+    assert (result.added, result.updated, result.conflicts) == (1, 1, 1)
+    assert vault.get_entry("example.com").username == "bob"
+    result = importers.import_file(vault, path)
+    assert (result.unchanged, result.conflicts) == (2, 1)
+    result = importers.import_file(vault, path, overwrite=True)
+    assert vault.get("github.com") == "gh-pass" and result.updated == 1
+    assert vault.get_entry("github.com").username == "alice"
+
+
+def test_unknown_csv_and_cancel_leave_vault_unchanged(tmp_path, vault):
+    vault.add("keep", "1")
+    with pytest.raises(ValueError):
+        importers.import_file(vault, _write(tmp_path, "bad.csv", "a,b\n1,2\n"))
+
+    rows = "".join(f"s{i},https://s{i}.example,u,p{i}\n" for i in range(5000))
+    path = _write(tmp_path, "big.csv", "name,url,username,password\n" + rows)
+
+    def cancel(fraction, message):
+        if fraction > 0.5:
+            raise RuntimeError("cancelled")
+
+    with pytest.raises(RuntimeError):
+        importers.import_file(vault, path, progress=cancel)
+    assert dict(vault.items()) == {"keep": "1"}
+
+
+def test_10k_import_is_one_save(tmp_path, vault):
+    rows = "".join(f"s{i},https://s{i}.example/login,user{i},pass-{i}\n" for i in range(10_000))
+    path = _write(tmp_path, "big.csv", "name,url,username,password\n" + rows)
+    saves = []
+    real_save = vault._backend.save
+    vault._backend.save = lambda data: (saves.append(1), real_save(data))
+    fractions = []
+    start = time.perf_counter()
+    result = importers.import_file(vault, path, progress=lambda f, m: fractions.append(f))
+    elapsed = time.perf_counter() - start
+    assert result.added == 10_000 and len(vault.get_sites()) == 10_000
+    assert len(saves) == 1
+    assert fractions == sorted(fractions) and fractions[-1] == 1.0
+    assert elapsed < 5
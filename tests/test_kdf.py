@@ -0,0 +1,84 @@
+import base64
+import json
+import pytest
+from core import backup, kdf, recordlog, storage, vaultfile
+from core.crypto import CryptoUtils, SessionKey
+from core.vault import Vault
+
+FAST_SCRYPT = kdf.KdfParams(kdf.SCRYPT, (10, 8, 1))
+FAST_PBKDF2 = kdf.pbkdf2(1000)
+
+
+@pytest.mark.real_kdf
+def test_calibration_picks_strongest_and_respects_floors():
+    params = kdf.calibrate()
+    assert params.kdf_id == kdf.available()[0]
+    assert kdf.calibrate(kdf.PBKDF2_SHA256).params[0] >= kdf.MIN_PBKDF2_ITERATIONS
+    assert kdf.calibrate(kdf.SCRYPT).params[0] >= kdf.MIN_SCRYPT_LOG2_N
+    assert not kdf.is_outdated(params)
+    assert kdf.is_outdated(FAST_PBKDF2)
+
+
+@pytest.mark.parametrize("params", [FAST_PBKDF2, FAST_SCRYPT])
+def test_header_records_kdf(tmp_path, params):
+    path = str(tmp_path / "vault.json")
+    session = SessionKey.derive("pw", None, params)
+    storage.save_vault({"a": "1"}, "pw", path, session=session)
+    header, _ = vaultfile.read(path)
+    assert header.kdf == params
+    data, reopened = storage.unlock("pw", path)
+    assert data == {"a": "1"}
+    assert reopened.kdf == params
+
+
+def test_pbkdf2_params_match_legacy_derive_key():
+    salt = CryptoUtils.generate_salt()
+    assert kdf.LEGACY.derive("pw", salt) == CryptoUtils.derive_key("pw", salt)
+
+
+def test_record_log_header_records_kdf(tmp_path):
+    path = str(tmp_path / "vault.json")
+    session = SessionKey.derive("pw", None, FAST_SCRYPT)
+    recordlog.RecordLog(path, session).put("a", "1")
+    assert recordlog.read_header(path)[:2] == (session.salt, FAST_SCRYPT)
+    data, reopened, _ = storage.unlock_record_log("pw", path)
+    assert data == {"a": "1"}
+    assert reopened.kdf == FAST_SCRYPT
+
+
+@pytest.mark.parametrize(
+    "fmt", [storage.FORMAT_BLOB, storage.FORMAT_INDEXED, storage.FORMAT_LOG, storage.FORMAT_SQLITE]
+)
+def test_retune_rekeys_every_format(tmp_path, fmt):
+    path = str(tmp_path / ("vault.db" if fmt == storage.FORMAT_SQLITE else "vault.json"))
+    v = Vault("pw", vault_file=path, storage_format=fmt, flush_delay=None)
+    v.add("github.com", "meow123")
+    v.add("discord", "abc123")
+    v.retune_kdf(FAST_SCRYPT)
+    v.add("new.example", "secret")
+    v.close()
+
+    reopened = Vault("pw", vault_file=path, flush_delay=None)
+    assert reopened._session.kdf == FAST_SCRYPT
+    assert dict(reopened.items()) == {
+        "github.com": "meow123",
+        "discord": "abc123",
+        "new.example": "secret",
+    }
+    reopened.close()
+
+
+def test_backup_records_kdf_and_reads_legacy(tmp_path):
+    data = backup.create_encrypted_backup_bytes({"entries": {"a": "1"}}, "pw")
+    assert json.loads(data)["kdf"]["id"] == kdf.calibrate().kdf_id
+    assert backup.decrypt_encrypted_backup_bytes(data, "pw") == {"entries": {"a": "1"}}
+
+    legacy = json.loads(data)
+    del legacy["kdf"]
+    salt = CryptoUtils.generate_salt()
+    key = backup.LEGACY_KDF.derive("pw", salt)
+    legacy["salt"] = base64.b64encode(salt).decode()
+    legacy["payload"] = CryptoUtils.encrypt(json.dumps({"entries": {}}), key)
+    assert backup.decrypt_encrypted_backup_bytes(json.dumps(legacy).encode(), "pw") == {
+        "entries": {}
+    }
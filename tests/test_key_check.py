@@ -0,0 +1,98 @@
+import pytest
+from core import kdf, storage, vaultfile
+from core.crypto import CryptoUtils, IncorrectPasswordError, SessionKey
+from core.vault import Vault
+from conftest import FAST
+
+FORMATS = [storage.FORMAT_BLOB, storage.FORMAT_INDEXED, storage.FORMAT_LOG, storage.FORMAT_SQLITE]
+
+
+def _path(tmp_path, fmt):
+    return str(tmp_path / ("vault.db" if fmt == storage.FORMAT_SQLITE else "vault.json"))
+
+
+@pytest.mark.parametrize("fmt", FORMATS)
+def test_wrong_password_raises_for_every_format(tmp_path, fmt):
+    path = _path(tmp_path, fmt)
+    v = Vault("right", vault_file=path, storage_format=fmt, flush_delay=None)
+    v.add("a", "1")
+    v.close()
+    assert storage.has_key_check(path)
+    with pytest.raises(IncorrectPasswordError):
+        Vault("wrong", vault_file=path)
+    assert storage.load_vault("wrong", path) == {}
+
+
+def test_unlock_runs_the_kdf_once(tmp_path, monkeypatch):
+    path = str(tmp_path / "vault.json")
+    storage.save_vault({"a": "1"}, "pw", path, session=SessionKey.derive("pw", None, FAST))
+    calls = []
+    original = kdf.KdfParams.derive
+    monkeypatch.setattr(
+        kdf.KdfParams, "derive", lambda self, *a, **k: calls.append(1) or original(self, *a, **k)
+    )
+    v = Vault("pw", vault_file=path, flush_delay=None)
+    assert v.items() == [("a", "1")]
+    assert len(calls) == 1
+
+
+def test_legacy_header_without_check_is_upgraded(tmp_path):
+    path = str(tmp_path / "vault.json")
+    # keyed directly by the password, as vaults were before the data key was wrapped
+    session = SessionKey.derive("pw", CryptoUtils.generate_salt(), FAST)
+    header = vaultfile.VaultHeader(FAST.kdf_id, FAST.params, session.salt)
+    vaultfile.atomic_write(path, vaultfile.seal(header, session.key, b'{"a": "1"}'))
+    assert not storage.has_key_check(path)
+    with pytest.raises(IncorrectPasswordError):
+        storage.unlock("wrong", path)
+
+    v = Vault("pw", vault_file=path, flush_delay=None)
+    v.ensure_key_check()
+    assert storage.has_key_check(path)
+    assert storage.load_vault("pw", path) == {"a": "1"}
+
+
+def test_change_password_keeps_entries(tmp_path):
+    path = str(tmp_path / "vault.json")
+    v = Vault("old", vault_file=path, flush_delay=None)
+    v.add("a", "1")
+    v.change_password("new")
+    v.close()
+    with pytest.raises(IncorrectPasswordError):
+        Vault("old", vault_file=path)
+    assert Vault("new", vault_file=path).items() == [("a", "1")]
+
+
+@pytest.mark.parametrize("damage", ["version", "truncated"])
+def test_unreadable_header_never_opens_empty(tmp_path, damage):
+    path = str(tmp_path / "vault.json")
+    v = Vault("right", vault_file=path, flush_delay=None)
+    v.add("a", "1")
+    v.close()
+    with open(path, "rb") as f:
+        data = bytearray(f.read())
+    if damage == "version":
+        data[len(vaultfile.MAGIC)] = 9
+    else:
+        data = data[: len(vaultfile.MAGIC) + 3]
+    with open(path, "wb") as f:
+        f.write(data)
+    with pytest.raises(ValueError):
+        Vault("WRONG", vault_file=path, flush_delay=None)
+    with open(path, "rb") as f:
+        assert f.read() == bytes(data)
+
+
+def test_sqlite_rows_without_header_are_refused(tmp_path):
+    import sqlite3
+
+    path = str(tmp_path / "vault.db")
+    v = Vault("right", vault_file=path, storage_format=storage.FORMAT_SQLITE, flush_delay=None)
+    v.add("a", "1")
+    v.close()
+    conn = sqlite3.connect(path)
+    with conn:
+        conn.execute("DELETE FROM meta")
+    conn.close()
+    with pytest.raises(ValueError):
+        Vault("WRONG", vault_file=path, flush_delay=None)
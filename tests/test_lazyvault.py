@@ -0,0 +1,116 @@
+import threading
+
+import pytest
+from core import lazyvault, storage
+from core.crypto import IncorrectPasswordError, SessionKey
+from core.lazyvault import LazyEntries, SealedValue
+from core.vault import Vault
+
+
+def _make_indexed(path, data, password="TestPass123"):
+    session = SessionKey.derive(password)
+    storage.save_vault(data, password, path, session=session, fmt=storage.FORMAT_INDEXED)
+    return session
+
+
+def test_unlock_only_reads_index(tmp_path):
+    path = str(tmp_path / "vault.json")
+    _make_indexed(path, {"github.com": "meow123", "discord": "abc123"})
+    assert storage.vault_format(path) == storage.FORMAT_INDEXED
+
+    entries, _ = storage.unlock_indexed("TestPass123", path)
+    assert all(isinstance(v, SealedValue) for v in entries._entries.values())
+    assert entries.secret_length("github.com") == 7
+    assert entries["github.com"] == "meow123"
+    # reading does not cache plaintext
+    assert isinstance(entries._entries["github.com"], SealedValue)
+
+
+def test_load_vault_decrypts_everything(tmp_path):
+    path = str(tmp_path / "vault.json")
+    data = {f"site{i}": f"pwd{i}" for i in range(50)}
+    _make_indexed(path, data)
+    assert storage.load_vault("TestPass123", path) == data
+
+
+def test_write_reseals_and_drops_plaintext(tmp_path):
+    path = str(tmp_path / "vault.json")
+    session = _make_indexed(path, {"a": "1", "b": "2"})
+    entries = LazyEntries.open(path, session)
+    entries["c"] = "3"
+    del entries["a"]
+    entries.write()
+    assert isinstance(entries._entries["c"], SealedValue)
+    assert dict(entries) == {"b": "2", "c": "3"}
+    assert dict(LazyEntries.open(path, session)) == {"b": "2", "c": "3"}
+
+
+def test_put_and_write_during_write(tmp_path, monkeypatch):
+    path = str(tmp_path / "vault.json")
+    session = _make_indexed(path, {"a": "1", "b": "2"})
+    entries = LazyEntries.open(path, session)
+    entries["c"] = "3"
+    sealing, release = threading.Event(), threading.Event()
+    encode = lazyvault._encode
+
+    def slow_encode(*args):
+        if not sealing.is_set():
+            sealing.set()
+            release.wait(2)
+        return encode(*args)
+
+    monkeypatch.setattr(lazyvault, "_encode", slow_encode)
+    first = threading.Thread(target=entries.write)
+    first.start()
+    assert sealing.wait(2)
+    entries["c"] = "changed"
+    del entries["a"]
+    second = threading.Thread(target=entries.write)
+    second.start()
+    release.set()
+    first.join(5)
+    second.join(5)
+    assert entries["c"] == "changed" and "a" not in entries
+    assert all(isinstance(v, SealedValue) for v in entries._entries.values())
+    assert entries.decrypt_all() == {"b": "2", "c": "changed"}
+    assert LazyEntries.open(path, session).decrypt_all() == {"b": "2", "c": "changed"}
+
+
+def test_vault_summaries_and_get(tmp_path):
+    path = str(tmp_path / "vault.json")
+    v = Vault("TestPass123", vault_file=path, storage_format=storage.FORMAT_INDEXED)
+    v.add("github.com", "meow123")
+    v.add("discord", "abc123")
+    v.close()
+
+    reopened = Vault("TestPass123", vault_file=path)
+    assert reopened.summaries() == [("github.com", 7), ("discord", 6)]
+    assert reopened.get("discord") == "abc123"
+    assert reopened.get("unknown") is None
+    assert reopened.delete("github.com")
+    reopened.clear()
+    reopened.close()
+    assert storage.load_vault("TestPass123", path) == {}
+
+
+def test_write_snapshots_under_the_vault_lock(tmp_path):
+    path = str(tmp_path / "vault.json")
+    v = Vault("pw", vault_file=path, storage_format=storage.FORMAT_INDEXED, flush_delay=None)
+    v.add("a", "1")
+    written = threading.Event()
+    with v._lock:
+        writer = threading.Thread(target=lambda: (v._backend._write(), written.set()))
+        writer.start()
+        # e.g. a batch being applied: the snapshot must not see half of it
+        assert not written.wait(0.2)
+        v._data["b"] = "2"
+    writer.join(5)
+    assert written.is_set()
+    assert sorted(Vault("pw", vault_file=path).items()) == [("a", "1"), ("b", "2")]
+
+
+def test_wrong_password_index(tmp_path):
+    path = str(tmp_path / "vault.json")
+    _make_indexed(path, {"a": "1"})
+    with pytest.raises(IncorrectPasswordError):
+        storage.unlock_indexed("wrong", path)
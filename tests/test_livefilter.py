@@ -0,0 +1,83 @@
+import queue
+import threading
+import time
+
+from core.livefilter import LiveFilter
+
+
+def _collector():
+    results = queue.Queue()
+    return results, lambda query, result: results.put((query, result))
+
+
+def test_debounce_runs_only_the_latest_query():
+    ran = []
+    results, on_result = _collector()
+    live = LiveFilter(lambda q, cancelled: ran.append(q) or q.upper(), on_result, delay=0.05)
+    for text in ("g", "gi", "git"):
+        live.submit(text)
+        time.sleep(0.005)
+    assert results.get(timeout=2) == ("git", "GIT")
+    assert ran == ["git"]
+    live.close()
+
+
+def test_stale_result_is_dropped_and_slow_query_cancelled():
+    started, release = threading.Event(), threading.Event()
+    gave_up = []
+
+    def run(query, cancelled):
+        if query == "slow":
+            started.set()
+            release.wait(2)
+            gave_up.append(cancelled())
+        return query
+
+    results, on_result = _collector()
+    live = LiveFilter(run, on_result, delay=0)
+    live.submit("slow")
+    started.wait(2)
+    live.submit("fast")
+    release.set()
+    assert results.get(timeout=2) == ("fast", "fast")
+    assert gave_up == [True] and results.empty()
+    live.close()
+
+
+def test_dispatch_and_cancel():
+    dispatched = queue.Queue()
+    results, on_result = _collector()
+    live = LiveFilter(lambda q, c: q, on_result, delay=0, dispatch=dispatched.put)
+    live.submit("a")
+    deliver = dispatched.get(timeout=2)
+    assert results.empty()
+    live.cancel()  # e.g. the filter box was cleared before the UI ran the callback
+    deliver()
+    assert results.empty()
+    live.submit("b")
+    dispatched.get(timeout=2)()
+    assert results.get_nowait() == ("b", "b")
+    live.close()
+
+
+def test_generator_delivers_each_part_until_superseded():
+    started, release = threading.Event(), threading.Event()
+
+    def run(query, cancelled):
+        yield query + ":page"
+        if query == "slow":
+            started.set()
+            release.wait(2)
+        yield query + ":all"
+
+    results, on_result = _collector()
+    live = LiveFilter(run, on_result, delay=0)
+    live.submit("slow")
+    started.wait(2)
+    assert results.get(timeout=2) == ("slow", "slow:page")
+    live.submit("fast")
+    release.set()
+    assert results.get(timeout=2) == ("fast", "fast:page")
+    assert results.get(timeout=2) == ("fast", "fast:all")
+    live.close()
+    assert results.empty()
@@ -0,0 +1,100 @@
+import pytest
+from core import backup, merge, storage
+from core.vault import Vault
+
+
+def _vault(tmp_path, name, entries=()):
+    v = Vault("pw", vault_file=str(tmp_path / name), flush_delay=None)
+    for site, pwd in entries:
+        v.add(site, pwd)
+    return v
+
+
+@pytest.mark.parametrize(
+    "local, incoming, expected",
+    [
+        (("x", (10, 2)), ("x", (20, 5)), merge.UNCHANGED),
+        (("x", (10, 2)), ("y", (20, 3)), merge.UPDATED),
+        (("x", (20, 3)), ("y", (10, 2)), merge.UNCHANGED),
+        (("x", (10, 3)), ("y", (20, 3)), merge.CONFLICT),
+        (("x", (30, 2)), ("y", (20, 3)), merge.CONFLICT),
+        (("x", None), ("y", (20, 3)), merge.CONFLICT),
+        (("x", (10, 2)), ("y", None), merge.CONFLICT),
+    ],
+)
+def test_classify(local, incoming, expected):
+    assert merge.classify(local[0], local[1], incoming[0], incoming[1]) == expected
+
+
+def test_merge_diverged_copies(tmp_path):
+    mine = _vault(tmp_path, "mine.json", [("a", "1"), ("b", "2"), ("c", "3"), ("d", "4")])
+    shared = str(tmp_path / "shared.psafe")
+    mine.export_encrypted_backup(shared, "pw")
+
+    theirs = _vault(tmp_path, "theirs.json")
+    theirs.import_encrypted_backup(shared, "pw")
+    theirs.add("b", "2-theirs")
+    theirs.add("c", "3-theirs")
+    theirs.add("e", "5")
+    incoming = str(tmp_path / "theirs.psafe")
+    theirs.export_encrypted_backup(incoming, "pw")
+
+    mine.add("a", "1-mine")
+    mine.add("c", "3-mine")
+    plan = mine.plan_merge(incoming, "pw")
+    assert [i.site for i in plan.added] == ["e"]
+    assert [i.site for i in plan.updated] == ["b"]
+    assert [(i.site, i.local, i.incoming) for i in plan.conflicts] == [("c", "3-mine", "3-theirs")]
+    assert plan.unchanged == 2  # "a" is newer here, "d" matches
+
+    saves = []
+    real_save = mine._backend.save
+    mine._backend.save = lambda data: (saves.append(1), real_save(data))
+    assert mine.apply_merge(plan, merge.KEEP_LOCAL) == 3
+    assert len(saves) == 1
+    assert dict(mine.items()) == {"a": "1-mine", "b": "2-theirs", "c": "3-mine", "d": "4", "e": "5"}
+    # the resolved conflict is stamped past both sides: nothing left to merge
+    assert mine.plan_merge(incoming, "pw").empty
+
+
+def test_choices_override_resolution():
+    plan = merge.MergePlan()
+    plan.conflicts = [
+        merge.MergeItem("a", merge.CONFLICT, "old", "new", (5, 2), (9, 2)),
+        merge.MergeItem("b", merge.CONFLICT, "old", "new", (5, 2), (9, 2)),
+    ]
+    changes = list(plan.changes(merge.KEEP_NEWER, {"b": merge.KEEP_LOCAL}, now=100))
+    assert changes == [("a", "new", (100, 3)), ("b", "old", (100, 3))]
+    with pytest.raises(ValueError):
+        list(plan.changes("sideways"))
+
+
+def test_unstamped_backup_conflicts_and_blind_merge_prefers_backup(tmp_path):
+    v = _vault(tmp_path, "vault.json", [("a", "1"), ("b", "2")])
+    legacy = str(tmp_path / "legacy.psafe")
+    backup.save_backup_entries([("a", "1"), ("b", "other"), ("c", "3")], "pw", legacy)
+    plan = v.plan_merge(legacy, "pw")
+    assert plan.counts() == {"added": 1, "updated": 0, "conflict": 1, "unchanged": 1}
+
+    v.import_encrypted_backup(legacy, "pw", replace_existing=False)
+    assert dict(v.items()) == {"a": "1", "b": "other", "c": "3"}
+
+
+def test_stamps_persist_and_follow_rekey(tmp_path):
+    path = str(tmp_path / "vault.json")
+    v = _vault(tmp_path, "vault.json", [("a", "1")])
+    v.add("a", "2")
+    v.delete("missing")
+    v.change_password("new")
+    stamp = v.get_entry("a").stamp
+    v.close()
+    assert stamp[1] == 2
+    v = Vault("new", vault_file=path, flush_delay=None)
+    assert v.get_entry("a").stamp == stamp
+    assert list(v.iter_entries()) == [("a", "2", stamp)]
+    v.delete("a")
+    v.close()
+    v = Vault("new", vault_file=path, flush_delay=None)
+    assert v.get_entry("a") is None and v.is_empty()
+
+
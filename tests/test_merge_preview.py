@@ -0,0 +1,13 @@
+import pytest
+
+pytest.importorskip("kivy")
+
+from core import merge  # noqa: E402
+from ui.screens.merge_preview_screen import _describe  # noqa: E402
+
+
+def test_site_names_are_not_markup():
+    plan = merge.MergePlan()
+    plan.added.append(merge.MergeItem("[/b][color=ff0000]bank[/color]", merge.ADDED, None, "x", None, None))
+    details = _describe(plan)
+    assert "[color=ff0000]" not in details and "&bl;/b&br;" in details
@@ -0,0 +1,48 @@
+import pytest
+from cryptography.exceptions import InvalidTag
+from core import entry, parallel, storage
+from core.crypto import Cipher
+from core.vault import Vault
+
+KEY = bytes(range(32))
+FORMATS = [storage.FORMAT_INDEXED, storage.FORMAT_LOG, storage.FORMAT_SQLITE]
+
+
+@pytest.fixture
+def always_parallel(monkeypatch):
+    monkeypatch.setattr(parallel, "PARALLEL_THRESHOLD", 1)
+    monkeypatch.setattr(parallel, "MAX_WORKERS", 4)
+
+
+def test_decrypt_many_keeps_order(always_parallel):
+    cipher = Cipher(KEY)
+    records = [f"pw{i}".encode() for i in range(103)]
+    sites = [f"site{i}".encode() for i in range(103)]
+    sealed = cipher.encrypt_many(records, sites)
+    assert parallel.decrypt_many(cipher, sealed, sites) == records
+    sealed[57] = sealed[58]
+    with pytest.raises(InvalidTag):
+        parallel.decrypt_many(cipher, sealed, sites)
+
+
+def test_small_batches_stay_on_the_calling_thread(monkeypatch):
+    monkeypatch.setattr(parallel, "_pool", lambda: pytest.fail("pool used"))
+    cipher = Cipher(KEY)
+    sealed = cipher.encrypt_many([b"a", b"b"])
+    assert parallel.decrypt_many(cipher, sealed, workers=4) == [b"a", b"b"]
+
+
+@pytest.mark.parametrize("fmt", FORMATS)
+def test_bulk_reads_match(tmp_path, fmt, always_parallel):
+    path = str(tmp_path / ("vault.db" if fmt == storage.FORMAT_SQLITE else "vault.json"))
+    data = {f"site{i}": f"pw{i}" for i in range(50)}
+    v = Vault("pw", vault_file=path, storage_format=fmt, flush_delay=None)
+    for site, pwd in data.items():
+        v.add(site, pwd)
+    v.close()
+    stored = storage.load_vault("pw", path)
+    assert {site: entry.password_of(value) for site, value in stored.items()} == data
+    v = Vault("pw", vault_file=path)
+    v.add("site3", "changed")
+    assert dict(v.items()) == {**data, "site3": "changed"}
+    assert [site for site, _ in v.items()] == list(data)
@@ -0,0 +1,92 @@
+import os
+import pytest
+from core import entry, recordlog, storage
+from core.crypto import IncorrectPasswordError, SessionKey
+from core.recordlog import RecordLog
+from core.vault import Vault
+
+
+def test_put_delete_replay(tmp_path):
+    path = str(tmp_path / "vault.json")
+    session = SessionKey.derive("TestPass123")
+    log = RecordLog(path, session)
+    log.put("github.com", "meow123")
+    log.put("discord", "abc123")
+    log.put("github.com", "meow456")
+    log.delete("discord")
+
+    replayed = RecordLog(path, session)
+    assert replayed.replay() == {"github.com": "meow456"}
+    assert replayed.dead_records == 3
+
+
+def test_only_version_1_logs_are_read(tmp_path):
+    path = str(tmp_path / "vault.json")
+    session = SessionKey.derive("TestPass123")
+    RecordLog(path, session).put("a", "1")
+    assert recordlog.read_header(path)[:3] == (session.salt, session.kdf, session.key_check())
+    with open(path, "r+b") as f:
+        f.seek(len(recordlog.LOG_MAGIC))
+        f.write(bytes((2,)))
+    with pytest.raises(ValueError):
+        recordlog.read_header(path)
+
+
+def test_append_writes_one_small_frame(tmp_path):
+    path = str(tmp_path / "vault.json")
+    log = RecordLog(path, SessionKey.derive("TestPass123"))
+    log.rewrite({f"site{i}": f"pwd{i}" for i in range(2000)})
+    before = os.path.getsize(path)
+    log.put("new.example", "secret")
+    assert os.path.getsize(path) - before < 200
+
+
+def test_compaction_drops_dead_records(tmp_path, monkeypatch):
+    monkeypatch.setattr(recordlog, "COMPACT_MIN_DEAD", 10)
+    path = str(tmp_path / "vault.json")
+    session = SessionKey.derive("TestPass123")
+    log = RecordLog(path, session)
+    for i in range(30):
+        log.put("github.com", f"pwd{i}")
+    log.wait_for_compaction()
+    assert log.dead_records < 10
+    assert RecordLog(path, session).replay() == {"github.com": "pwd29"}
+
+
+def test_torn_tail_is_ignored(tmp_path):
+    path = str(tmp_path / "vault.json")
+    session = SessionKey.derive("TestPass123")
+    log = RecordLog(path, session)
+    log.put("a", "1")
+    log.put("b", "2")
+    with open(path, "r+b") as f:
+        f.truncate(os.path.getsize(path) - 5)
+
+    log = RecordLog(path, session)
+    assert log.replay() == {"a": "1"}
+    log.put("c", "3")
+    assert RecordLog(path, session).replay() == {"a": "1", "c": "3"}
+
+
+def test_wrong_password_refuses_writes(tmp_path):
+    path = str(tmp_path / "vault.json")
+    RecordLog(path, SessionKey.derive("right")).put("a", "1")
+    with pytest.raises(IncorrectPasswordError):
+        storage.unlock_record_log("wrong", path)
+    log = RecordLog(path, SessionKey.derive("wrong"))
+    with pytest.raises(ValueError):
+        log.put("b", "2")
+
+
+def test_vault_converts_blob_to_log(tmp_path):
+    path = str(tmp_path / "vault.json")
+    storage.save_vault({"a": "1"}, "pw", path)
+    v = Vault("pw", vault_file=path, storage_format=storage.FORMAT_LOG)
+    v.add("b", "2")
+    assert storage.vault_format(path) == storage.FORMAT_LOG
+    v.delete("a")
+
+    reopened = Vault("pw", vault_file=path)
+    assert reopened.items() == [("b", "2")]
+    stored = storage.load_vault("pw", path)
+    assert list(stored) == ["b"] and entry.password_of(stored["b"]) == "2"
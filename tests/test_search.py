@@ -0,0 +1,68 @@
+import random
+import time
+
+from core.search import SearchIndex
+from core.vault import Vault
+
+
+def test_ranking():
+    index = SearchIndex(["GitHub.com", "git", "gitlab.com", "my-git.io", "digital.net", "bank.de"])
+    assert index.search("git") == ["git", "GitHub.com", "gitlab.com", "digital.net", "my-git.io"]
+    assert index.search("GIT", limit=2) == ["git", "GitHub.com"]
+    assert index.search("b.co") == ["GitHub.com", "gitlab.com"]
+    assert index.search("gitlabb.com") == ["gitlab.com"]  # fuzzy
+    assert index.search("") == [] and index.search("zz") == []
+
+
+def test_incremental_updates():
+    index = SearchIndex()
+    for site in ("Mail.example", "mail.example", "webmail.test"):
+        index.add(site)
+    index.add("mail.example")
+    assert len(index) == 3
+    assert index.search("mail") == ["Mail.example", "mail.example", "webmail.test"]
+    index.discard("Mail.example")
+    index.discard("absent")
+    assert index.search("mail") == ["mail.example", "webmail.test"]
+    index.clear()
+    assert index.search("mail") == []
+
+
+def test_full_search_can_be_cancelled():
+    index = SearchIndex(f"site{i}.com" for i in range(5000))
+    assert len(index.search("com", 5000)) == len(index.search("com", 5000, lambda: False)) == 5000
+    polls = []
+    assert index.search("com", 5000, lambda: polls.append(1) or len(polls) > 1) == []
+    assert len(polls) == 3  # the scan gave up at its second poll, search() checked once more
+
+
+def test_vault_search_follows_changes(tmp_path):
+    vault = Vault("pw", vault_file=str(tmp_path / "vault.json"), flush_delay=None)
+    vault.add_many([("shop.example", "1"), ("bank.example", "2")])
+    assert vault.search("example") == ["bank.example", "shop.example"]
+    vault.add("shopping.test", "3")
+    vault.delete("shop.example")
+    assert vault.search("shop") == ["shopping.test"]
+    with vault.batch():
+        vault.add("shopify.io", "4")
+        assert vault.search("shopify") == []
+    assert vault.search("shopify") == ["shopify.io"]
+    vault.clear()
+    assert vault.search("bank") == []
+    vault.close()
+
+
+def test_keystrokes_on_100k_sites():
+    rng = random.Random(7)
+    words = ["mail", "bank", "shop", "cloud", "git", "news", "home", "work", "game", "pay"]
+    index = SearchIndex(
+        f"{rng.choice(words)}{rng.choice(words)}{i}.{rng.choice(['com', 'org', 'io'])}"
+        for i in range(100_000)
+    )
+    timings = []
+    for query in ("mailbank42", "com", "e", "shopgit", "gitmial", "0.io"):
+        for n in range(1, len(query) + 1):
+            start = time.perf_counter()
+            index.search(query[:n])
+            timings.append(time.perf_counter() - start)
+    assert sum(timings) / len(timings) < 0.005
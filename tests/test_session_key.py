@@ -0,0 +1,44 @@
+from core import entry, storage
+from core.crypto import SessionKey
+from core.vault import Vault
+
+
+def test_session_key_reuses_salt(tmp_path):
+    vault_file = str(tmp_path / "vault.json")
+    session = SessionKey.derive("TestPass123")
+    storage.save_vault({"github.com": "meow123"}, "TestPass123", vault_file, session=session)
+    storage.save_vault({"github.com": "meow456"}, "TestPass123", vault_file, session=session)
+
+    data, reopened = storage.unlock("TestPass123", vault_file)
+    assert data == {"github.com": "meow456"}
+    assert reopened.salt == session.salt
+    assert reopened.key == session.key
+
+
+def test_vault_mutations_do_not_rederive(tmp_path, monkeypatch):
+    vault_file = str(tmp_path / "vault.json")
+    v = Vault("TestPass123", vault_file=vault_file)
+
+    calls = []
+    original = SessionKey.derive.__func__
+
+    def counting_derive(cls, *args, **kwargs):
+        calls.append(args)
+        return original(cls, *args, **kwargs)
+
+    monkeypatch.setattr(SessionKey, "derive", classmethod(counting_derive))
+    v.add("github.com", "meow123")
+    v.add("discord", "abc123")
+    v.delete("discord")
+    v.flush()
+    assert calls == []
+
+    stored = storage.load_vault("TestPass123", vault_file)
+    assert list(stored) == ["github.com"] and entry.password_of(stored["github.com"]) == "meow123"
+
+
+def test_load_with_session_skips_derivation(tmp_path):
+    vault_file = str(tmp_path / "vault.json")
+    storage.save_vault({"a": "1"}, "pw", vault_file)
+    _, session = storage.unlock("pw", vault_file)
+    assert storage.load_vault("pw", vault_file, session=session) == {"a": "1"}
@@ -0,0 +1,86 @@
+import pytest
+from core import storage
+from core.crypto import SessionKey
+from core.backend import open_backend
+from core.sqlitebackend import SqliteBackend
+from core.vault import Vault
+
+
+def test_put_fetch_delete(tmp_path):
+    path = str(tmp_path / "vault.db")
+    backend = SqliteBackend.open("TestPass123", path)
+    entries = backend.load()
+    entries["github.com"] = "meow123"
+    backend.put("github.com", "meow123")
+    backend.put("discord", "abc123")
+    backend.delete("discord")
+    assert not isinstance(entries._entries["github.com"], str)
+    assert entries["github.com"] == "meow123"
+    mode = backend._conn.execute("PRAGMA journal_mode").fetchone()[0]
+    backend.close()
+    assert mode == "wal"
+
+    reopened = SqliteBackend.open("TestPass123", path)
+    assert dict(reopened.iterate()) == {"github.com": "meow123"}
+    assert reopened.load().secret_length("github.com") == 7
+    reopened.close()
+
+
+def test_wrong_password_is_rejected(tmp_path):
+    path = str(tmp_path / "vault.db")
+    SqliteBackend.open("TestPass123", path).close()
+    with pytest.raises(ValueError):
+        SqliteBackend.open("nope", path)
+
+
+def test_storage_uses_the_given_session(tmp_path, monkeypatch):
+    path = str(tmp_path / "vault.db")
+    session = SessionKey.derive("TestPass123")
+    monkeypatch.setattr(SessionKey, "derive", lambda *a, **k: pytest.fail("KDF ran"))
+    # a new database is keyed by the session; no password is needed either way
+    storage.save_vault({"a": "1"}, None, path, session, storage.FORMAT_SQLITE)
+    storage.save_vault({"a": "1", "b": "2"}, None, path, session)
+    assert storage.load_vault(None, path, session) == {"a": "1", "b": "2"}
+    monkeypatch.undo()
+    assert storage.load_vault("TestPass123", path) == {"a": "1", "b": "2"}
+
+
+def test_save_replaces_all_rows(tmp_path):
+    path = str(tmp_path / "vault.db")
+    backend = SqliteBackend.open("TestPass123", path)
+    entries = backend.load()
+    for i in range(10):
+        entries[f"site{i}"] = f"pwd{i}"
+    backend.save(entries)
+    del entries["site0"]
+    entries["site1"] = "changed"
+    backend.save(entries)
+    backend.close()
+    expected = {f"site{i}": f"pwd{i}" for i in range(2, 10)}
+    expected["site1"] = "changed"
+    assert storage.load_vault("TestPass123", path) == expected
+
+
+def test_vault_on_sqlite(tmp_path):
+    path = str(tmp_path / "vault.db")
+    v = Vault("TestPass123", vault_file=path, storage_format=storage.FORMAT_SQLITE)
+    v.add("github.com", "meow123")
+    v.add("discord", "abc123")
+    v.add("github.com", "meow456")
+    v.close()
+
+    assert storage.vault_format(path) == storage.FORMAT_SQLITE
+    reopened = Vault("TestPass123", vault_file=path)
+    assert reopened.get_sites() == ["github.com", "discord"]
+    assert reopened.get("github.com") == "meow456"
+    assert reopened.summaries() == [("github.com", 7), ("discord", 6)]
+    reopened.clear()
+    reopened.close()
+    assert storage.load_vault("TestPass123", path) == {}
+
+
+def test_sqlite_refuses_other_formats(tmp_path):
+    path = str(tmp_path / "vault.json")
+    storage.save_vault({"a": "1"}, "pw", path)
+    with pytest.raises(ValueError):
+        open_backend("pw", path, storage.FORMAT_SQLITE)
@@ -0,0 +1,68 @@
+import threading
+import pytest
+from core import kdf, storage
+from core.crypto import IncorrectPasswordError, SessionKey
+from core.unlock import UnlockCancelled, UnlockTask
+from core.vault import Vault
+
+
+def _make_vault(tmp_path):
+    path = str(tmp_path / "vault.json")
+    session = SessionKey.derive("pw", None, kdf.pbkdf2(1000))
+    storage.save_vault({"a": "1"}, "pw", path, session=session)
+    return path
+
+
+def test_open_async_reports_progress_and_result(tmp_path):
+    path = _make_vault(tmp_path)
+    progress, done = [], []
+    task = Vault.open_async(
+        "pw", vault_file=path, flush_delay=None,
+        on_progress=lambda f, msg: progress.append(f), on_done=done.append,
+    )
+    vault = task.result(timeout=10)
+    assert done == [vault]
+    assert vault.items() == [("a", "1")]
+    assert progress == sorted(progress) and progress[0] == 0.0 and progress[-1] == 1.0
+
+
+def test_open_async_wrong_password(tmp_path):
+    path = _make_vault(tmp_path)
+    errors = []
+    task = Vault.open_async("nope", vault_file=path, on_error=errors.append)
+    with pytest.raises(IncorrectPasswordError):
+        task.result(timeout=10)
+    assert isinstance(errors[0], IncorrectPasswordError)
+
+
+def test_callbacks_go_through_dispatch(tmp_path):
+    path = _make_vault(tmp_path)
+    queued = []
+    task = Vault.open_async("pw", vault_file=path, on_done=lambda v: None, dispatch=queued.append)
+    task.result(timeout=10)
+    assert queued  # nothing ran on the worker; the caller drains the queue
+    for fn in queued:
+        fn()
+
+
+def test_cancel_discards_result():
+    started, release = threading.Event(), threading.Event()
+    closed, done = [], []
+
+    class Result:
+        def close(self, flush=True):
+            closed.append(flush)
+
+    def work(progress):
+        progress(0.0, "Deriving key")
+        started.set()
+        release.wait(5)
+        return Result()
+
+    task = UnlockTask(on_done=done.append).start(work)
+    started.wait(5)
+    task.cancel()
+    release.set()
+    with pytest.raises(UnlockCancelled):
+        task.result(timeout=5)
+    assert done == [] and closed == [False]
@@ -0,0 +1,58 @@
+import base64
+import json
+import os
+from core import storage, vaultfile
+from core.crypto import CryptoUtils, SessionKey
+
+
+def _write_v1(path, data, password):
+    # the pre-v2 layout: base64 salt line + base64 token
+    salt = CryptoUtils.generate_salt()
+    key = CryptoUtils.derive_key(password, salt)
+    with open(path, "w") as f:
+        f.write(base64.b64encode(salt).decode() + "\n" + CryptoUtils.encrypt(json.dumps(data), key))
+
+
+def test_save_writes_binary_v2(tmp_path):
+    path = str(tmp_path / "vault.json")
+    session = SessionKey.derive("TestPass123")
+    storage.save_vault({"github.com": "meow123"}, "TestPass123", path, session=session)
+    with open(path, "rb") as f:
+        assert f.read(5) == vaultfile.MAGIC
+    header, _ = vaultfile.read(path)
+    assert header.version == vaultfile.FORMAT_VERSION
+    assert header.kdf == session.kdf
+    assert storage.load_vault("TestPass123", path) == {"github.com": "meow123"}
+
+
+def test_v1_is_read_and_upgraded_on_save(tmp_path):
+    path = str(tmp_path / "vault.json")
+    data = {f"site{i}": "x" * 40 for i in range(200)}
+    _write_v1(path, data, "TestPass123")
+    v1_size = os.path.getsize(path)
+
+    loaded, session = storage.unlock("TestPass123", path)
+    assert loaded == data
+    storage.save_vault(loaded, "TestPass123", path, session=session)
+
+    assert vaultfile.is_vault_file(path)
+    assert os.path.getsize(path) < v1_size
+    assert storage.load_vault("TestPass123", path) == data
+
+
+def test_tampered_header_fails_to_decrypt(tmp_path):
+    path = str(tmp_path / "vault.json")
+    session = SessionKey.derive("TestPass123")
+    storage.save_vault({"a": "1"}, "TestPass123", path, session=session)
+    with open(path, "r+b") as f:
+        raw = bytearray(f.read())
+        raw[9] ^= 0x01  # inside the KDF parameters
+        f.seek(0)
+        f.write(raw)
+    assert storage.load_vault("TestPass123", path, session=session) == {}
+
+
+def test_wrong_password(tmp_path):
+    path = str(tmp_path / "vault.json")
+    storage.save_vault({"a": "1"}, "TestPass123", path)
+    assert storage.load_vault("nope", path) == {}
@@ -0,0 +1,70 @@
+import os
+import time
+from core import entry, storage
+from core.vault import Vault
+from core.writebehind import WriteBehind
+
+
+def test_rapid_changes_coalesce_into_one_write():
+    writes = []
+    wb = WriteBehind(lambda: writes.append(1), delay=0.05)
+    for _ in range(50):
+        wb.mark_dirty()
+    time.sleep(0.3)
+    assert writes == [1]
+    wb.close()
+
+
+def test_flush_writes_immediately_and_close_stops():
+    writes = []
+    wb = WriteBehind(lambda: writes.append(1), delay=60)
+    wb.mark_dirty()
+    wb.flush()
+    assert writes == [1]
+    wb.flush()  # nothing pending
+    assert writes == [1]
+    wb.mark_dirty()
+    wb.close()
+    assert writes == [1, 1]
+
+
+def test_failed_write_stays_dirty():
+    calls = []
+
+    def failing():
+        calls.append(1)
+        if len(calls) == 1:
+            raise OSError("disk full")
+
+    wb = WriteBehind(failing, delay=60)
+    wb.mark_dirty()
+    try:
+        wb.flush()
+    except OSError:
+        pass
+    assert wb.dirty
+    wb.flush()
+    assert not wb.dirty
+    wb.close()
+
+
+def test_vault_edits_produce_one_save(tmp_path):
+    path = str(tmp_path / "vault.json")
+    v = Vault("TestPass123", vault_file=path, flush_delay=60)
+    for i in range(100):
+        v.add(f"site{i}", f"pwd{i}")
+    assert not os.path.exists(path)
+    v.flush()
+    assert v._backend._writer.writes == 1
+    assert len(storage.load_vault("TestPass123", path)) == 100
+    assert not os.path.exists(path + ".tmp")
+    v.close()
+
+
+def test_vault_close_flushes(tmp_path):
+    path = str(tmp_path / "vault.json")
+    v = Vault("TestPass123", vault_file=path, flush_delay=60)
+    v.add("github.com", "meow123")
+    v.close()
+    stored = storage.load_vault("TestPass123", path)
+    assert list(stored) == ["github.com"] and entry.password_of(stored["github.com"]) == "meow123"
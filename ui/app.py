@@ -21,6 +21,7 @@ def _load_kv_if_exists():
         "ui/kv/backup_export_screen.kv",
         "ui/kv/backup_import_Screen.kv",
         "ui/kv/clear_vault_screen.kv",
+        "ui/kv/merge_preview_screen.kv",
     ):
         p = Path(kv)
         if p.exists():
@@ -41,7 +42,11 @@ from ui.screens.reset_password_screen import ResetPasswordScreen
 from ui.screens.backup_export_screen import BackupExportScreen
 from ui.screens.backup_import_screen import BackupImportScreen
 from ui.screens.clear_vault_screen import ClearVaultScreen
+from ui.screens.merge_preview_screen import MergePreviewScreen
 from core import masterPassword as mp
+from core import autobackup
+from app_state import app_state
+from kivy.logger import Logger
 
 class PersonalSafeApp(App):
     title = "Personal Safe"
@@ -49,6 +54,7 @@ class PersonalSafeApp(App):
     def build(self):
         # Ensure vault is unset until user unlocks/creates
         self.vault = None
+        self.backup_scheduler = None
         self.theme = Theme()
         Window.minimum_width, Window.minimum_height = 480, 380
         sm = ScreenManager(transition=FadeTransition())
@@ -64,12 +70,51 @@ class PersonalSafeApp(App):
         sm.add_widget(BackupExportScreen(name="BACKUP_EXPORT"))
         sm.add_widget(BackupImportScreen(name="BACKUP_IMPORT"))
         sm.add_widget(ClearVaultScreen(name="CLEAR_VAULT"))
+        sm.add_widget(MergePreviewScreen(name="MERGE_PREVIEW"))
 
         sm.app = self
         self.sm = sm
-        # Route based on existence of master hash
-        if Path(mp.masterHashFile).exists():
+        # Route based on whether a master password is set (a vault or a legacy hash)
+        if mp.masterPasswordExists():
             sm.current = "LOGIN"
         else:
             sm.current = "CREATE"
         return sm
+
+    def _flush_vault(self):
+        # Vault saves are written behind on a timer; make sure nothing is left pending
+        vault = getattr(app_state, "vault", None)
+        if vault is None:
+            return
+        try:
+            vault.flush()
+        except Exception:
+            Logger.exception("App: failed to flush vault")
+
+    def show_status(self, message):
+        """Show `message` above the vault list until it is replaced or cleared with ""."""
+        self.sm.get_screen("HOME").notice = message
+
+    def start_auto_backup(self, vault):
+        """Snapshot `vault` in the background (see core.autobackup) until it is closed."""
+        self.stop_auto_backup()
+        self.backup_scheduler = autobackup.BackupScheduler(
+            vault,
+            on_backup=lambda path: Logger.info(f"App: automatic backup written to {path}"),
+        ).start()
+
+    def stop_auto_backup(self):
+        scheduler, self.backup_scheduler = self.backup_scheduler, None
+        if scheduler is not None:
+            scheduler.stop()
+
+    def on_pause(self):
+        self._flush_vault()
+        return True
+
+    def on_stop(self):
+        self.stop_auto_backup()
+        self._flush_vault()
+        vault = getattr(app_state, "vault", None)
+        if vault is not None:
+            vault.close(flush=False)
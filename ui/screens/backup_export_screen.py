@@ -1,5 +1,8 @@
+import threading
+
+from kivy.clock import Clock
 from kivy.uix.screenmanager import Screen
-from kivy.properties import StringProperty, ObjectProperty
+from kivy.properties import BooleanProperty, StringProperty, ObjectProperty
 from kivy.uix.boxlayout import BoxLayout
 from kivy.uix.textinput import TextInput
 from kivy.uix.popup import Popup
@@ -7,11 +10,24 @@ from kivy.uix.label import Label
 from kivy.uix.button import Button
 from app_state import app_state
 from kivy.logger import Logger
+from core import exporters
+from ui.spinner import BusySpinner  # noqa: F401  (registers the kv widget)
+
+# Spinner labels for the plaintext export
+EXPORT_FORMATS = {"CSV": exporters.CSV, "JSON lines": exporters.JSONL}
+EXPORT_FIELDS = {
+    "Site + password": exporters.DEFAULT_FIELDS,
+    "All fields": exporters.FIELDS,
+}
 
 
 class BackupExportScreen(Screen):
     info_text = StringProperty("")
     path_field = ObjectProperty(None)
+    filter_field = ObjectProperty(None)
+    export_format = StringProperty("CSV")
+    export_fields = StringProperty("Site + password")
+    busy = BooleanProperty(False)
 
     def on_pre_enter(self, *args):
         self.info_text = ""
@@ -46,6 +62,45 @@ class BackupExportScreen(Screen):
             self.info_text = f"Error: {e}"
             self._show_popup("Export Failed", f"Failed to export backup:\n{e}")
 
+    def do_export_data(self):
+        """Stream the (optionally filtered) entries to a CSV or JSON-lines file on a worker thread."""
+        vault = getattr(app_state, "vault", None)
+        if not vault:
+            self._show_popup("No Vault", "Vault is not loaded.")
+            return
+        if self.busy:
+            return
+        fmt = EXPORT_FORMATS[self.export_format]
+        fields = EXPORT_FIELDS[self.export_fields]
+        filepath = (self.path_field.text or "").strip() if self.path_field else ""
+        if not filepath or filepath.lower().endswith(".psafe"):
+            filepath = "vault_export.csv" if fmt == exporters.CSV else "vault_export.jsonl"
+            if self.path_field:
+                self.path_field.text = filepath
+        site_filter = (self.filter_field.text or "").strip() if self.filter_field else ""
+        self.busy = True
+        self.info_text = "Exporting..."
+
+        def _work():
+            try:
+                count = exporters.export_vault(vault, filepath, fmt, fields, site_filter or None)
+            except Exception as e:
+                Logger.exception("Data export failed")
+                Clock.schedule_once(lambda dt: self._data_export_done(filepath, None, e), 0)
+                return
+            Clock.schedule_once(lambda dt: self._data_export_done(filepath, count, None), 0)
+
+        threading.Thread(target=_work, name="vault-export", daemon=True).start()
+
+    def _data_export_done(self, filepath, count, error):
+        self.busy = False
+        if error is not None:
+            self.info_text = f"Error: {error}"
+            self._show_popup("Export Failed", f"Failed to export:\n{error}")
+            return
+        self.info_text = f"Exported {count} entries"
+        self._show_popup("Unencrypted Export", f"{count} entries saved to:\n{filepath}\nThis file is not encrypted.")
+
     def _ask_for_password_and_export(self, filepath: str):
         content = BoxLayout(orientation="vertical", padding=10, spacing=10)
 
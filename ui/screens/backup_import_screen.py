@@ -1,3 +1,8 @@
+import os
+import threading
+import time
+
+from kivy.clock import Clock
 from kivy.uix.screenmanager import Screen
 from kivy.properties import StringProperty, ObjectProperty
 from kivy.uix.boxlayout import BoxLayout
@@ -7,6 +12,8 @@ from kivy.uix.label import Label
 from kivy.uix.button import Button
 from app_state import app_state
 from kivy.logger import Logger
+from core import backup as backup_mod
+from core import importers
 
 
 class BackupImportScreen(Screen):
@@ -33,7 +40,157 @@ class BackupImportScreen(Screen):
         # Ask for master password to decrypt backup
         self._ask_password_and_import(filepath)
 
+    def do_import_logins(self):
+        """Bulk import a browser/Bitwarden CSV or KeePass XML export on a worker thread."""
+        vault = getattr(app_state, "vault", None)
+        if not vault:
+            self._show_popup("No vault", "Vault not loaded.")
+            return
+        filepath = (self.path_field.text or "").strip() if self.path_field else ""
+        if not filepath or not os.path.isfile(filepath):
+            self._show_popup("Path required", "Enter the path of a CSV or KeePass XML export.")
+            return
+        self.info_text = "Reading..."
+
+        def _progress(fraction, message):
+            Clock.schedule_once(
+                lambda dt: setattr(self, "info_text", f"{message} {int(fraction * 100)}%"), 0
+            )
+
+        def _work():
+            try:
+                result = importers.import_file(vault, filepath, progress=_progress)
+            except Exception as e:
+                Logger.exception("Login import failed")
+                Clock.schedule_once(lambda dt: self._logins_failed(e), 0)
+                return
+            Clock.schedule_once(lambda dt: self._logins_imported(result), 0)
+
+        threading.Thread(target=_work, name="vault-import", daemon=True).start()
+
+    def _logins_failed(self, e):
+        self.info_text = ""
+        self._show_popup("Import failed", f"Failed to import logins: {e}")
+
+    def _logins_imported(self, result):
+        self.info_text = ""
+        lines = [f"{result.added} added"]
+        if result.unchanged:
+            lines.append(f"{result.unchanged} already in the vault")
+        if result.conflicts:
+            lines.append(f"{result.conflicts} kept (vault has another password)")
+        if result.duplicates:
+            lines.append(f"{result.duplicates} duplicates skipped")
+        if result.invalid:
+            lines.append(f"{result.invalid} without site or password skipped")
+        self._show_popup("Import complete", "\n".join(lines))
+
+    def do_merge(self):
+        """Diff a backup against the vault on a worker thread and preview it."""
+        vault = getattr(app_state, "vault", None)
+        if not vault:
+            self._show_popup("No vault", "Vault not loaded.")
+            return
+        filepath = (self.path_field.text or "").strip() if self.path_field else ""
+        if not filepath:
+            self._show_popup("Path required", "Enter backup filepath.")
+            return
+        self._ask_password(
+            "Merge Backup", "Preview", lambda pw: self._start_merge_plan(vault, filepath, pw)
+        )
+
+    def _start_merge_plan(self, vault, filepath: str, password: str):
+        self.info_text = "Comparing..."
+
+        def _work():
+            try:
+                plan = vault.plan_merge(filepath, password)
+            except Exception as e:
+                Logger.exception("Merge preview failed")
+                Clock.schedule_once(lambda dt: self._merge_plan_failed(e), 0)
+                return
+            Clock.schedule_once(lambda dt: self._show_merge_plan(plan, filepath), 0)
+
+        threading.Thread(target=_work, name="vault-merge-plan", daemon=True).start()
+
+    def _merge_plan_failed(self, e):
+        self.info_text = ""
+        self._show_popup("Merge failed", f"Failed to read backup: {e}")
+
+    def _show_merge_plan(self, plan, filepath: str):
+        self.info_text = ""
+        if "MERGE_PREVIEW" in self.manager.screen_names:
+            self.manager.get_screen("MERGE_PREVIEW").show_plan(plan, os.path.basename(filepath))
+
+    def do_verify(self):
+        """Check a backup file (or every backup in a directory) without importing it."""
+        filepath = (self.path_field.text or "").strip() if self.path_field else ""
+        if not filepath:
+            self._show_popup("Path required", "Enter backup filepath or directory.")
+            return
+        if not os.path.exists(filepath):
+            self._show_popup("Not found", f"{filepath} does not exist.")
+            return
+        self._ask_password(
+            "Verify Backup", "Verify", lambda pw: self._start_verify(filepath, pw)
+        )
+
+    def _start_verify(self, filepath: str, password: str):
+        self.info_text = "Verifying..."
+
+        def _work():
+            try:
+                if os.path.isdir(filepath):
+                    results = backup_mod.verify_backups(filepath, password)
+                else:
+                    results = [backup_mod.verify_backup(filepath, password)]
+            except Exception as e:
+                Logger.exception("Verify failed")
+                Clock.schedule_once(lambda dt: self._verify_failed(e), 0)
+                return
+            Clock.schedule_once(lambda dt: self._show_verify_results(results), 0)
+
+        threading.Thread(target=_work, name="backup-verify", daemon=True).start()
+
+    def _verify_failed(self, e):
+        self.info_text = ""
+        self._show_popup("Verify failed", f"Failed to verify backup: {e}")
+
+    def _show_verify_results(self, results):
+        self.info_text = ""
+        if not results:
+            self._show_popup("Verify", "No .psafe backups found.")
+            return
+        lines = []
+        for info in results:
+            name = os.path.basename(info.path)
+            if info.verified:
+                created = (
+                    time.strftime("%Y-%m-%d %H:%M", time.localtime(info.created))
+                    if info.created
+                    else "unknown date"
+                )
+                lines.append(f"{name}: OK, {info.entries} entries, {created}, v{info.version}")
+            else:
+                lines.append(f"{name}: FAILED ({info.error})")
+        failed = sum(1 for info in results if not info.verified)
+        title = "Backup OK" if not failed else f"{failed} backup(s) failed"
+        self._show_popup(title, "\n".join(lines))
+
     def _ask_password_and_import(self, filepath: str):
+        def _import(password):
+            try:
+                app_state.vault.import_encrypted_backup(
+                    filepath, password, replace_existing=True
+                )
+                self._show_popup("Import complete", "Backup imported successfully.")
+            except Exception as e:
+                Logger.exception("Import failed")
+                self._show_popup("Import failed", f"Failed to import backup: {e}")
+
+        self._ask_password("Import Backup", "Import", _import)
+
+    def _ask_password(self, title: str, ok_text: str, on_ok):
         content = BoxLayout(orientation="vertical", padding=10, spacing=10)
 
         # Label
@@ -52,14 +209,14 @@ class BackupImportScreen(Screen):
 
         # Buttons layout
         btn_layout = BoxLayout(size_hint_y=None, height=50, spacing=10)
-        ok = Button(text="Import")
+        ok = Button(text=ok_text)
         cancel = Button(text="Cancel")
         btn_layout.add_widget(ok)
         btn_layout.add_widget(cancel)
         content.add_widget(btn_layout)
 
         popup = Popup(
-            title="Import Backup",
+            title=title,
             content=content,
             size_hint=(None, None),
             size=(420, 260),
@@ -69,14 +226,7 @@ class BackupImportScreen(Screen):
 
         def _do(_: None):
             popup.dismiss()
-            try:
-                app_state.vault.import_encrypted_backup(
-                    filepath, pw_input.text or "", replace_existing=True
-                )
-                self._show_popup("Import complete", "Backup imported successfully.")
-            except Exception as e:
-                Logger.exception("Import failed")
-                self._show_popup("Import failed", f"Failed to import backup: {e}")
+            on_ok(pw_input.text or "")
 
         ok.bind(on_release=_do)
         popup.open()
@@ -84,7 +234,8 @@ class BackupImportScreen(Screen):
     def _show_popup(self, title: str, message: str):
         content = BoxLayout(orientation="vertical", padding=10, spacing=10)
 
-        content.add_widget(Label(text=message, size_hint_y=None, height=40))
+        lines = message.count("\n") + 1
+        content.add_widget(Label(text=message, size_hint_y=None, height=max(40, 22 * lines)))
 
         btn = Button(text="OK", size_hint_y=None, height=50)
         content.add_widget(btn)
@@ -93,7 +244,7 @@ class BackupImportScreen(Screen):
             title=title,
             content=content,
             size_hint=(None, None),
-            size=(420, 220),
+            size=(520 if "\n" in message else 420, 180 + 22 * message.count("\n")),
             auto_dismiss=False
         )
         btn.bind(on_release=popup.dismiss)
@@ -47,7 +47,6 @@ class ClearVaultScreen(Screen):
                 try:
                     home = App.get_running_app().sm.get_screen("HOME")
                     home.status = "Vault cleared!"
-                    home.refresh_entries()
                 except Exception:
                     pass
         except Exception as e:
@@ -1,8 +1,9 @@
 import re
 from kivy.uix.screenmanager import Screen
-from kivy.properties import ObjectProperty, StringProperty
+from kivy.properties import BooleanProperty, ObjectProperty, StringProperty
 from kivy.logger import Logger
 from core import masterPassword as mp
+from core.unlock import UnlockTask
 from core.vault import Vault
 from app_state import app_state
 from kivy.clock import Clock
@@ -11,6 +12,7 @@ from kivy.uix.boxlayout import BoxLayout
 from kivy.uix.label import Label
 from kivy.uix.button import Button
 from kivy.uix.textinput import TextInput
+from ui.spinner import BusySpinner  # noqa: F401  (registers the kv widget)
 
 
 class CreateMasterScreen(Screen):
@@ -18,6 +20,7 @@ class CreateMasterScreen(Screen):
     pwd2_field = ObjectProperty(None)
     email_field = ObjectProperty(None)
     error_text = StringProperty("")
+    busy = BooleanProperty(False)  # vault being created on a worker thread
 
     def on_pre_enter(self, *args):
         self.error_text = ""
@@ -54,9 +57,42 @@ class CreateMasterScreen(Screen):
                 self.error_text = "Please enter a valid email address"
                 return
 
+        if self.busy:
+            return
+        Logger.info("CreateMaster: creating master password")
+        self.error_text = ""
+        self.busy = True
+        # Calibrating, running the KDF and wrapping the recovery key take a moment;
+        # keep them off the UI thread
+        UnlockTask(
+            on_done=lambda created: self._on_created(*created, p1, email),
+            on_error=self._on_create_failed,
+            dispatch=lambda fn: Clock.schedule_once(lambda dt: fn(), 0),
+        ).start(lambda progress: self._create_vault(p1, progress))
+
+    def _create_vault(self, p1, progress):
+        """Runs on the worker: returns the new vault and its recovery key (None if that failed)."""
+        vault = Vault(p1, progress=progress)
+        # The vault header's key check is what authenticates the password now,
+        # so write the new (empty) vault right away
+        vault.ensure_key_check()
+        try:
+            recovery_key = vault.create_recovery_key()
+        except Exception:
+            Logger.exception("CreateMaster: failed to create recovery key")
+            recovery_key = None
+        return vault, recovery_key
+
+    def _on_created(self, vault, recovery_key, p1, email):
+        self.busy = False
         try:
-            Logger.info("CreateMaster: creating master password")
-            mp.createMasterPassword(p1)
+            if recovery_key is not None:
+                self._show_info(
+                    "Recovery key",
+                    "Write this key down and keep it safe.\n"
+                    "It is the only way to reset a forgotten master password:\n\n"
+                    f"{recovery_key}",
+                )
 
             try:
                 if hasattr(mp, "setRecoveryEmail"):
@@ -76,12 +112,16 @@ class CreateMasterScreen(Screen):
             except Exception:
                 Logger.exception("CreateMaster: failed to update app_state.profile")
 
-            app_state.vault = Vault(p1)
+            app_state.vault = vault
             app_state.master_password = p1
             Logger.info("CreateMaster: master password created")
-            try:
-                from kivy.app import App
+            from kivy.app import App
 
+            try:
+                App.get_running_app().start_auto_backup(vault)
+            except Exception:
+                Logger.exception("CreateMaster: could not start automatic backups")
+            try:
                 App.get_running_app().show_status("Master password created")
             except Exception:
                 pass
@@ -90,6 +130,11 @@ class CreateMasterScreen(Screen):
             Logger.exception("Create master failed")
             self.error_text = f"Error: {e}"
 
+    def _on_create_failed(self, e):
+        self.busy = False
+        Logger.error(f"Create master failed: {e}")
+        self.error_text = f"Error: {e}"
+
     def goto_home(self):
         if "HOME" in self.manager.screen_names:
             self.manager.current = "HOME"
@@ -1,104 +1,251 @@
+import bisect
+
+from kivy.clock import Clock
 from kivy.uix.screenmanager import Screen
-from kivy.properties import ListProperty, StringProperty, ObjectProperty
+from kivy.properties import BooleanProperty, NumericProperty, StringProperty, ObjectProperty
+from kivy.uix.boxlayout import BoxLayout
+from kivy.uix.recycleview.views import RecycleDataViewBehavior
 from kivy.logger import Logger
 from app_state import app_state
+from core.livefilter import LiveFilter
+
+# Above this many sites in one vault change the list is reloaded instead of patched
+MAX_PATCHED_ROWS = 50
+# Best matches a filter shows first; ranking every match of a short query ("com")
+# in a large vault takes hundreds of milliseconds, so the rest follow once ranked
+FILTER_PAGE = 200
+
+
+def _row(site, length):
+    # RecycleView data for one entry; the password is only held while revealed
+    return {"site": site, "masked": "•" * min(length, 16), "revealed": False, "secret": ""}
+
+
+def _sort_key(site):
+    # Rows are listed case-insensitively by site
+    return (site.lower(), site)
+
+
+class EntryRow(RecycleDataViewBehavior, BoxLayout):
+    """One recycled row of the home list (layout in home.kv); state lives in its data dict."""
+
+    index = NumericProperty(-1)
+    site = StringProperty("")
+    masked = StringProperty("")
+    secret = StringProperty("")
+    revealed = BooleanProperty(False)
+    screen = ObjectProperty(None, allownone=True)
+
+    def refresh_view_attrs(self, rv, index, data):
+        self.index = index
+        self.screen = rv.screen
+        return super().refresh_view_attrs(rv, index, data)
+
+    def toggle(self):
+        if self.screen is not None:
+            self.screen.toggle_entry(self.index)
+
 
 class HomeScreen(Screen):
-    entries = ListProperty([])  # list of (site, password)
     status = StringProperty("Ready")
-    entries_grid = ObjectProperty(None)  # bound to ids.entries_grid in KV
+    notice = StringProperty("")  # set through the app's show_status(); cleared for another vault
+    entries_list = ObjectProperty(None)  # bound to ids.entries_list (a RecycleView) in KV
     vault_header = StringProperty("Your Vault")
-    
+    filter_text = StringProperty("")
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self._vault = None  # the vault whose changes patch the list
+        # site -> password length; the filter worker reads it one site at a time
+        self._lengths = {}
+        # _sort_key of every site, sorted: the row order of the unfiltered list
+        self._order = []
+        # Filter queries run on a worker; only the latest one's rows reach the list
+        self._filter = LiveFilter(
+            self._filter_rows,
+            self._show_filtered,
+            dispatch=lambda fn: Clock.schedule_once(lambda dt: fn(), 0),
+        )
+
     def on_pre_enter(self, *args):
-        self.refresh_entries()
+        # The listener keeps the list current; only a different vault is reloaded
+        if app_state.vault is not self._vault:
+            self.refresh_entries()
+        else:
+            self._update_status()
 
-    def refresh_entries(self):
-        profile_name = ""
+    def _profile_name(self):
         if getattr(app_state, "profile", None):
-            profile_name = app_state.profile.get("display_name", "").strip()
-        prefix = f"{profile_name}'s " if profile_name else "Your "
-        
+            return app_state.profile.get("display_name", "").strip()
+        return ""
+
+    def refresh_entries(self):
+        """Reload every row from the vault and follow its changes from then on."""
+        profile_name = self._profile_name()
+        self.vault_header = f"{profile_name}'s Vault" if profile_name else "Your Vault"
+        self._watch(app_state.vault)
         if not app_state.vault:
-            self.entries = []
+            self._lengths = {}
+            self._order = []
             self.status = "Vault not loaded"
-            self.vault_header = f"{profile_name}'s Vault" if profile_name else "Your Vault"
             self._render_entries()
             return
         try:
-            self.entries = app_state.vault.items()
-            if not self.entries:
-                self.status = f"{profile_name}'s Vault empty" if profile_name else "Your Vault"
-            else:
-                self.status = f"{profile_name}'s Vault - {len(self.entries)} entries"
-            self.vault_header = f"{profile_name}'s Vault" if profile_name else "Your Vault"
+            # Passwords are only decrypted when "Show" is pressed
+            self._lengths = dict(app_state.vault.summaries())
+            self._order = sorted(_sort_key(site) for site in self._lengths)
+            self._update_status()
             self._render_entries()
 
         except Exception as e:
             Logger.exception("Failed refreshing entries")
             self.status = f"Error: {e}"
 
-    def _render_entries(self):
-        # Populate the entries_grid with labels for each entry
-        grid = self.entries_grid
-        if not grid:
+    def _watch(self, vault):
+        if vault is self._vault:
             return
-        grid.clear_widgets()
-        from kivy.uix.label import Label
-        from kivy.uix.boxlayout import BoxLayout
-        from kivy.uix.button import Button
-
-        for site, password in self.entries:
-            masked = "•" * min(len(password), 16)
-            row = BoxLayout(
-                orientation="horizontal", spacing=8, size_hint_y=None, height=30
-            )
-            site_lbl = Label(
-                text=f"[b]{site}[/b]",
-                markup=True,
-                size_hint_x=None,
-                width=140,
-                color=(0.15, 0.25, 0.55, 1),
-                halign="left",
-                valign="middle",
-                text_size=(140, 30),
-            )
-            pwd_lbl = Label(
-                text=masked,
-                size_hint_x=1,
-                color=(0.05, 0.05, 0.05, 1),
-                halign="left",
-                valign="middle",
-                shorten=True,
-                shorten_from="right",
-            )
-            # Ensure halign/valign apply by keeping text_size synced to widget size
-            pwd_lbl.bind(size=lambda inst, _val: setattr(inst, "text_size", inst.size))
-            toggle_btn = Button(
-                text="Show",
-                size_hint_x=None,
-                width=80,
-            )
-
-            def on_toggle(
-                instance,
-                site=site,
-                password=password,
-                masked_val=masked,
-                label_ref=pwd_lbl,
-            ):
-                if label_ref.text == masked_val:
-                    label_ref.text = password
-                    instance.text = "Hide"
+        self.notice = ""
+        if self._vault is not None:
+            self._vault.remove_listener(self._on_vault_changed)
+        self._vault = vault
+        if vault is not None:
+            vault.add_listener(self._on_vault_changed, sites=True)
+
+    def _on_vault_changed(self, sites):
+        # Runs on the thread that changed the vault; the list is patched on the UI thread
+        vault = self._vault
+        Clock.schedule_once(lambda dt: self._apply_changes(vault, sites), 0)
+
+    def _apply_changes(self, vault, sites):
+        if vault is not self._vault:
+            return
+        if sites is None or len(sites) > MAX_PATCHED_ROWS:
+            self.refresh_entries()
+            return
+        try:
+            for site in sites:
+                length = vault.secret_length(site)
+                if length is None:
+                    self.remove_entry(site)
                 else:
-                    label_ref.text = masked_val
-                    instance.text = "Show"
+                    self.update_entry(site, length)
+        except Exception as e:
+            Logger.exception("Failed updating entries")
+            self.status = f"Error: {e}"
+            return
+        if self.filter_text.strip():
+            self._filter.submit(self.filter_text, delay=0)
+        else:
+            self._update_status()
+
+    def _update_status(self):
+        profile_name = self._profile_name()
+        if not self._lengths:
+            self.status = f"{profile_name}'s Vault empty" if profile_name else "Your Vault"
+        else:
+            self.status = f"{profile_name}'s Vault - {len(self._lengths)} entries"
+
+    def _render_entries(self):
+        # Fill the RecycleView from the loaded entries; only visible rows get widgets
+        rv = self.entries_list
+        if not rv:
+            return
+        rv.screen = self
+        if self.filter_text.strip():
+            self._filter.submit(self.filter_text, delay=0)
+            return
+        lengths = self._lengths
+        rv.data = [_row(site, lengths[site]) for _, site in self._order]
+
+    def set_filter(self, text):
+        """Narrow the list to sites matching `text` as it is typed (see Vault.search)."""
+        self.filter_text = text
+        if text.strip():
+            self._filter.submit(text)
+            return
+        self._filter.cancel()
+        self._render_entries()
+        self._update_status()
+
+    def _filter_rows(self, query, cancelled):
+        # Worker thread: RecycleView data for the best page of matches, then for every
+        # match; a newer query cancels the full search inside the index
+        vault = app_state.vault
+        lengths = self._lengths
+        if not vault or not lengths:
+            yield [], True
+            return
+        sites = vault.search(query, FILTER_PAGE)
+        complete = len(sites) < FILTER_PAGE
+        yield self._rows(sites), complete
+        if complete:
+            return
+        sites = vault.search(query, len(lengths), cancelled)
+        if not cancelled():
+            yield self._rows(sites), True
+
+    def _rows(self, sites):
+        lengths = self._lengths
+        rows = []
+        for site in sites:
+            length = lengths.get(site)
+            if length is not None:
+                rows.append(_row(site, length))
+        return rows
+
+    def _show_filtered(self, query, result):
+        rv = self.entries_list
+        if not rv or query != self.filter_text:
+            return
+        rows, complete = result
+        rv.data = rows
+        if complete:
+            self.status = f"{len(rows)} of {len(self._lengths)} entries match"
+        else:
+            self.status = f"Best {len(rows)} matches of {len(self._lengths)} entries, finding the rest..."
 
-            toggle_btn.bind(on_release=on_toggle)
+    def _position(self, site):
+        # (row of `site` in the unfiltered list, or where it belongs; whether it is there)
+        key = _sort_key(site)
+        i = bisect.bisect_left(self._order, key)
+        return i, i < len(self._order) and self._order[i] == key
 
-            row.add_widget(site_lbl)
-            row.add_widget(pwd_lbl)
-            row.add_widget(toggle_btn)
-            grid.add_widget(row)
+    def update_entry(self, site, length):
+        """Add or refresh the row of one entry, in sorted position, without touching the others."""
+        i, found = self._position(site)
+        self._lengths[site] = length
+        if not found:
+            self._order.insert(i, _sort_key(site))
+        rv = self.entries_list
+        if not rv or self.filter_text.strip():
+            return  # a filtered list is rebuilt by the next query
+        # a revealed row is hidden again: its password may have changed
+        if found:
+            rv.data[i] = _row(site, length)
+        else:
+            rv.data.insert(i, _row(site, length))
+
+    def remove_entry(self, site):
+        i, found = self._position(site)
+        if not found:
+            return
+        del self._order[i]
+        self._lengths.pop(site, None)
+        rv = self.entries_list
+        if rv and not self.filter_text.strip():
+            del rv.data[i]
+
+    def toggle_entry(self, index):
+        """Show or hide the password of row `index`; the row widget redraws from its data."""
+        rv = self.entries_list
+        if not rv or not 0 <= index < len(rv.data):
+            return
+        row = dict(rv.data[index])
+        if row["revealed"]:
+            row.update(revealed=False, secret="")
+        else:
+            row.update(revealed=True, secret=app_state.vault.get(row["site"]) or "")
+        rv.data[index] = row
 
     # Navigation helpers (assumes screens added with these names)
     def goto_add(self):
@@ -10,6 +10,10 @@ from kivy.uix.boxlayout import BoxLayout
 from kivy.uix.label import Label
 from kivy.uix.button import Button
 from core.vault import Vault
+from core.crypto import IncorrectPasswordError
+from core.recovery import recovery_path
+from core.unlock import UnlockTask
+from ui.spinner import BusySpinner  # noqa: F401  (registers the kv widget)
 from core import masterPassword as mp
 from app_state import app_state
 import os
@@ -23,6 +27,7 @@ from dotenv import load_dotenv
 from kivy.properties import ObjectProperty, StringProperty, BooleanProperty
 from ui.screens.profile_screen import load_profile, save_profile_to_disk
 from core import storage as storage
+from core import autobackup
 from kivy.app import App
 
 from core import twofactor as tf
@@ -63,7 +68,11 @@ class LoginScreen(Screen):
     pwd_field = ObjectProperty(None)  # Bound to password TextInput
     twofa_needed = BooleanProperty(False)
     twofa_field = ObjectProperty(None)
+    busy = BooleanProperty(False)  # unlock running; shows the spinner
+    busy_text = StringProperty("")
     _pending_pwd = None
+    _pending_vault = None
+    _unlock_task = None
 
     def on_pre_enter(self, *args):
         self.error_text = ""
@@ -98,47 +107,23 @@ class LoginScreen(Screen):
         if not pwd:
             self.error_text = "Enter master password"
             return
-        try:
-            # If master hash doesn't exist, create it with provided password
-            if not mp.os.path.exists(mp.masterHashFile):
-                mp.createMasterPassword(pwd)
-            else:
-                if not mp.verifyMasterPassword(pwd):
-                    try:
-                        reached = self._inc_failed_attempts_and_check()
-                        if reached:
-                            self._wipe_all_data()
-                            self.error_text = "Too many failed attempts — vault wiped"
-                            return
-                        # still has attempts left
-                        profile = (
-                            getattr(app_state, "profile", None) or load_profile() or {}
-                        )
-                        remaining = 5 - int(profile.get("failed_master_attempts", 0))
-                        self.error_text = (
-                            f"Incorrect password ({remaining} attempts left)"
-                        )
-                        return
-                    except Exception:
-                        self.error_text = "Incorrect password"
-                        return
+        self._start_unlock(pwd, lambda vault: self._after_unlock(pwd, vault))
 
+    def _after_unlock(self, pwd, vault):
+        try:
             profile = getattr(app_state, "profile", None) or load_profile()
 
             def _complete_login():
-                # Initialize vault with current password
-                app_state.vault = Vault(pwd)
+                app_state.vault = vault
                 app_state.master_password = pwd
                 Logger.info("Login: authenticated; vault initialized")
+                self._retune_kdf_in_background(app_state.vault)
+                self._start_auto_backup(app_state.vault)
                 # reset failed attempts on successful login
                 try:
                     self._reset_failed_attempts()
                 except Exception:
                     pass
-                try:
-                    App.get_running_app().show_status("Logged in")
-                except Exception:
-                    pass
                 # Load profile if not set
                 if not getattr(app_state, "profile", None):
                     app_state.profile = profile
@@ -150,11 +135,14 @@ class LoginScreen(Screen):
                         Logger.exception("Failed to refresh Home screen after login")
                 # If a home screen exists, navigate there; otherwise stay
                 if "HOME" in self.manager.screen_names:
+                    App.get_running_app().show_status(self._login_status(vault))
                     self.manager.current = "HOME"
 
             if profile and profile.get("2fa_enabled") and profile.get("2fa_secret"):
-                # if 2FA enabled, show inline twofa input area in the KV
+                # if 2FA enabled, show inline twofa input area in the KV;
+                # the unlocked vault is held until the code is verified
                 self._pending_pwd = pwd
+                self._pending_vault = vault
                 self.twofa_needed = True
                 # ensure the twofa input reference is set and focus the field
                 try:
@@ -171,19 +159,156 @@ class LoginScreen(Screen):
             Logger.exception("Login error")
             self.error_text = f"Error: {e}"
 
+    def _on_wrong_password(self):
+        try:
+            reached = self._inc_failed_attempts_and_check()
+            if reached:
+                self._wipe_all_data()
+                self.error_text = "Too many failed attempts — vault wiped"
+                return
+            # still has attempts left
+            profile = getattr(app_state, "profile", None) or load_profile() or {}
+            remaining = 5 - int(profile.get("failed_master_attempts", 0))
+            self.error_text = f"Incorrect password ({remaining} attempts left)"
+        except Exception:
+            self.error_text = "Incorrect password"
+
     def on_submit(self):
         self.do_login()
 
+    def _start_unlock(self, pwd, on_unlocked):
+        """
+        Unlock on a worker thread so the window keeps rendering; progress and the
+        result come back through Clock. Shows the spinner until done or cancelled.
+        """
+        if self._unlock_task is not None:
+            return
+        self.error_text = ""
+        self.busy = True
+        self.busy_text = "Unlocking..."
+
+        def _progress(fraction, message):
+            self.busy_text = f"{message}..."
+
+        def _done(vault):
+            self._finish_unlock()
+            on_unlocked(vault)
+
+        def _error(e):
+            self._finish_unlock()
+            if isinstance(e, IncorrectPasswordError):
+                self._on_wrong_password()
+            else:
+                Logger.error(f"Login error: {e}")
+                self.error_text = f"Error: {e}"
+
+        self._unlock_task = UnlockTask(
+            on_progress=_progress,
+            on_done=_done,
+            on_error=_error,
+            dispatch=lambda fn: Clock.schedule_once(lambda dt: fn(), 0),
+        ).start(lambda progress: self._unlock_vault(pwd, progress))
+
+    def cancel_unlock(self):
+        if self._unlock_task is None:
+            return
+        self._unlock_task.cancel()
+        self._finish_unlock()
+        self.error_text = "Unlock cancelled"
+
+    def _finish_unlock(self):
+        self._unlock_task = None
+        self.busy = False
+        self.busy_text = ""
+
+    def _unlock_vault(self, pwd, progress=None):
+        """
+        Unlock with a single KDF run: the key check in the vault header both
+        authenticates the password and yields the vault key. Users from before the
+        key check still have the bcrypt master hash; it is only consulted when there
+        is no vault to check against, and is retired once the vault carries a check.
+        Raises IncorrectPasswordError on a wrong password. Runs on the unlock worker.
+        """
+        legacy_hash = os.path.exists(mp.masterHashFile)
+        if legacy_hash and not storage.vault_exists() and not mp.verifyMasterPassword(pwd):
+            raise IncorrectPasswordError("Incorrect master password")
+        vault = Vault(pwd, progress=progress)
+        if legacy_hash:
+            vault.ensure_key_check()
+            mp.retireMasterHash()
+            Logger.info("Login: migrated master hash into the vault header")
+        return vault
+
+    def _retune_kdf_in_background(self, vault):
+        """Re-key the vault if its KDF no longer suits this machine (e.g. after an upgrade)."""
+
+        def _retune():
+            try:
+                if vault.kdf_outdated():
+                    vault.retune_kdf()
+                    Logger.info("Login: vault KDF re-tuned for this machine")
+            except Exception:
+                Logger.exception("Login: KDF re-tune failed")
+
+        threading.Thread(target=_retune, daemon=True).start()
+
+    def _login_status(self, vault):
+        # vaults from before recovery keys have none; a forgotten password would cost the vault
+        if not vault.has_recovery_key():
+            return "No recovery key yet: create one in Profile"
+        return ""
+
+    def _start_auto_backup(self, vault):
+        try:
+            App.get_running_app().start_auto_backup(vault)
+        except Exception:
+            Logger.exception("Login: could not start automatic backups")
+
     def _wipe_all_data(self):
         Logger.info("Wiping all vault data due to failed attempts")
-        # remove vault file
+        # drop pending background saves so they cannot recreate the vault file
         try:
-            vault_path = getattr(storage, "VAULT_FILE", "vault.json")
-            if os.path.exists(vault_path):
-                os.remove(vault_path)
-                Logger.info(f"Removed vault file: {vault_path}")
+            App.get_running_app().stop_auto_backup()
+            if self._unlock_task is not None:
+                self._unlock_task.cancel()
+                self._finish_unlock()
+            for vault in (app_state.vault, self._pending_vault):
+                if vault:
+                    vault.close(flush=False)
+            self._pending_vault = None
         except Exception:
-            Logger.exception("Failed removing vault file")
+            Logger.exception("Failed closing vault before wipe")
+        # remove vault files (flat file and SQLite database with its WAL files) and
+        # their recovery slots
+        sqlite_path = getattr(storage, "SQLITE_FILE", "vault.db")
+        vault_file = getattr(storage, "VAULT_FILE", "vault.json")
+        for vault_path in (
+            vault_file,
+            recovery_path(vault_file),
+            sqlite_path,
+            sqlite_path + "-wal",
+            sqlite_path + "-shm",
+            recovery_path(sqlite_path),
+        ):
+            try:
+                if os.path.exists(vault_path):
+                    os.remove(vault_path)
+                    Logger.info(f"Removed vault file: {vault_path}")
+            except Exception:
+                Logger.exception("Failed removing vault file")
+
+        # automatic snapshots hold the same entries under the same master password
+        for _, snapshot_path in autobackup.list_snapshots(autobackup.DEFAULT_DIRECTORY):
+            try:
+                os.remove(snapshot_path)
+                Logger.info(f"Removed automatic backup: {snapshot_path}")
+            except Exception:
+                Logger.exception("Failed removing automatic backup")
+        try:
+            # only if nothing else was kept there
+            os.rmdir(autobackup.DEFAULT_DIRECTORY)
+        except OSError:
+            pass
 
         # remove master hash and recovery files
         try:
@@ -318,23 +443,16 @@ class LoginScreen(Screen):
                     pass
 
                 pwd = self._pending_pwd or ""
+                vault = self._pending_vault
                 self._pending_pwd = None
-                app_state.vault = Vault(pwd)
-                app_state.master_password = pwd
-                try:
-                    App.get_running_app().show_status("Logged in")
-                except Exception:
-                    pass
-                if not getattr(app_state, "profile", None):
-                    app_state.profile = profile
-                if self.manager and "HOME" in self.manager.screen_names:
-                    try:
-                        home = self.manager.get_screen("HOME")
-                        home.refresh_entries()
-                    except Exception:
-                        Logger.exception("Failed to refresh Home screen after login")
-                if "HOME" in self.manager.screen_names:
-                    self.manager.current = "HOME"
+                self._pending_vault = None
+                if vault is None:
+                    # the unlock is normally done before the code is asked for
+                    self._start_unlock(
+                        pwd, lambda v: self._finish_2fa_login(pwd, v, profile)
+                    )
+                    return
+                self._finish_2fa_login(pwd, vault, profile)
             else:
                 # increment attempts for failed 2FA (treat as an authentication failure)
                 try:
@@ -354,6 +472,23 @@ class LoginScreen(Screen):
             Logger.exception("2FA verify failed")
             self.error_text = f"2FA error: {e}"
 
+    def _finish_2fa_login(self, pwd, vault, profile):
+        app_state.vault = vault
+        app_state.master_password = pwd
+        self._retune_kdf_in_background(app_state.vault)
+        self._start_auto_backup(app_state.vault)
+        if not getattr(app_state, "profile", None):
+            app_state.profile = profile
+        if self.manager and "HOME" in self.manager.screen_names:
+            try:
+                home = self.manager.get_screen("HOME")
+                home.refresh_entries()
+            except Exception:
+                Logger.exception("Failed to refresh Home screen after login")
+        if "HOME" in self.manager.screen_names:
+            App.get_running_app().show_status(self._login_status(vault))
+            self.manager.current = "HOME"
+
     def _send_recovery_thread(self, email, smtp_config, popup):
         try:
             if smtp_config is None:
@@ -0,0 +1,97 @@
+import threading
+
+from kivy.app import App
+from kivy.clock import Clock
+from kivy.logger import Logger
+from kivy.properties import BooleanProperty, ObjectProperty, StringProperty
+from kivy.uix.screenmanager import Screen
+from kivy.utils import escape_markup
+
+from app_state import app_state
+from core import merge
+from ui.spinner import BusySpinner  # noqa: F401  (registers the kv widget)
+
+# Spinner labels for the conflict resolutions
+RESOLUTION_LABELS = {
+    "Keep newer": merge.KEEP_NEWER,
+    "Keep mine": merge.KEEP_LOCAL,
+    "Use backup": merge.KEEP_INCOMING,
+}
+MAX_LISTED = 200  # rows of detail shown per category
+
+
+def _describe(plan: merge.MergePlan) -> str:
+    lines = []
+    for title, items in (
+        ("Conflicts", plan.conflicts),
+        ("Updated", plan.updated),
+        ("Added", plan.added),
+    ):
+        if not items:
+            continue
+        lines.append(f"[b]{title} ({len(items)})[/b]")
+        # site names come from the backup: shown as text, never as markup
+        lines.extend(f"  {escape_markup(item.site)}" for item in items[:MAX_LISTED])
+        if len(items) > MAX_LISTED:
+            lines.append(f"  ... and {len(items) - MAX_LISTED} more")
+    return "\n".join(lines) or "Nothing to merge: the vault already has every entry."
+
+
+class MergePreviewScreen(Screen):
+    """Shows the diff from Vault.plan_merge() and applies it once confirmed."""
+
+    summary = StringProperty("")
+    details = StringProperty("")
+    resolution = StringProperty("Keep newer")
+    busy = BooleanProperty(False)
+    plan = ObjectProperty(None, allownone=True)
+
+    def show_plan(self, plan: merge.MergePlan, source: str):
+        self.plan = plan
+        counts = plan.counts()
+        self.summary = (
+            f"{source}: {counts[merge.ADDED]} new, {counts[merge.UPDATED]} updated, "
+            f"{counts[merge.CONFLICT]} conflicting, {counts[merge.UNCHANGED]} unchanged"
+        )
+        self.details = _describe(plan)
+        self.manager.current = self.name
+
+    def do_apply(self):
+        vault = getattr(app_state, "vault", None)
+        if vault is None or self.plan is None or self.busy:
+            return
+        plan, resolution = self.plan, RESOLUTION_LABELS[self.resolution]
+        self.busy = True
+
+        def _work():
+            try:
+                written = vault.apply_merge(plan, resolution)
+            except Exception as e:
+                Logger.exception("Merge failed")
+                Clock.schedule_once(lambda dt: self._merge_done(None, e), 0)
+                return
+            Clock.schedule_once(lambda dt: self._merge_done(written, None), 0)
+
+        threading.Thread(target=_work, name="vault-merge", daemon=True).start()
+
+    def _merge_done(self, written, error):
+        self.busy = False
+        if error is not None:
+            self.summary = f"Error: merge failed: {error}"
+            return
+        self.plan = None
+        try:
+            App.get_running_app().show_status(f"Merged {written} entries")
+        except Exception:
+            pass
+        self.goto_home()
+
+    def do_cancel(self):
+        self.plan = None
+        if "BACKUP_IMPORT" in self.manager.screen_names:
+            self.manager.current = "BACKUP_IMPORT"
+
+    def goto_home(self):
+        if "HOME" in self.manager.screen_names:
+            # the Home screen follows the merged entries through its vault listener
+            self.manager.current = "HOME"
@@ -1,12 +1,14 @@
 import json
 import os
 from kivy.uix.screenmanager import Screen
-from kivy.properties import StringProperty
+from kivy.properties import BooleanProperty, StringProperty
 from kivy.logger import Logger
 from kivy.app import App
+from kivy.clock import Clock
 from app_state import app_state
 from core import masterPassword as mp
 from core import twofactor as tf
+from core.unlock import UnlockTask
 from kivy.uix.popup import Popup
 from kivy.uix.boxlayout import BoxLayout
 from kivy.uix.label import Label
@@ -18,6 +20,7 @@ from kivy.factory import Factory
 import base64
 import io
 from kivy.metrics import dp
+from ui.spinner import BusySpinner  # noqa: F401  (registers the kv widget)
 
 Builder.load_file("ui/kv/components.kv")
 
@@ -47,6 +50,8 @@ class ProfileScreen(Screen):
     email = StringProperty("")
     display_name = StringProperty("")
     twofa_status = StringProperty("")
+    recovery_status = StringProperty("")
+    busy = BooleanProperty(False)  # recovery key being created on a worker thread
 
     def on_pre_enter(self, *args):
         profile = load_profile()
@@ -58,6 +63,8 @@ class ProfileScreen(Screen):
         self.display_name = profile.get("display_name", "")
         # Load 2FA status for UI
         self.twofa_status = "Enabled" if profile.get("2fa_enabled") else "Disabled"
+        vault = getattr(app_state, "vault", None)
+        self.recovery_status = "Set" if vault is not None and vault.has_recovery_key() else "None"
 
     def save_profile(self):
         profile = load_profile()
@@ -80,6 +87,46 @@ class ProfileScreen(Screen):
         if "HOME" in self.manager.screen_names:
             self.manager.current = "HOME"
 
+    def create_recovery_key(self):
+        """
+        Give a vault created before recovery keys (or one whose key was lost) a
+        new one; a legacy vault is re-keyed first, so this runs on a worker.
+        """
+        vault = getattr(app_state, "vault", None)
+        if vault is None or self.busy:
+            return
+        self.busy = True
+        UnlockTask(
+            on_done=self._on_recovery_key,
+            on_error=self._on_recovery_key_failed,
+            dispatch=lambda fn: Clock.schedule_once(lambda dt: fn(), 0),
+        ).start(lambda progress: vault.create_recovery_key())
+
+    def _on_recovery_key(self, key):
+        self.busy = False
+        self.recovery_status = "Set"
+        App.get_running_app().show_status("")
+        self._show_message(
+            "Recovery key",
+            "Write this key down and keep it safe.\n"
+            "It is the only way to reset a forgotten master password;\n"
+            f"any earlier key no longer works:\n\n{key}",
+        )
+
+    def _on_recovery_key_failed(self, e):
+        self.busy = False
+        Logger.error(f"Profile: failed to create recovery key: {e}")
+        self._show_message("Error", f"Could not create a recovery key: {e}")
+
+    def _show_message(self, title, message):
+        content = BoxLayout(orientation="vertical", padding=dp(12), spacing=dp(8))
+        content.add_widget(Label(text=message))
+        btn = Button(text="OK", size_hint_y=None, height=dp(40))
+        content.add_widget(btn)
+        popup = Popup(title=title, content=content, size_hint=(0.8, 0.5))
+        btn.bind(on_release=popup.dismiss)
+        popup.open()
+
     def enable_2fa(self):
         profile = load_profile()
         account = self.email or self.display_name or "user"
@@ -5,9 +5,18 @@ from kivy.uix.label import Label
 from kivy.uix.textinput import TextInput
 from kivy.uix.button import Button
 from kivy.uix.popup import Popup
+from kivy.app import App
+from kivy.clock import Clock
+
+from kivy.logger import Logger
 
 from core import masterPassword as mp
+from core import storage
+from core.crypto import IncorrectPasswordError
+from core.unlock import UnlockTask
+from core.vault import Vault
 from app_state import app_state
+from ui.spinner import BusySpinner
 
 class ResetPasswordScreen(Screen):
     #def reset_password(self, new_password, confirm_password):
@@ -21,9 +30,18 @@ class ResetPasswordScreen(Screen):
         layout.add_widget(Label(text="Confirm New Password"))
         self.confirm_pw = TextInput(password=True, multiline=False)
         layout.add_widget(self.confirm_pw)
-        btn = Button(text="Reset Password", size_hint_y=None, height="48dp")
-        btn.bind(on_release=self._reset_password)
-        layout.add_widget(btn)
+        if getattr(app_state, "vault", None) is None:
+            # locked out: the recovery key shown at creation unlocks the data key
+            layout.add_widget(Label(text="Recovery Key (leave empty if lost)"))
+            self.recovery_key = TextInput(multiline=False)
+            layout.add_widget(self.recovery_key)
+        else:
+            self.recovery_key = None
+        self.spinner = BusySpinner(size_hint_y=None, height="32dp")
+        layout.add_widget(self.spinner)
+        self.reset_btn = Button(text="Reset Password", size_hint_y=None, height="48dp")
+        self.reset_btn.bind(on_release=self._reset_password)
+        layout.add_widget(self.reset_btn)
         self.add_widget(layout)
 
     def _reset_password(self, *_):
@@ -36,14 +54,72 @@ class ResetPasswordScreen(Screen):
         if new_pw != confirm_pw:
             self._show_popup("Error", "Passwords do not match.")
             return
-        mp.createMasterPassword(new_pw)
+        if self.spinner.active:
+            return
+        recovery_key = self.recovery_key.text.strip() if self.recovery_key is not None else ""
+        self.spinner.active = True
+        self.reset_btn.disabled = True
+        # Every path runs the KDF at least once; keep it off the UI thread
+        UnlockTask(
+            on_done=lambda result: self._on_reset(new_pw, *result),
+            on_error=self._on_reset_failed,
+            dispatch=lambda fn: Clock.schedule_once(lambda dt: fn(), 0),
+        ).start(lambda progress: self._reset_vault(new_pw, recovery_key, progress))
 
+    def _reset_vault(self, new_pw, recovery_key, progress):
+        """Runs on the worker: returns the vault under `new_pw` and the message to show."""
+        vault = getattr(app_state, "vault", None)
+        message = "Master password has been reset."
+        if vault is not None:
+            # rewrap the open vault's data key under the new password
+            vault.change_password(new_pw)
+        elif recovery_key:
+            Vault.reset_password(recovery_key, new_pw)
+            vault = Vault(new_pw, progress=progress)
+        else:
+            # Without the old password or a recovery key the vault cannot be
+            # decrypted; keep its files instead of overwriting them, and start a new vault
+            moved = storage.set_aside_vault()
+            Logger.info(f"ResetPassword: set aside locked vault files {moved}")
+            vault = Vault(new_pw, progress=progress)
+            vault.ensure_key_check()
+            if moved:
+                message += "\nThe previous vault was kept as a .locked file."
+        mp.retireMasterHash()
+        if not vault.has_recovery_key():
+            # so that the next forgotten password does not cost the vault
+            try:
+                message += (
+                    "\n\nYour new recovery key (write it down):\n"
+                    f"{vault.create_recovery_key()}"
+                )
+            except Exception:
+                Logger.exception("ResetPassword: failed to create recovery key")
+        return vault, message
+
+    def _on_reset(self, new_pw, vault, message):
+        self.spinner.active = False
+        self.reset_btn.disabled = False
+        app_state.vault = vault
         app_state.master_password = new_pw
+        try:
+            App.get_running_app().start_auto_backup(vault)
+        except Exception:
+            Logger.exception("ResetPassword: could not start automatic backups")
 
-        self._show_popup("Success", "Master password has been reset.")
+        self._show_popup("Success", message)
 
         self.manager.current = "HOME"
 
+    def _on_reset_failed(self, e):
+        self.spinner.active = False
+        self.reset_btn.disabled = False
+        if isinstance(e, (IncorrectPasswordError, FileNotFoundError)):
+            self._show_popup("Error", "The recovery key does not match this vault.")
+        else:
+            Logger.error(f"ResetPassword: reset failed: {e}")
+            self._show_popup("Error", f"Reset failed: {e}")
+
     def _show_popup(self, title, message):
         content = BoxLayout(orientation="vertical", padding=12, spacing=12)
         content.add_widget(Label(text=message))
@@ -0,0 +1,22 @@
+from kivy.clock import Clock
+from kivy.properties import BooleanProperty, NumericProperty
+from kivy.uix.widget import Widget
+
+
+class BusySpinner(Widget):
+    """Rotating arc shown while a slow task such as unlocking runs (drawn in components.kv)."""
+
+    active = BooleanProperty(False)
+    angle = NumericProperty(0)
+
+    _event = None
+
+    def on_active(self, *_):
+        if self.active and self._event is None:
+            self._event = Clock.schedule_interval(self._spin, 1 / 60.0)
+        elif not self.active and self._event is not None:
+            self._event.cancel()
+            self._event = None
+
+    def _spin(self, dt):
+        self.angle = (self.angle - 360 * dt) % 360